@@ -3,6 +3,11 @@ ASGI config for aquasense project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with uvicorn workers so the async chat endpoint doesn't tie up a
+worker while waiting on Gemini:
+
+    gunicorn aquasense.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,157 @@
+"""
+Per-request timing collection used by ServerTimingMiddleware.
+
+Code anywhere in the request can charge time to a named phase with
+``with timed('gemini'):``; outside a request (management commands, the job
+worker) it is a no-op. Templates are timed by the TimedDjangoTemplates
+backend and SQL by an execute wrapper that every database connection carries
+(installed on connect, so it also covers the threads sync views run in under
+ASGI).
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+_current = ContextVar('request_timings', default=None)
+
+# ==========================================
+#           PER-REQUEST COLLECTION
+# ==========================================
+
+class RequestTimings:
+    """Mutable bag of phase durations (seconds) and SQL counters for one request."""
+
+    def __init__(self):
+        self.phases = defaultdict(float)
+        self.queries = 0
+        self.query_time = 0.0
+
+    def add(self, phase, seconds):
+        self.phases[phase] += seconds
+
+
+def start():
+    """Begins collecting for the current request; returns (timings, reset token)."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timed(phase):
+    """Charges the wall time of the block to `phase` of the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Connection execute wrapper that counts and times queries."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.query_time += time.perf_counter() - started
+
+
+def install_sql_wrapper(connection):
+    """Adds sql_wrapper to `connection` once; it is a no-op outside requests."""
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install_sql_wrapper(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+# ==========================================
+#             TEMPLATE BACKEND
+# ==========================================
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend that charges render time to the 'template' phase."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+# ==========================================
+#               AGGREGATION
+# ==========================================
+
+class LatencyStats:
+    """Keeps the most recent request durations per URL name for percentiles."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples[name].append(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    @staticmethod
+    def _percentile(ordered, fraction):
+        index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self):
+        """{url_name: {'count', 'p50_ms', 'p95_ms', 'p99_ms'}} over the window."""
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+        return {
+            name: {
+                'count': len(ordered),
+                'p50_ms': round(self._percentile(ordered, 0.50) * 1000, 2),
+                'p95_ms': round(self._percentile(ordered, 0.95) * 1000, 2),
+                'p99_ms': round(self._percentile(ordered, 0.99) * 1000, 2),
+            }
+            for name, ordered in snapshot.items() if ordered
+        }
+
+
+latency = LatencyStats()
@@ -1,17 +1,178 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
 from django.shortcuts import redirect
 from django.urls import reverse
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+from . import instrumentation
+
+timing_logger = logging.getLogger('aquasense.timing')
+
+# Every middleware in MIDDLEWARE must be async capable: one sync-only entry
+# makes Django run everything below it (the async chat view included)
+# through async_to_sync, holding a thread for the whole Gemini round trip.
 
 class AdminRedirectMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
-    def __call__(self, request):
-        if request.user.is_authenticated and (request.user.is_staff or request.user.is_superuser):
+    @staticmethod
+    def _redirects(user, path):
+        if user.is_authenticated and (user.is_staff or user.is_superuser):
             # Define paths exempt from redirection
             # We must allow /admin/ to prevent infinite loops
             # We must allow /logout/ so they can sign out
-            if not request.path.startswith('/admin/') and not request.path == '/logout/':
-                return redirect('/admin/')
+            return not path.startswith('/admin/') and not path == '/logout/'
+        return False
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self._redirects(request.user, request.path):
+            return redirect('/admin/')
 
         response = self.get_response(request)
         return response
+
+    async def __acall__(self, request):
+        # Resolved here so sync code later on doesn't load the user a second time
+        request.user = await request.auser()
+        if self._redirects(request.user, request.path):
+            return redirect('/admin/')
+        return await self.get_response(request)
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise with an async path: other requests are passed on without
+    leaving the event loop, static files are served from a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+class ServerTimingMiddleware:
+    """
+    Measures where request time goes and reports it three ways:
+    a Server-Timing header, one JSON log line per request, and the
+    per-URL-name latency window behind /admin/stats/timings/.
+    Should be first in MIDDLEWARE so 'mw' covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # An async process_view is awaited in place instead of in a thread
+            self.process_view = self._aprocess_view
+        # Connections opened later get the SQL wrapper from connection_created
+        for connection in connections.all():
+            instrumentation.install_sql_wrapper(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started, timings, token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        return self._finish(request, response, started, timings)
+
+    async def __acall__(self, request):
+        started, timings, token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        return self._finish(request, response, started, timings)
+
+    @staticmethod
+    def _start(request):
+        started = time.perf_counter()
+        timings, token = instrumentation.start()
+        request._timing_view_started = None
+        return started, timings, token
+
+    def _finish(self, request, response, started, timings):
+        finished = time.perf_counter()
+        total = finished - started
+        view_started = request._timing_view_started
+        view = finished - view_started if view_started else 0.0
+
+        phases = {
+            'mw': total - view,
+            'view': view,
+            'db': timings.query_time,
+            'tpl': timings.phases.pop('template', 0.0),
+        }
+        phases.update(timings.phases)
+        phases['total'] = total
+
+        response['Server-Timing'] = ', '.join(
+            self._metric(name, seconds, timings.queries if name == 'db' else None)
+            for name, seconds in phases.items()
+        )
+
+        url_name = self._url_name(request)
+        instrumentation.latency.record(url_name, total)
+        timing_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'url_name': url_name,
+            'status': response.status_code,
+            'queries': timings.queries,
+            **{f'{name}_ms': round(seconds * 1000, 2) for name, seconds in phases.items()},
+        }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing_view_started = time.perf_counter()
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        request._timing_view_started = time.perf_counter()
+
+    @staticmethod
+    def _metric(name, seconds, queries=None):
+        metric = f'{name};dur={seconds * 1000:.2f}'
+        if queries is not None:
+            metric += f';desc="{queries} queries"'
+        return metric
+
+    @staticmethod
+    def _url_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None or not match.url_name:
+            return '<unresolved>'
+        return match.view_name
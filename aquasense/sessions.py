@@ -0,0 +1,95 @@
+"""
+Session engine for production: cache-first with database write-through.
+
+Built on Django's cached_db backend, so reads come from the shared cache and
+fall back to django_session, and every real change is written to both. On
+top of that it:
+
+* skips saves whose data is identical to what was loaded or last saved
+  (unless SESSION_SAVE_EVERY_REQUEST is on, since that setting relies on each
+  save to slide the expiry);
+* creates new sessions with a single INSERT. There is no exists() probe for
+  the random key, because a collision already fails the must_create INSERT
+  and is retried;
+* deletes rows with a single DELETE instead of a fetch followed by a delete;
+* cycles keys on login by deleting the old row and letting the end-of-request
+  save create the new one with its final data. Django's default inserts the
+  old data first and updates it right after;
+* purges expired rows in small batches (see reservations.housekeeping)
+  instead of one long DELETE.
+
+Only enable it with a shared cache (REDIS_URL). With a per-process cache,
+workers would serve each other stale sessions.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.base import VALID_KEY_CHARS
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+
+class SessionStore(cached_db.SessionStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._saved_digest = None
+
+    @staticmethod
+    def _digest(data):
+        return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+    def load(self):
+        data = super().load()
+        # load() drops the key when the session no longer exists
+        self._saved_digest = self._digest(data) if self.session_key else None
+        return data
+
+    def _get_new_session_key(self):
+        return get_random_string(32, VALID_KEY_CHARS)
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        digest = self._digest(data)
+        unchanged = self.session_key and digest == self._saved_digest
+        if not must_create and unchanged and not settings.SESSION_SAVE_EVERY_REQUEST:
+            return
+        super().save(must_create=must_create)
+        self._saved_digest = digest
+
+    def delete(self, session_key=None):
+        # One DELETE; the stock backend fetches the row first
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(self.cache_key_prefix + session_key)
+        self.model.objects.filter(session_key=session_key).delete()
+
+    def cycle_key(self):
+        data = self._session
+        key = self.session_key
+        # The next save() creates a fresh key holding the final data
+        self._session_key = None
+        self._session_cache = data
+        self._saved_digest = None
+        self.modified = True
+        if key:
+            self.delete(key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=None):
+        """Deletes expired rows `batch_size` at a time; returns how many went."""
+        batch_size = batch_size or settings.SESSION_PURGE_BATCH_SIZE
+        model = cls.get_model_class()
+        now = timezone.now()
+        removed = 0
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return removed
+            removed += model.objects.filter(session_key__in=keys).delete()[0]
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 # ==========================================
 
 MIDDLEWARE = [
+    # First, so its 'mw' phase covers everything below it
+    'aquasense.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,7 +52,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # whitenoise's own middleware is sync only, see aquasense/middleware.py
+    'aquasense.middleware.WhiteNoiseMiddleware',
     'aquasense.middleware.AdminRedirectMiddleware',
 ]
 
@@ -58,7 +61,8 @@ ROOT_URLCONF = 'aquasense.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for the Server-Timing header
+        'BACKEND': 'aquasense.instrumentation.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -72,6 +76,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'aquasense.wsgi.application'
+ASGI_APPLICATION = 'aquasense.asgi.application'
 
 # ==========================================
 #              DATABASE
@@ -95,6 +100,65 @@ DATABASES = {
 }
 
 # ... (باقي إعداداتك)
+# ==========================================
+#               CACHING
+# ==========================================
+
+# Local memory per worker by default; set REDIS_URL in production so every
+# worker shares the same entries (and sees the same invalidations).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'aquasense',
+        }
+    }
+
+# Seconds a cached catalog result set lives (it is also dropped on any change)
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 60 * 60))
+# Seconds clients may reuse a catalog API response before revalidating its ETag
+CATALOG_API_MAX_AGE = int(os.getenv('CATALOG_API_MAX_AGE', 60))
+
+# Full-page cache for anonymous visitors of the marketing pages (home/about/contact).
+# PAGE_CACHE_RELEASE is part of every key, so a new release id (e.g. the git
+# sha exported by the deploy) starts from an empty cache; `manage.py
+# purge_page_cache` does the same by hand.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 60 * 60))
+PAGE_CACHE_MAX_AGE = int(os.getenv('PAGE_CACHE_MAX_AGE', 5 * 60))
+PAGE_CACHE_RELEASE = os.getenv('RELEASE_VERSION', '')
+
+# Sessions: read from the shared cache and written through to the database
+# (see aquasense/sessions.py). That needs a cache every worker shares, so
+# without Redis the plain database engine is used.
+if os.environ.get('REDIS_URL'):
+    SESSION_ENGINE = 'aquasense.sessions'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Expired rows are purged in the background by run_jobs, in batches
+SESSION_PURGE_INTERVAL = int(os.getenv('SESSION_PURGE_INTERVAL', 60 * 60))
+SESSION_PURGE_BATCH_SIZE = int(os.getenv('SESSION_PURGE_BATCH_SIZE', 1000))
+
+# Token-bucket limits per endpoint and key (see reservations/ratelimit.py).
+# Buckets are per process unless REDIS_URL makes the cache shared.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMIT_STORE = 'cache' if os.environ.get('REDIS_URL') else 'local'
+RATE_LIMIT_CACHE = 'default'
+# e.g. 'HTTP_X_FORWARDED_FOR' when behind a proxy that sets it; empty trusts REMOTE_ADDR only
+RATE_LIMIT_IP_HEADER = os.getenv('RATE_LIMIT_IP_HEADER', '')
+RATE_LIMITS = {
+    'login': {'ip': '30/m', 'username': '10/m'},
+    'forgot_password': {'ip': '10/h', 'email': '3/h'},
+    'verify_otp': {'ip': '30/h', 'email': '10/h'},
+    'chat': {'ip': '30/m', 'session': '10/m'},
+}
+
 # ==========================================
 #             AUTHENTICATION
 # ==========================================
@@ -120,6 +184,13 @@ LOGOUT_REDIRECT_URL = 'home'
 
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Content-hashed builds (`manage.py build_tailwind`, `build_image_variants`)
+# never change, so WhiteNoise serves them with a one-year, immutable Cache-Control.
+WHITENOISE_IMMUTABLE_FILE_TEST = r'\.[0-9a-f]{12}\.(css|avif|webp)$'
+
+# Tailwind standalone CLI (v3, bundles the forms/container-queries plugins)
+TAILWIND_CLI = os.getenv('TAILWIND_CLI', 'tailwindcss')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # ==========================================
@@ -134,8 +205,33 @@ cloudinary.config(
     secure=True
 )
 
+# Memoized preset delivery URLs (reservations.cloudinary_urls)
+CLOUDINARY_URL_CACHE_SIZE = int(os.getenv('CLOUDINARY_URL_CACHE_SIZE', 4096))
+
 # Resend Email API
 RESEND_API_KEY = os.getenv('RESEND_API_KEY', 're_795aevhC_Gazmq9cbT9gidAW6n2SCvhRH')
+RESEND_API_URL = os.getenv('RESEND_API_URL', 'https://api.resend.com/emails')
+RESEND_CONNECT_TIMEOUT = float(os.getenv('RESEND_CONNECT_TIMEOUT', 3))
+RESEND_READ_TIMEOUT = float(os.getenv('RESEND_READ_TIMEOUT', 10))
+
+# Background jobs (run with `python manage.py run_jobs`)
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', 60))
+JOB_BACKOFF_BASE = int(os.getenv('JOB_BACKOFF_BASE', 10))
+JOB_BACKOFF_MAX = int(os.getenv('JOB_BACKOFF_MAX', 15 * 60))
+
+# Gemini AI Dive Advisor (conversations are kept per worker, see reservations/chatbot.py)
+CHAT_MAX_SESSIONS = int(os.getenv('CHAT_MAX_SESSIONS', 1000))
+CHAT_SESSION_TTL = int(os.getenv('CHAT_SESSION_TTL', 30 * 60))
+CHAT_MAX_HISTORY_TURNS = int(os.getenv('CHAT_MAX_HISTORY_TURNS', 10))
+# Per-worker cap on in-flight Gemini calls, plus a short wait queue behind it
+CHAT_MAX_CONCURRENCY = int(os.getenv('CHAT_MAX_CONCURRENCY', 8))
+CHAT_MAX_QUEUE = int(os.getenv('CHAT_MAX_QUEUE', 16))
+CHAT_QUEUE_TIMEOUT = float(os.getenv('CHAT_QUEUE_TIMEOUT', 5))
+CHAT_RETRY_AFTER = int(os.getenv('CHAT_RETRY_AFTER', 5))
+# Cached answers to common first questions (dropped whenever courses change)
+CHAT_ANSWER_CACHE_SIZE = int(os.getenv('CHAT_ANSWER_CACHE_SIZE', 500))
+CHAT_ANSWER_CACHE_TTL = int(os.getenv('CHAT_ANSWER_CACHE_TTL', 6 * 60 * 60))
 
 # Security
 CSRF_TRUSTED_ORIGINS = [
@@ -172,5 +268,12 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        # One JSON line per request from ServerTimingMiddleware, at INFO;
+        # set TIMING_LOG_LEVEL=INFO to see them
+        'aquasense.timing': {
+            'handlers': ['console'],
+            'level': os.getenv('TIMING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
     },
 }
@@ -17,7 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from reservations import views as reservation_views
+
 urlpatterns = [
+    # Staff-only stats live under /admin/ so AdminRedirectMiddleware lets staff through
+    path('admin/stats/catalog-cache/', reservation_views.catalog_cache_stats, name='catalog_cache_stats'),
+    path('admin/stats/chat-cache/', reservation_views.chat_cache_stats, name='chat_cache_stats'),
+    path('admin/stats/timings/', reservation_views.request_timing_stats, name='request_timing_stats'),
     path('admin/', admin.site.urls),
     path('', include('reservations.urls')),
 ]
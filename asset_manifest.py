@@ -0,0 +1,36 @@
+"""
+Local JSON manifests shared by the asset scripts (download_images.py and
+cloudinary_helper.py): content hashes plus whatever per-file state a script
+needs to skip unchanged work on its next run.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """The manifest at `manifest_path`, or {} if it is missing or unreadable."""
+    try:
+        return json.loads(Path(manifest_path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, manifest_path):
+    """Writes the manifest atomically so a crash never leaves it half-written."""
+    manifest_path = Path(manifest_path)
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp_path, manifest_path)
@@ -3,14 +3,27 @@ Cloudinary Helper Utility for AquaSense Project
 
 This script helps upload images from the local static directory to Cloudinary
 and provides helper functions for managing images on Cloudinary CDN.
+
+Syncs run uploads in parallel on a bounded thread pool. A local manifest
+records the content hash of every uploaded file, so unchanged files are
+skipped and an interrupted sync resumes where it stopped.
 """
 
+import argparse
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
 import cloudinary
 import cloudinary.uploader
 from pathlib import Path
 from dotenv import load_dotenv
 
+from asset_manifest import file_sha256, load_manifest, save_manifest
+
 # Load environment variables
 load_dotenv()
 
@@ -25,6 +38,11 @@ cloudinary.config(
 # Base directory for images
 BASE_DIR = Path(__file__).resolve().parent
 IMAGES_DIR = BASE_DIR / 'reservations' / 'static' / 'reservations' / 'images'
+MANIFEST_PATH = BASE_DIR / '.cloudinary-manifest.json'
+
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0  # seconds, doubled on every retry
 
 
 def upload_image(image_path, public_id=None):
@@ -58,10 +76,14 @@ def upload_image(image_path, public_id=None):
         return None
 
 
-def upload_all_images():
+def upload_all_images(workers=DEFAULT_WORKERS, force=False):
     """
     Upload all images from the static images directory to Cloudinary
     
+    Args:
+        workers: Number of parallel uploads (1 uploads one file at a time)
+        force: Re-upload files even if the manifest says they are unchanged
+    
     Returns:
         dict: Mapping of filename to Cloudinary URL
     """
@@ -69,23 +91,110 @@ def upload_all_images():
         print(f"Error: Images directory not found at {IMAGES_DIR}")
         return {}
     
-    image_mapping = {}
-    image_files = list(IMAGES_DIR.glob('*.jpg')) + list(IMAGES_DIR.glob('*.png'))
+    image_files = sorted(IMAGES_DIR.glob('*.jpg')) + sorted(IMAGES_DIR.glob('*.png'))
     
-    print(f"\nUploading {len(image_files)} images to Cloudinary...\n")
+    print(f"\nSyncing {len(image_files)} images to Cloudinary ({workers} workers)...\n")
+    report = sync_images(image_files, workers=workers, force=force)
+    print_report(report)
     
-    for image_path in image_files:
-        result = upload_image(str(image_path))
-        if result:
-            image_mapping[image_path.name] = result['secure_url']
+    return report['urls']
+
+
+# ==========================================
+#          PARALLEL, DEDUPLICATED SYNC
+# ==========================================
+
+def cloudinary_upload(image_path, public_id):
+    """Default upload function: same options as upload_image(), raises on failure."""
+    return cloudinary.uploader.upload(
+        str(image_path),
+        public_id=f"aquasense/{public_id}",
+        folder="aquasense",
+        overwrite=True,
+        resource_type="image"
+    )
+
+
+def _upload_with_retry(upload, image_path, public_id, retries, backoff, sleep):
+    for attempt in range(retries + 1):
+        try:
+            return upload(image_path, public_id)
+        except Exception:
+            if attempt == retries:
+                raise
+            # Exponential backoff with jitter so parallel workers don't retry in lockstep
+            sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+
+
+def sync_images(image_files, upload=cloudinary_upload, workers=DEFAULT_WORKERS,
+                retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, force=False,
+                manifest_path=MANIFEST_PATH, sleep=time.sleep):
+    """
+    Upload `image_files` in parallel, skipping files whose content hash
+    matches the manifest. Every success is written to the manifest straight
+    away, so re-running after a failure only uploads what is left.
+    
+    `upload(path, public_id)` must return a dict with 'secure_url' or raise;
+    pass a stand-in to run without Cloudinary.
+    
+    Returns:
+        dict: 'uploaded', 'skipped' (lists of filenames), 'failed'
+        (filename -> error), 'urls' (filename -> URL) and 'seconds'
+    """
+    started = time.perf_counter()
+    manifest = load_manifest(manifest_path)
+    lock = threading.Lock()
+    report = {'uploaded': [], 'skipped': [], 'failed': {}, 'urls': {}}
+    
+    pending = []
+    for image_path in map(Path, image_files):
+        digest = file_sha256(image_path)
+        entry = manifest.get(image_path.name)
+        if not force and entry and entry.get('sha256') == digest:
+            report['skipped'].append(image_path.name)
+            report['urls'][image_path.name] = entry['secure_url']
+        else:
+            pending.append((image_path, digest))
     
-    print(f"\n✓ Successfully uploaded {len(image_mapping)} images")
-    print("\nImage URL Mapping:")
+    def work(image_path, digest):
+        result = _upload_with_retry(upload, image_path, image_path.stem, retries, backoff, sleep)
+        with lock:
+            manifest[image_path.name] = {
+                'sha256': digest,
+                'public_id': result.get('public_id'),
+                'secure_url': result['secure_url'],
+                'uploaded_at': datetime.now(timezone.utc).isoformat(),
+            }
+            save_manifest(manifest, manifest_path)
+        return result['secure_url']
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(work, path, digest): path for path, digest in pending}
+        for future in as_completed(futures):
+            name = futures[future].name
+            try:
+                report['urls'][name] = future.result()
+                report['uploaded'].append(name)
+                print(f"✓ Uploaded: {name}")
+            except Exception as e:
+                report['failed'][name] = str(e)
+                print(f"✗ Failed to upload {name}: {e}")
+    
+    report['seconds'] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def print_report(report):
+    print("\n" + "-" * 80)
+    print(f"Uploaded: {len(report['uploaded'])}   Unchanged (skipped): {len(report['skipped'])}   "
+          f"Failed: {len(report['failed'])}   Time: {report['seconds']}s")
+    for filename, error in sorted(report['failed'].items()):
+        print(f"  ✗ {filename}: {error}")
+    if report['failed']:
+        print("Re-run to retry the failed files; completed uploads are not repeated.")
     print("-" * 80)
-    for filename, url in image_mapping.items():
+    for filename, url in sorted(report['urls'].items()):
         print(f"{filename:30} -> {url}")
-    
-    return image_mapping
 
 
 def get_cloudinary_url(public_id, transformations=None):
@@ -108,6 +217,11 @@ def get_cloudinary_url(public_id, transformations=None):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the static images to Cloudinary")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Parallel uploads (1 = sequential)")
+    parser.add_argument('--force', action='store_true', help="Re-upload unchanged files too")
+    args = parser.parse_args()
+
     print("=" * 80)
     print("AquaSense - Cloudinary Image Upload Utility")
     print("=" * 80)
@@ -126,7 +240,7 @@ if __name__ == "__main__":
         exit(1)
     
     # Upload all images
-    upload_all_images()
+    upload_all_images(workers=args.workers, force=args.force)
     
     print("\n" + "=" * 80)
     print("Upload complete! You can now update your templates with Cloudinary URLs.")
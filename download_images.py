@@ -1,5 +1,39 @@
+"""
+Fetches the bundled static images into reservations/static/reservations/images.
+
+Downloads run concurrently over one pooled session and stream to a temp
+file in the target directory. Each file is renamed into place only once it
+is complete and its checksum is recorded, so memory stays flat and a crash
+never leaves a truncated image. A manifest keeps each file's ETag,
+Last-Modified and SHA-256. Later runs send conditional requests and only
+download what changed upstream (or what no longer matches its checksum
+locally).
+"""
+
+import argparse
+import hashlib
 import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from asset_manifest import file_sha256, load_manifest, save_manifest
+
+BASE_DIR = Path(__file__).resolve().parent
+OUTPUT_DIR = BASE_DIR / 'reservations' / 'static' / 'reservations' / 'images'
+MANIFEST_PATH = BASE_DIR / '.download-manifest.json'
+
+DEFAULT_WORKERS = 8
+CHUNK_SIZE = 64 * 1024
+TIMEOUT = (5, 30)  # connect, read
+# Mode for new images, before the process umask is applied, so the web
+# server and collectstatic can read them
+FILE_MODE = 0o644
 
 images = {
     "hero_bg.jpg": "https://lh3.googleusercontent.com/aida-public/AB6AXuCKGYeHTfN0YbTIRP-VAutTHvLMwOSEDtTEttCDF4xJmB1C1f1M80wrQYNplnN2q2-XOddprnsbvUgLFMZ7XUp5aMsZ-mI_9ePCktIQ1oKMuYaViFTDaK8zRx-pTgRL23iB6ZR46RMJT_tCpy3plL2wShKhlJECL6OOOa_E-4ebCPIpAWxSEJtA9aRIiLloHBjPvQO5mD273nNR3G38aKGpvuJcQrmDD9Ecul4FkjfeujiMvbrvZvQiGCgOf8hBRqs1ZEY6f3EoQBOE",
@@ -19,14 +53,135 @@ images = {
     "checkout_thumb.jpg": "https://lh3.googleusercontent.com/aida-public/AB6AXuAPkDBzz19KVSBUSfE6Taa5HWS8Q8jG-ZQVf8dIlOfHpAj38-LYTCt4XRuvykQL-QJuOFZSICNHcHOOsprseKfemR0nX_qBru_y_VM0yaO3ZouhBIlaEZ2wQlWKMvX1ZNy_jMO4ZFZ3tFdtLBTSEnbO0Xkdw96zSuq3NcpbFBo4ru_xPBZ79Rc2ywyHcrQ2uw1xyTb08nLGGATY9lhZb7jMTa8EG6YWuYFOje4wQzC30jaLXnDc9FohlV8ESKoUygqPL4XkdYO2xIhT"
 }
 
-output_dir = "reservations/static/reservations/images"
+# Optional pins: filename -> expected SHA-256 of the downloaded bytes
+EXPECTED_SHA256 = {}
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def make_session(workers=DEFAULT_WORKERS):
+    """One keep-alive connection pool shared by every worker, with retries on transient errors."""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _create_part(output_dir, filename):
+    """Opens a fresh temp file next to the target, created with FILE_MODE."""
+    while True:
+        tmp_name = os.path.join(output_dir, f'.{filename}.{secrets.token_hex(8)}.part')
+        try:
+            return os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, FILE_MODE), tmp_name
+        except FileExistsError:
+            continue
 
-for filename, url in images.items():
-    try:
-        response = requests.get(url)
+
+def _conditional_headers(target, entry, url):
+    """Validators from the last download, if the local copy is still intact."""
+    if not entry or entry.get('url') != url or not target.exists():
+        return {}
+    if file_sha256(target) != entry.get('sha256'):
+        return {}
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def fetch(session, filename, url, output_dir, entry=None, expected_sha256=None):
+    """
+    Downloads one file unless the server says it is unchanged.
+    Returns ('unchanged' | 'downloaded', manifest entry).
+    """
+    target = Path(output_dir) / filename
+    headers = _conditional_headers(target, entry, url)
+    with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        if response.status_code == 304:
+            if not headers:
+                raise requests.HTTPError(f'{filename}: 304 for an unconditional request', response=response)
+            return 'unchanged', entry
         response.raise_for_status()
-        with open(os.path.join(output_dir, filename), 'wb') as f:
-            f.write(response.content)
+
+        digest, size = hashlib.sha256(), 0
+        fd, tmp_name = _create_part(output_dir, filename)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    tmp.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            expected_size = response.headers.get('Content-Length')
+            if expected_size is not None and 'Content-Encoding' not in response.headers and int(expected_size) != size:
+                raise ChecksumMismatch(f'{filename}: got {size} bytes, expected {expected_size}')
+            if expected_sha256 and digest.hexdigest() != expected_sha256:
+                raise ChecksumMismatch(f'{filename}: SHA-256 {digest.hexdigest()} != {expected_sha256}')
+            os.replace(tmp_name, target)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+
+        return 'downloaded', {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': digest.hexdigest(),
+            'size': size,
+        }
+
+
+def download_all(assets=images, output_dir=OUTPUT_DIR, manifest_path=MANIFEST_PATH,
+                 workers=DEFAULT_WORKERS, force=False, checksums=EXPECTED_SHA256, session=None):
+    """
+    Fetches every asset concurrently. Returns a report with 'downloaded',
+    'unchanged' (lists of filenames) and 'failed' (filename -> error).
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {} if force else load_manifest(manifest_path)
+    session = session or make_session(workers)
+    lock = threading.Lock()
+    report = {'downloaded': [], 'unchanged': [], 'failed': {}}
+
+    def work(filename, url):
+        state, entry = fetch(session, filename, url, output_dir, manifest.get(filename), checksums.get(filename))
+        with lock:
+            manifest[filename] = entry
+            save_manifest(manifest, manifest_path)
+        return state
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(work, filename, url): filename for filename, url in assets.items()}
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                report[future.result()].append(filename)
+            except Exception as e:
+                report['failed'][filename] = str(e)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch the bundled static images')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and re-download everything')
+    parser.add_argument('--output-dir', default=str(OUTPUT_DIR))
+    args = parser.parse_args()
+
+    report = download_all(output_dir=args.output_dir, workers=args.workers, force=args.force)
+    for filename in sorted(report['downloaded']):
         print(f"Downloaded {filename}")
-    except Exception as e:
-        print(f"Failed to download {filename}: {e}")
+    for filename, error in sorted(report['failed'].items()):
+        print(f"Failed to download {filename}: {error}")
+    print(f"{len(report['downloaded'])} downloaded, {len(report['unchanged'])} unchanged, "
+          f"{len(report['failed'])} failed")
+    raise SystemExit(1 if report['failed'] else 0)
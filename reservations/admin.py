@@ -1,5 +1,13 @@
-from django.contrib import admin
-from .models import Course, Instructor, Reservation, UserProfile
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Lower
+
+from . import availability, exports, rollups
+from .pagination import EstimatedCountPaginator, InvalidCursor, decode_cursor, encode_cursor, seek
+from .models import Course, Instructor, Job, Reservation, RevenueRollup, SeatCounter, UserProfile
 
 # ==========================================
 #           COURSE & INSTRUCTOR
@@ -7,7 +15,7 @@ from .models import Course, Instructor, Reservation, UserProfile
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ('title', 'price', 'difficulty', 'is_popular', 'created_at')
+    list_display = ('title', 'price', 'difficulty', 'daily_capacity', 'is_popular', 'created_at')
     list_filter = ('difficulty', 'is_popular')
     search_fields = ('title', 'description')
 
@@ -19,22 +27,209 @@ class InstructorAdmin(admin.ModelAdmin):
 #           BOOKINGS & ACTIONS
 # ==========================================
 
+class KeysetChangeList(ChangeList):
+    """
+    Changelist that pages with a (booking_date, id) cursor instead of OFFSET
+    while the default ordering is in use; sorting by a column falls back to
+    regular (estimated-count) page numbers.
+    """
+    CURSOR_VAR = 'after'
+    keys = ('booking_date', 'id')
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(self.CURSOR_VAR)
+        self.next_cursor = None
+        if self.cursor is not None:
+            # Hide the cursor from the lookup-parameter validation
+            request.GET = request.GET.copy()
+            del request.GET[self.CURSOR_VAR]
+        super().__init__(request, *args, **kwargs)
+
+    @property
+    def keyset_mode(self):
+        return ORDER_VAR not in self.params
+
+    def get_results(self, request):
+        if not self.keyset_mode:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset.order_by(*[f'-{key}' for key in self.keys])
+        if self.cursor:
+            try:
+                values = decode_cursor(self.cursor, self.model, self.keys)
+            except InvalidCursor:
+                raise admin.options.IncorrectLookupParameters
+            queryset = queryset.filter(seek(self.keys, values, 'lt'))
+        rows = list(queryset[:self.list_per_page + 1])
+
+        self.result_list = rows[:self.list_per_page]
+        if len(rows) > self.list_per_page:
+            last = self.result_list[-1]
+            self.next_cursor = encode_cursor([getattr(last, key) for key in self.keys])
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.can_show_all = False
+        self.show_all = False
+        self.multi_page = bool(self.cursor or self.next_cursor)
+        self.paginator = paginator
+
+    def get_next_url(self):
+        return self.get_query_string({self.CURSOR_VAR: self.next_cursor})
+
+    def get_first_url(self):
+        return self.get_query_string(remove=[self.CURSOR_VAR])
+
+
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
     list_display = ('user', 'course', 'status', 'booking_date', 'scheduled_date', 'full_name', 'phone_number', 'number_of_divers')
-    list_filter = ('status', 'booking_date')
-    actions = ['approve_reservations', 'reject_reservations']
+    # No 'course' filter: it would load and render every course on each page;
+    # an exact course slug in the search box narrows to one course instead
+    list_filter = ('status', 'scheduled_date', 'booking_date')
+    actions = ['approve_reservations', 'reject_reservations', 'export_csv', 'export_ndjson']
+
+    # --- Keep the changelist cheap on very large tables ---
+    list_select_related = ('user', 'course')
+    date_hierarchy = 'booking_date'
+    ordering = ('-booking_date', '-id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Searched by get_search_results() below, one index per branch
+    search_fields = ('email', 'user__username', 'full_name', 'course__slug')
+    search_help_text = 'Exact email, username or course slug, or the beginning of the full name.'
+    # The change form would otherwise render every user and course as <option>s
+    raw_id_fields = ('user', 'course')
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Index-backed search instead of the UPPER(col) comparisons admin search
+        compiles to: lower(email) equality and a lower(full_name) range (the
+        prefix), both on functional indexes, plus the users/courses resolved
+        first through their unique username/slug indexes.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        lowered = term.lower()
+        user_ids = list(User.objects.filter(username=term).values_list('pk', flat=True))
+        course_ids = list(Course.objects.filter(slug=lowered).values_list('pk', flat=True))
+        condition = (
+            Q(email_lower=lowered)
+            | Q(full_name_lower__gte=lowered, full_name_lower__lt=lowered + '\U0010ffff')
+            | Q(user_id__in=user_ids)
+            | Q(course_id__in=course_ids)
+        )
+        queryset = queryset.alias(email_lower=Lower('email'), full_name_lower=Lower('full_name'))
+        return queryset.filter(condition), False
 
     @admin.action(description='Approve selected reservations')
     def approve_reservations(self, request, queryset):
-        queryset.update(status='Confirmed')
+        refused = []
+        with transaction.atomic():
+            # Re-approved cancellations take their seats back, within capacity
+            cancelled = queryset.filter(status='Cancelled').exclude(scheduled_date=None).select_related('course')
+            for reservation in cancelled:
+                try:
+                    availability.reserve_seats(
+                        reservation.course, reservation.scheduled_date, reservation.number_of_divers
+                    )
+                except availability.SoldOut:
+                    refused.append(reservation)
+            approved = queryset.exclude(pk__in=[reservation.pk for reservation in refused])
+            # update() skips signals, so move the rollups explicitly
+            rollups.move(approved, 'Confirmed')
+            approved.update(status='Confirmed')
+        if refused:
+            self.message_user(request, "Approved, except these cancellations whose dates are now full: " + ", ".join(
+                f"#{reservation.pk} ({reservation.course} on {reservation.scheduled_date})" for reservation in refused
+            ), messages.WARNING)
+            return
         self.message_user(request, "Selected reservations have been approved.")
 
     @admin.action(description='Reject selected reservations')
     def reject_reservations(self, request, queryset):
-        queryset.update(status='Cancelled')
+        with transaction.atomic():
+            availability.release(queryset)
+            rollups.move(queryset, 'Cancelled')
+            queryset.update(status='Cancelled')
         self.message_user(request, "Selected reservations have been rejected.")
 
+    # Streamed while being downloaded; pick "Select all" to export the whole filtered changelist
+    @admin.action(description='Export selected reservations as CSV')
+    def export_csv(self, request, queryset):
+        return exports.streaming_response(queryset, 'csv')
+
+    @admin.action(description='Export selected reservations as NDJSON')
+    def export_ndjson(self, request, queryset):
+        return exports.streaming_response(queryset, 'ndjson')
+
+    # Keep seat counters in step with edits made through the admin forms
+    # (deletes give their seats back in reservations.signals)
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if change:
+                availability.release(Reservation.objects.filter(pk=obj.pk))
+            super().save_model(request, obj, form, change)
+            availability.hold(Reservation.objects.filter(pk=obj.pk))
+
+
+@admin.register(SeatCounter)
+class SeatCounterAdmin(admin.ModelAdmin):
+    list_display = ('course', 'date', 'booked', 'capacity')
+    search_fields = ('course__slug__exact',)
+    search_help_text = 'Exact course slug.'
+    date_hierarchy = 'date'
+    list_select_related = ('course',)
+    readonly_fields = ('booked',)
+
+# ==========================================
+#                 REPORTS
+# ==========================================
+
+@admin.register(RevenueRollup)
+class RevenueRollupAdmin(admin.ModelAdmin):
+    """
+    Revenue and divers per course and month, read only from the rollups
+    (reservations.rollups). Totals and the monthly summary follow the filters.
+    """
+    list_display = ('month_label', 'course', 'status', 'reservations', 'divers', 'revenue')
+    list_filter = ('status',)
+    search_fields = ('course__slug__exact',)
+    search_help_text = 'Exact course slug.'
+    list_select_related = ('course',)
+    date_hierarchy = 'month'
+    ordering = ('-month', 'course__title', 'status')
+    list_per_page = 200
+
+    @admin.display(description='Month', ordering='month')
+    def month_label(self, obj):
+        return obj.month.strftime('%Y-%m')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        cl = getattr(response, 'context_data', {}).get('cl')
+        if cl is not None:
+            sums = {'reservations': Sum('reservations'), 'divers': Sum('divers'), 'revenue': Sum('revenue')}
+            rollups = cl.queryset.order_by()
+            response.context_data['totals'] = rollups.aggregate(**sums)
+            response.context_data['by_month'] = rollups.values('month').annotate(**sums).order_by('-month')
+        return response
+
 # ==========================================
 #              USER PROFILES
 # ==========================================
@@ -42,3 +237,13 @@ class ReservationAdmin(admin.ModelAdmin):
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone_number', 'certification_level')
+
+# ==========================================
+#            BACKGROUND JOBS
+# ==========================================
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error',)
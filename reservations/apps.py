@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ReservationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reservations'
+
+    def ready(self):
+        # Register signal handlers (search index, cache invalidation, ...)
+        from . import signals  # noqa: F401
+        # Register background job handlers
+        from . import emails, housekeeping  # noqa: F401
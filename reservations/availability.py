@@ -0,0 +1,172 @@
+"""
+Per-course, per-date seat capacity.
+
+Every dated, non-cancelled reservation holds `number_of_divers` seats in the
+SeatCounter row for its (course, scheduled_date). Seats are taken with a
+single conditional UPDATE (booked + n <= capacity), so concurrent bookings
+can never oversell a date, and availability is read straight from the
+counters instead of aggregating Reservation rows. Deleted reservations
+(directly or through a cascade, e.g. from their User) give their seats back
+in a post_delete handler; status changes made with queryset.update() must
+call release()/hold() themselves.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Reservation, SeatCounter
+
+MAX_WINDOW_DAYS = 366
+
+
+class SoldOut(Exception):
+    """Raised when a date doesn't have enough free seats left."""
+
+    def __init__(self, course, date, seats):
+        super().__init__(f"Not enough seats for {course} on {date} ({seats} requested)")
+        self.course = course
+        self.date = date
+        self.seats = seats
+
+
+class DateInPast(ValueError):
+    """Raised when booking a date that has already gone by."""
+
+# ==========================================
+#               SEAT ACCOUNTING
+# ==========================================
+
+def _counter(course, date):
+    counter, _ = SeatCounter.objects.get_or_create(
+        course=course, date=date,
+        defaults={'capacity': course.daily_capacity},
+    )
+    return counter
+
+
+def reserve_seats(course, date, seats):
+    """Takes `seats` on `date` or raises SoldOut. Never exceeds capacity."""
+    _counter(course, date)
+    taken = SeatCounter.objects.filter(
+        course=course, date=date, booked__lte=F('capacity') - seats,
+    ).update(booked=F('booked') + seats)
+    if not taken:
+        raise SoldOut(course, date, seats)
+
+
+def book(course, date, seats, **fields):
+    """
+    Creates a Reservation, taking its seats first when it has a date.
+    Raises DateInPast for dates before today and SoldOut for full ones.
+    """
+    if date and date < timezone.localdate():
+        raise DateInPast(date)
+    with transaction.atomic():
+        if date:
+            reserve_seats(course, date, seats)
+        return Reservation.objects.create(
+            course=course, scheduled_date=date, number_of_divers=seats, **fields
+        )
+
+
+def _grouped_seats(reservations):
+    return (
+        reservations.exclude(status='Cancelled')
+        .exclude(scheduled_date=None)
+        .values('course_id', 'scheduled_date', 'course__daily_capacity')
+        .annotate(seats=Sum('number_of_divers'))
+        .order_by()
+    )
+
+
+def _give_back(course_id, date, seats):
+    counters = SeatCounter.objects.filter(course_id=course_id, date=date)
+    if not counters.filter(booked__gte=seats).update(booked=F('booked') - seats):
+        # Seats taken before the counter existed were never charged to it
+        counters.filter(booked__lt=seats).update(booked=0)
+
+
+def release(reservations):
+    """
+    Gives back the seats held by `reservations` (e.g. before cancelling them).
+    Counters never go below zero, even for reservations they never counted.
+    """
+    for row in _grouped_seats(reservations):
+        _give_back(row['course_id'], row['scheduled_date'], row['seats'])
+
+
+def release_deleted(reservation):
+    """Gives back the seats of a reservation that was just deleted (post_delete)."""
+    if reservation.status != 'Cancelled' and reservation.scheduled_date:
+        _give_back(reservation.course_id, reservation.scheduled_date, reservation.number_of_divers)
+
+
+def hold(reservations):
+    """
+    Charges the seats of `reservations` without a capacity check.
+    Used for admin form edits, where staff may deliberately overbook.
+    """
+    for row in _grouped_seats(reservations):
+        counter, _ = SeatCounter.objects.get_or_create(
+            course_id=row['course_id'], date=row['scheduled_date'],
+            defaults={'capacity': row['course__daily_capacity']},
+        )
+        SeatCounter.objects.filter(pk=counter.pk).update(booked=F('booked') + row['seats'])
+
+
+def rebuild_counters(batch_size=5000):
+    """
+    Recomputes every counter from the Reservation table, e.g. after a bulk
+    load that bypassed book()/hold(). Capacities already set are kept.
+    """
+    capacities = dict(
+        ((course_id, date), capacity)
+        for course_id, date, capacity in SeatCounter.objects.values_list('course_id', 'date', 'capacity')
+    )
+    counters = [
+        SeatCounter(
+            course_id=row['course_id'],
+            date=row['scheduled_date'],
+            capacity=capacities.get((row['course_id'], row['scheduled_date']), row['course__daily_capacity']),
+            booked=row['seats'],
+        )
+        for row in _grouped_seats(Reservation.objects.all())
+    ]
+    with transaction.atomic():
+        SeatCounter.objects.all().delete()
+        SeatCounter.objects.bulk_create(counters, batch_size=batch_size)
+    return len(counters)
+
+# ==========================================
+#                AVAILABILITY
+# ==========================================
+
+def availability(course, start=None, days=90):
+    """
+    Free seats per date for `course` over `days` days from `start` (today by
+    default), answered from one range scan over the counters.
+    """
+    start = start or timezone.localdate()
+    days = max(1, min(days, MAX_WINDOW_DAYS))
+    end = start + timedelta(days=days - 1)
+
+    counters = {
+        counter.date: counter
+        for counter in SeatCounter.objects.filter(course=course, date__range=(start, end))
+    }
+    calendar = []
+    for offset in range(days):
+        date = start + timedelta(days=offset)
+        counter = counters.get(date)
+        capacity = counter.capacity if counter else course.daily_capacity
+        booked = counter.booked if counter else 0
+        calendar.append({
+            'date': date,
+            'capacity': capacity,
+            'booked': booked,
+            'free': max(capacity - booked, 0),
+        })
+    return calendar
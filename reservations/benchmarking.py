@@ -0,0 +1,37 @@
+"""
+Scaffolding shared by the benchmark_* management commands: the synthetic
+dataset options and seeding, and a transaction that is always rolled back
+so a benchmark never leaves data behind.
+"""
+
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .synthetic import Generator
+
+
+def add_dataset_arguments(parser, users, courses, reservations):
+    """--users/--courses/--reservations/--seed with the command's own defaults."""
+    parser.add_argument('--users', type=int, default=users)
+    parser.add_argument('--courses', type=int, default=courses)
+    parser.add_argument('--reservations', type=int, default=reservations)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def seed_dataset(stdout, users, courses, reservations, seed):
+    """Generates the seeded dataset, logging to `stdout`; returns Generator.generate()'s ids."""
+    stdout.write(
+        f"Seeding {users} users, {courses} courses, {reservations} reservations (seed={seed})..."
+    )
+    return Generator(seed=seed, log=stdout.write).generate(
+        courses=courses, users=users, reservations=reservations,
+    )
+
+
+@contextmanager
+def rolled_back():
+    """Runs the block in a transaction that is rolled back however it exits."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
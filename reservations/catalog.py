@@ -0,0 +1,123 @@
+"""
+Cached course catalog result sets.
+
+Each (q, difficulty, price_range) combination is stored as an ordered list of
+card dicts under a key that embeds the catalog version. Any Course/Instructor
+change bumps the version (see reservations.signals), so stale entries are
+never read again and simply age out of the cache.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.text import Truncator
+
+from . import cloudinary_urls
+from .models import Course
+from .versioning import CacheVersion
+
+# ==========================================
+#              CONFIGURATION
+# ==========================================
+
+VERSION_KEY = 'catalog:version'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+_version = CacheVersion(VERSION_KEY)
+
+PRICE_RANGES = ('low', 'mid', 'high')
+DIFFICULTIES = [choice for choice, _ in Course.DIFFICULTY_CHOICES]
+
+# ==========================================
+#               KEYS & VERSION
+# ==========================================
+
+def normalize_filters(query, difficulty, price_range):
+    """Collapses equivalent filter inputs onto one canonical tuple."""
+    query = ' '.join((query or '').lower().split()) or None
+    if difficulty not in DIFFICULTIES:
+        difficulty = None
+    if price_range not in PRICE_RANGES:
+        price_range = None
+    return query, difficulty, price_range
+
+
+def get_version():
+    """Current catalog version; starts at 1 on an empty cache."""
+    return _version.get()
+
+
+async def aget_version():
+    """Async counterpart of get_version() for async views."""
+    return await _version.aget()
+
+
+def bump_version():
+    """Invalidates every cached result set in one step."""
+    _version.bump()
+
+
+def _cache_key(filters):
+    query, difficulty, price_range = filters
+    return f"catalog:v{get_version()}:{query}|{difficulty}|{price_range}"
+
+# ==========================================
+#               RESULT SETS
+# ==========================================
+
+def build_card(course):
+    """The subset of a Course the catalog page actually renders."""
+    return {
+        'id': course.pk,
+        'slug': course.slug,
+        'title': course.title,
+        'description': Truncator(course.description).chars(100),
+        'price': course.price,
+        'image_url': cloudinary_urls.image_url(course.image, 'card'),
+    }
+
+
+def get_cards(filters, build):
+    """
+    Returns the card list for normalized `filters`, calling `build()`
+    (which must return an ordered iterable of Course objects) on a miss.
+    """
+    key = _cache_key(filters)
+    cards = cache.get(key)
+    if cards is not None:
+        _count(HITS_KEY)
+        return cards
+
+    _count(MISSES_KEY)
+    cards = [build_card(course) for course in build()]
+    cache.set(key, cards, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    return cards
+
+# ==========================================
+#                  METRICS
+# ==========================================
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # First event (or evicted counter): seed it without racing a peer
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    """Hit/miss counters and hit rate since the counters were last reset."""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+        'version': get_version(),
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
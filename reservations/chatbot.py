@@ -0,0 +1,456 @@
+"""
+Gemini client and server-side conversation sessions for the AI Dive Advisor.
+
+The GenerativeModel is configured per worker process and carries the system
+prompt as its system instruction. The prompt lists the courses from the
+database, so the model is rebuilt whenever the catalog version changes. Each visitor's ChatSession lives in
+an in-process LRU/TTL store keyed by their Django session key, so follow-up
+messages continue the same conversation instead of re-priming a new one.
+
+First-turn questions are looked up in an AnswerCache before going upstream.
+Keys are the normalized question plus the catalog version the conversation's
+prompt was built from, so any course change (see reservations.catalog)
+retires old answers in every worker.
+
+Upstream calls use the async Gemini API and pass through UpstreamLimiter,
+which caps in-flight requests per worker and rejects early once its wait
+queue is full. It is meant for ASGI, where a worker runs a single event loop.
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import google.generativeai as genai
+from cachetools import TTLCache
+from django.conf import settings
+
+from aquasense.instrumentation import timed
+
+from . import catalog
+from .models import Course
+
+# ==========================================
+#              CONFIGURATION
+# ==========================================
+
+MODEL_NAME = 'gemini-2.5-flash'
+
+SYSTEM_PROMPT = """
+You are the AI Dive Advisor for AquaSense, a premier diving center.
+Your goal is to be helpful, friendly, and professional.
+
+Info:
+- Location: Cairo , Egypt.
+- Contact: +1 (123) 456-7890.
+
+Courses:
+{courses}
+
+Keep responses concise.
+"""
+
+
+class ChatbotNotConfigured(Exception):
+    """Raised when GEMINI_API_KEY is missing."""
+
+
+class ChatbotBusy(Exception):
+    """Raised when the upstream limiter has no free slot and its queue is full."""
+
+# ==========================================
+#              MODEL REGISTRY
+# ==========================================
+
+# (catalog version, GenerativeModel), swapped as one tuple so readers never
+# pair a model with the wrong version
+_model = None
+_model_lock = threading.Lock()
+
+
+def build_system_prompt(courses):
+    """SYSTEM_PROMPT with `courses` (dicts of title/price/difficulty) filled in."""
+    lines = [
+        f"{number}. {course['title']}: ${_price(course['price'])} ({course['difficulty']})"
+        for number, course in enumerate(courses, 1)
+    ]
+    return SYSTEM_PROMPT.format(courses='\n'.join(lines) or "- No courses are currently scheduled.")
+
+
+def _price(value):
+    return f"{value:.2f}".removesuffix('.00')
+
+
+async def get_model(version):
+    """
+    Returns the worker's shared GenerativeModel for catalog `version`,
+    rebuilding it with the current course list when the version has moved.
+    """
+    global _model
+    cached = _model
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ChatbotNotConfigured("GEMINI_API_KEY not found in environment variables")
+    courses = [
+        course async for course in
+        Course.objects.order_by('-is_popular', 'title').values('title', 'price', 'difficulty')
+    ]
+    prompt = build_system_prompt(courses)
+    with _model_lock:
+        if _model is None or _model[0] != version:
+            genai.configure(api_key=api_key)
+            _model = (version, genai.GenerativeModel(MODEL_NAME, system_instruction=prompt))
+        return _model[1]
+
+
+def reset_model():
+    """Drops the cached model (e.g. after rotating the API key)."""
+    global _model
+    with _model_lock:
+        _model = None
+
+# ==========================================
+#              SESSION STORE
+# ==========================================
+
+class ChatEntry:
+    """
+    One visitor's conversation, the catalog version its prompt was built
+    from and the lock that serializes its turns.
+    """
+
+    def __init__(self, chat, used, version=None):
+        self.chat = chat
+        self.used = used
+        self.version = version
+        # asyncio.Lock binds to a loop lazily, so it is safe to build here
+        self.lock = asyncio.Lock()
+
+
+class ChatSessionStore:
+    """
+    Thread-safe LRU map of session key -> ChatEntry, with idle expiry.
+    Each entry carries its own lock so two tabs of the same visitor can't
+    interleave turns in one history.
+    """
+
+    def __init__(self, max_sessions, ttl, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key, factory, version=None):
+        """Returns the ChatEntry for `key`, creating the chat with factory()."""
+        now = self.clock()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = ChatEntry(factory(), now, version)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_sessions:
+                    self._entries.popitem(last=False)
+            else:
+                entry.used = now
+                self._entries.move_to_end(key)
+            return entry
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _evict_expired(self, now):
+        # Entries are in LRU order, so stop at the first one still fresh
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.used < self.ttl:
+                break
+            self._entries.popitem(last=False)
+
+
+sessions = ChatSessionStore(
+    max_sessions=settings.CHAT_MAX_SESSIONS,
+    ttl=settings.CHAT_SESSION_TTL,
+)
+
+# ==========================================
+#            UPSTREAM CONCURRENCY
+# ==========================================
+
+class Slot:
+    """A held limiter slot; release() is idempotent."""
+
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._semaphore.release()
+
+
+class _Gate:
+    """A limiter's semaphore and wait queue length on one event loop."""
+
+    def __init__(self, limit):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+
+
+class UpstreamLimiter:
+    """
+    Caps concurrent Gemini calls at `limit`. Up to `max_waiting` callers may
+    queue for `wait_timeout` seconds; anyone beyond that gets ChatbotBusy
+    straight away instead of tying up the worker.
+    """
+
+    def __init__(self, limit, max_waiting, wait_timeout):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        # One gate per event loop: ASGI has one, but the WSGI dev server and
+        # the test client run each async view on a fresh loop. The semaphore
+        # and its queue length live together so both bounds apply per loop.
+        self._gates = weakref.WeakKeyDictionary()
+
+    def _gate(self):
+        loop = asyncio.get_running_loop()
+        gate = self._gates.get(loop)
+        if gate is None:
+            gate = self._gates[loop] = _Gate(self.limit)
+        return gate
+
+    async def acquire(self):
+        gate = self._gate()
+        semaphore = gate.semaphore
+        if semaphore.locked():
+            if gate.waiting >= self.max_waiting:
+                raise ChatbotBusy()
+            gate.waiting += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise ChatbotBusy()
+            finally:
+                gate.waiting -= 1
+        else:
+            await semaphore.acquire()
+        return Slot(semaphore)
+
+
+limiter = UpstreamLimiter(
+    limit=settings.CHAT_MAX_CONCURRENCY,
+    max_waiting=settings.CHAT_MAX_QUEUE,
+    wait_timeout=settings.CHAT_QUEUE_TIMEOUT,
+)
+
+
+class GuardedStream:
+    """
+    Async iterable that gives its limiter slot back when iteration ends or
+    when the response is closed without ever being iterated.
+    """
+
+    def __init__(self, iterable, slot):
+        self.iterable = iterable
+        self.slot = slot
+
+    async def __aiter__(self):
+        try:
+            async for item in self.iterable:
+                yield item
+        finally:
+            self.slot.release()
+
+    def close(self):
+        self.slot.release()
+
+# ==========================================
+#               ANSWER CACHE
+# ==========================================
+
+STOP_WORDS = frozenset("""
+a an and are as at be can could do does for from have how i in is it me my
+of on or please should the there this to what whats when where which who
+will with would you your
+""".split())
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+
+def normalize_question(text):
+    """Lowercases, strips punctuation and drops stop words."""
+    words = _PUNCTUATION_RE.sub(' ', (text or '').lower()).split()
+    kept = [word for word in words if word not in STOP_WORDS]
+    # A question made only of stop words still deserves its own key
+    return ' '.join(kept or words)
+
+
+class AnswerCache:
+    """Thread-safe TTL + LRU map of question key -> answer, with hit counters."""
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            answer = self._cache.get(key)
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return answer
+
+    def set(self, key, answer):
+        with self._lock:
+            self._cache[key] = answer
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+            'size': len(self._cache),
+        }
+
+
+answers = AnswerCache(
+    maxsize=settings.CHAT_ANSWER_CACHE_SIZE,
+    ttl=settings.CHAT_ANSWER_CACHE_TTL,
+)
+
+
+def _answer_key(entry, message):
+    """Cache key for `message`, or None when it isn't a cacheable first turn."""
+    if entry.chat.history:
+        return None
+    question = normalize_question(message)
+    if not question:
+        return None
+    return (entry.version, question)
+
+
+def _record_turn(chat, message, answer):
+    """Adds a cached exchange to the chat so follow-ups keep their context."""
+    chat.history = list(chat.history) + [
+        {'role': 'user', 'parts': [message]},
+        {'role': 'model', 'parts': [answer]},
+    ]
+
+# ==========================================
+#              CONVERSATIONS
+# ==========================================
+
+def _trim_history(chat):
+    """Keeps only the most recent turns so each request stays bounded."""
+    limit = settings.CHAT_MAX_HISTORY_TURNS * 2
+    if len(chat.history) > limit:
+        chat.history = chat.history[-limit:]
+
+
+async def _get_entry(session_key):
+    version = await catalog.aget_version()
+    model = await get_model(version)
+    return sessions.get_or_create(session_key, model.start_chat, version)
+
+
+async def send_message(session_key, message):
+    """Sends `message` in the visitor's conversation and returns the reply text."""
+    entry = await _get_entry(session_key)
+    key = _answer_key(entry, message)
+    if key is not None:
+        answer = answers.get(key)
+        if answer is not None:
+            async with entry.lock:
+                _record_turn(entry.chat, message, answer)
+            return answer
+
+    slot = await limiter.acquire()
+    try:
+        async with entry.lock:
+            with timed('gemini'):
+                response = await entry.chat.send_message_async(message)
+            _trim_history(entry.chat)
+    finally:
+        slot.release()
+
+    if key is not None:
+        answers.set(key, response.text)
+    return response.text
+
+
+async def stream_message(session_key, message, encode=None):
+    """
+    Like send_message(), but returns a GuardedStream of text chunks as Gemini
+    produces them, optionally passed through `encode` (an async generator
+    function taking the chunk iterator). The chat and limiter slot are
+    obtained eagerly so configuration errors and ChatbotBusy surface before
+    streaming starts.
+    """
+    entry = await _get_entry(session_key)
+    key = _answer_key(entry, message)
+    if key is not None:
+        answer = answers.get(key)
+        if answer is not None:
+            # Same lock as the miss path, so concurrent tabs can't interleave history
+            async with entry.lock:
+                _record_turn(entry.chat, message, answer)
+
+            async def cached():
+                yield answer
+
+            return encode(cached()) if encode else cached()
+
+    slot = await limiter.acquire()
+
+    async def chunks():
+        completed = False
+        parts = []
+        async with entry.lock:
+            try:
+                with timed('gemini'):
+                    response = await entry.chat.send_message_async(message, stream=True)
+                async for chunk in response:
+                    if chunk.parts:
+                        parts.append(chunk.text)
+                        yield chunk.text
+                _trim_history(entry.chat)
+                completed = True
+                if key is not None:
+                    answers.set(key, ''.join(parts))
+            finally:
+                if not completed:
+                    # A half-read stream leaves the chat history unusable
+                    sessions.discard(session_key)
+
+    stream = encode(chunks()) if encode else chunks()
+    return GuardedStream(stream, slot)
@@ -0,0 +1,113 @@
+"""
+Right-sized Cloudinary delivery URLs from named presets.
+
+Every preset asks Cloudinary for format negotiation (f_auto) and automatic
+quality (q_auto) at a width that fits where the image is shown. Built URLs
+are memoized per (public ID, version, preset), so list pages don't rebuild
+the same transformation strings on every render.
+
+CloudinaryField values come in two shapes: real uploads
+("image/upload/v123/aquasense/x.jpg") and full delivery URLs stored by the
+seed data. The SDK returns the latter untouched (and drops their
+extension), so they are parsed back into their parts here. Non-Cloudinary
+URLs are returned as they are.
+"""
+
+import logging
+import re
+from functools import lru_cache
+
+import cloudinary.utils
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+AUTO = {'fetch_format': 'auto', 'quality': 'auto', 'secure': True}
+PRESETS = {
+    # Course cards and list rows (rendered up to ~400 CSS px wide, 2x DPR)
+    'card': dict(AUTO, width=800, height=600, crop='fill', gravity='auto'),
+    # Full-bleed page headers
+    'hero': dict(AUTO, width=1920, crop='limit'),
+    # Instructor and profile pictures
+    'avatar': dict(AUTO, width=160, height=160, crop='thumb', gravity='face'),
+    # Small square previews (checkout summary)
+    'thumb': dict(AUTO, width=192, height=192, crop='fill', gravity='auto'),
+}
+
+DELIVERY_URL = re.compile(
+    r'^https?://res\.cloudinary\.com/(?P<cloud_name>[^/]+)/image/upload/'
+    r'(?:v(?P<version>\d+)/)?(?P<public_id>.+?)(?:\.(?P<format>[a-z0-9]+))?$'
+)
+
+
+class UnknownPreset(KeyError):
+    """Raised for a preset name that isn't in PRESETS."""
+
+# ==========================================
+#                 BUILDING
+# ==========================================
+
+@lru_cache(maxsize=settings.CLOUDINARY_URL_CACHE_SIZE)
+def _build(cloud_name, public_id, version, preset):
+    options = dict(PRESETS[preset])
+    if cloud_name:
+        options['cloud_name'] = cloud_name
+    if version:
+        options['version'] = version
+    url, _ = cloudinary.utils.cloudinary_url(public_id, **options)
+    return url
+
+
+def _parts(value):
+    """(cloud_name, public_id, version) for a Cloudinary image, or None."""
+    public_id = getattr(value, 'public_id', value)
+    version = getattr(value, 'version', None)
+    fmt = getattr(value, 'format', None)
+    if not public_id:
+        return None
+    if isinstance(public_id, str) and public_id.startswith(('http://', 'https://')):
+        raw = f'{public_id}.{fmt}' if fmt else public_id
+        match = DELIVERY_URL.match(raw)
+        if not match:
+            return None
+        return match['cloud_name'], match['public_id'], match['version']
+    return None, str(public_id), str(version) if version else None
+
+
+def _original(value):
+    public_id = getattr(value, 'public_id', value)
+    fmt = getattr(value, 'format', None)
+    if isinstance(public_id, str) and public_id.startswith(('http://', 'https://')):
+        return f'{public_id}.{fmt}' if fmt else public_id
+    try:
+        return value.url
+    except (AttributeError, ValueError):
+        return str(public_id)
+
+
+def image_url(value, preset):
+    """
+    Delivery URL of a CloudinaryField value (or stored string) for `preset`.
+    Falls back to the untransformed URL when it can't be transformed.
+    """
+    if preset not in PRESETS:
+        raise UnknownPreset(preset)
+    if not value:
+        return ''
+    parts = _parts(value)
+    if parts is None:
+        return _original(value)
+    try:
+        return _build(*parts, preset)
+    except ValueError:
+        # No cloud_name configured (e.g. local dev without credentials)
+        logger.warning('Cannot build Cloudinary URL for %s; serving the original', parts[1])
+        return _original(value)
+
+
+def cache_info():
+    return _build.cache_info()
+
+
+def clear_cache():
+    _build.cache_clear()
@@ -0,0 +1,113 @@
+"""
+Read-only JSON views of the course catalog.
+
+Rows are fetched with .values() over only the requested columns, so list
+responses never load the description text unless a client asks for it.
+`fields=title,price,...` picks the columns. Each response's ETag is derived
+from the catalog version (bumped on any Course/Instructor change, see
+reservations.signals) and the request's parameters. It is known before
+any query runs, so a revalidation that ends in 304 never touches the
+database.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import catalog, cloudinary_urls
+
+MAX_PAGE_SIZE = 100
+# Keyset orders: course_catalog_order_idx plus id as the tie-breaker, and the
+# search rank that _filter_courses() annotates from the full-text index
+CATALOG_ORDER = ('-is_popular', 'title', 'id')
+SEARCH_ORDER = ('search_rank', 'id')
+
+# ==========================================
+#               PROJECTION
+# ==========================================
+
+# Public field name -> .values() lookup
+FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'price': 'price',
+    'duration': 'duration',
+    'difficulty': 'difficulty',
+    'is_popular': 'is_popular',
+    'daily_capacity': 'daily_capacity',
+    'image': 'image',
+    'instructor': 'instructor__name',
+    'created_at': 'created_at',
+}
+LIST_FIELDS = ('id', 'slug', 'title', 'price', 'duration', 'difficulty', 'is_popular', 'image')
+DETAIL_FIELDS = tuple(FIELDS)
+
+
+class InvalidFields(ValueError):
+    """Raised for a `fields=` value naming unknown fields."""
+
+
+def parse_fields(value, default):
+    """Requested public field names in the given order, or `default`."""
+    if not value:
+        return default
+    names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown or not names:
+        raise InvalidFields(', '.join(unknown) or value)
+    return tuple(names)
+
+
+def lookups(fields, *required):
+    """The .values() lookups for `fields`, plus `required` ones (e.g. the cursor keys)."""
+    wanted = [FIELDS[name] for name in fields]
+    return wanted + [lookup for lookup in required if lookup not in wanted]
+
+
+def serialize(row, fields):
+    """Maps a .values() row onto the public field names."""
+    item = {name: row[FIELDS[name]] for name in fields}
+    if 'image' in item:
+        item['image'] = cloudinary_urls.image_url(item['image'], 'card')
+    return item
+
+# ==========================================
+#              CONDITIONAL GET
+# ==========================================
+
+def etag(request):
+    """Strong ETag for the current catalog version and this exact request."""
+    params = sorted(request.GET.lists())
+    raw = f'{catalog.get_version()}|{request.path}|{params}|{settings.PAGE_CACHE_RELEASE}'
+    return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def _validators(response, tag):
+    response['ETag'] = tag
+    patch_cache_control(response, public=True, max_age=settings.CATALOG_API_MAX_AGE)
+    return response
+
+
+def conditional_catalog(view):
+    """
+    Answers If-None-Match from the catalog version alone, before `view`
+    runs; successful responses get the ETag and a short public max-age.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        tag = etag(request)
+        # 304 (or 412 for a failed If-Match) without calling the view
+        conditional = get_conditional_response(request, etag=tag, response=_validators(HttpResponse(), tag))
+        if conditional.status_code != 200:
+            return conditional
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            _validators(response, tag)
+        return response
+    return wrapper
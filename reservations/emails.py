@@ -0,0 +1,74 @@
+"""
+Outgoing email through the Resend API.
+
+Sending happens in the background worker (see reservations.jobs). All calls
+share one pooled requests.Session and use explicit timeouts, so a slow
+provider costs a worker a bounded amount of time and never a web request.
+"""
+
+import logging
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from aquasense.instrumentation import timed
+
+from .jobs import task
+
+logger = logging.getLogger(__name__)
+
+_session = None
+
+
+class EmailDeliveryError(Exception):
+    """Raised for provider responses that are worth retrying."""
+
+
+def get_session():
+    """Returns the process-wide pooled HTTP session for the email provider."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        _session = session
+    return _session
+
+
+def send_email(to, subject, html):
+    """
+    Posts one email to Resend. Raises on network errors and on 429/5xx so the
+    job is retried; other rejections are logged and treated as final.
+    """
+    payload = {
+        "from": "onboarding@resend.dev",
+        "to": [to],
+        "subject": subject,
+        "html": html,
+    }
+    with timed('resend'):
+        response = get_session().post(
+            settings.RESEND_API_URL,
+            json=payload,
+            headers={"Authorization": f"Bearer {settings.RESEND_API_KEY}"},
+            timeout=(settings.RESEND_CONNECT_TIMEOUT, settings.RESEND_READ_TIMEOUT),
+        )
+    if response.status_code == 429 or response.status_code >= 500:
+        raise EmailDeliveryError(f"Resend API Status: {response.status_code}")
+    return response.status_code == 200
+
+
+@task('send_otp_email')
+def send_otp_email(email, otp):
+    """Sends the password reset OTP."""
+    delivered = send_email(
+        email,
+        "AquaSense Password Reset OTP",
+        f"<p>Your OTP for password reset is: <strong>{otp}</strong></p>",
+    )
+    if not delivered:
+        logger.warning(f"Resend API rejected the OTP email to {email}")
+        if settings.DEBUG:
+            # Development fallback (e.g. unverified sender domain); never log the code in production
+            logger.warning(f"DEV MODE - OTP for {email}: {otp}")
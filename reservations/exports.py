@@ -0,0 +1,127 @@
+"""
+Streaming reservation exports (CSV / NDJSON) for boat manifests.
+
+Rows are read with values_list() over a joined queryset and
+QuerySet.iterator(chunk_size), so neither model instances nor the whole
+result set are ever held in memory: a season-long export costs the same
+memory as one chunk. The same generators feed the admin action (through
+a StreamingHttpResponse) and `manage.py export_reservations`.
+"""
+
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Reservation
+
+# (header, values_list lookup); course and user come from joins, not extra queries
+COLUMNS = (
+    ('id', 'id'),
+    ('scheduled_date', 'scheduled_date'),
+    ('course', 'course__title'),
+    ('course_slug', 'course__slug'),
+    ('status', 'status'),
+    ('number_of_divers', 'number_of_divers'),
+    ('full_name', 'full_name'),
+    ('email', 'email'),
+    ('phone_number', 'phone_number'),
+    ('certification_level', 'certification_level'),
+    ('medical_clearance', 'medical_clearance'),
+    ('notes', 'notes'),
+    ('username', 'user__username'),
+    ('booking_date', 'booking_date'),
+)
+HEADERS = [header for header, _ in COLUMNS]
+CHUNK_SIZE = 2000
+# Rows joined into one chunk of the response body
+LINES_PER_WRITE = 500
+
+# ==========================================
+#                 QUERIES
+# ==========================================
+
+def filter_reservations(queryset=None, start=None, end=None, statuses=None, courses=None):
+    """
+    Narrows `queryset` (all reservations by default) to dive dates in
+    [start, end], the given statuses and course ids or slugs.
+    """
+    queryset = Reservation.objects.all() if queryset is None else queryset
+    if start:
+        queryset = queryset.filter(scheduled_date__gte=start)
+    if end:
+        queryset = queryset.filter(scheduled_date__lte=end)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    if courses:
+        ids = [course for course in courses if str(course).isdigit()]
+        slugs = [course for course in courses if not str(course).isdigit()]
+        queryset = queryset.filter(Q(course__in=ids) | Q(course__slug__in=slugs))
+    return queryset
+
+
+def rows(queryset, chunk_size=CHUNK_SIZE):
+    """Yields one tuple per reservation in manifest order (dive date, course)."""
+    return (
+        queryset
+        .order_by('scheduled_date', 'course_id', 'id')
+        .values_list(*[lookup for _, lookup in COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+
+# ==========================================
+#                 FORMATS
+# ==========================================
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= LINES_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def iter_csv(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADERS)
+    yield from _batched(writer.writerow(record) for record in records)
+
+
+def iter_ndjson(records):
+    encoder = DjangoJSONEncoder()
+    yield from _batched(encoder.encode(dict(zip(HEADERS, record))) + '\n' for record in records)
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
+
+
+def stream(queryset, fmt, chunk_size=CHUNK_SIZE):
+    """Text chunks of `queryset` exported as `fmt` ('csv' or 'ndjson')."""
+    encode, _ = FORMATS[fmt]
+    return encode(rows(queryset, chunk_size))
+
+
+def streaming_response(queryset, fmt, chunk_size=CHUNK_SIZE):
+    """A download of `queryset` that is produced while it is being sent."""
+    _, content_type = FORMATS[fmt]
+    response = StreamingHttpResponse(stream(queryset, fmt, chunk_size), content_type=content_type)
+    filename = f"reservations-{timezone.now():%Y%m%d-%H%M}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Don't let a proxy buffer the whole export before forwarding it
+    response['X-Accel-Buffering'] = 'no'
+    return response
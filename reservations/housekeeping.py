@@ -0,0 +1,44 @@
+"""
+Recurring maintenance run by the background worker.
+
+Expired sessions are purged here instead of through a cron'd `clearsessions`.
+The task re-queues itself every SESSION_PURGE_INTERVAL seconds, and
+`run_jobs` schedules the first run when it starts.
+"""
+
+import logging
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.utils import timezone
+
+from aquasense import sessions
+
+from .jobs import enqueue, task
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+PURGE_SESSIONS = 'purge_expired_sessions'
+
+
+def schedule_session_purge(delay=0):
+    """Queues the next purge unless one is already waiting. Returns the job or None."""
+    if Job.objects.filter(name=PURGE_SESSIONS, status__in=['Queued', 'Running']).exists():
+        return None
+    return enqueue(PURGE_SESSIONS, run_after=timezone.now() + timedelta(seconds=delay))
+
+
+@task(PURGE_SESSIONS)
+def purge_expired_sessions():
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if issubclass(store, sessions.SessionStore):
+        removed = store.clear_expired(batch_size=settings.SESSION_PURGE_BATCH_SIZE)
+    else:
+        # Stock engines delete in one statement and don't report a count
+        removed = store.clear_expired()
+    if removed:
+        logger.info(f"Purged {removed} expired session(s)")
+    # This job is still 'Running' while it executes, so queue the next one directly
+    enqueue(PURGE_SESSIONS, run_after=timezone.now() + timedelta(seconds=settings.SESSION_PURGE_INTERVAL))
@@ -0,0 +1,118 @@
+"""
+Small database-backed job queue.
+
+Views call enqueue() and return immediately; the `run_jobs` management
+command claims due jobs and runs the registered handler. A claimed job is
+invisible to other workers until its visibility timeout passes, so a worker
+that dies mid-job doesn't lose it. Failures are retried with exponential
+backoff until max_attempts, after which the job is kept as 'Failed'.
+Successful jobs are deleted.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+# ==========================================
+#              REGISTRATION
+# ==========================================
+
+def task(name):
+    """Registers the decorated function as the handler for jobs called `name`."""
+    def register(func):
+        _handlers[name] = func
+        return func
+    return register
+
+
+def enqueue(name, max_attempts=None, run_after=None, **payload):
+    """Queues a job for `name` with JSON-serializable keyword payload, due now or at `run_after`."""
+    if name not in _handlers:
+        raise KeyError(f"No task registered as '{name}'")
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_after=run_after or timezone.now(),
+    )
+
+# ==========================================
+#                 WORKER
+# ==========================================
+
+def _due(now):
+    """Queued jobs that are due, plus running jobs whose worker went quiet."""
+    return (
+        Q(status='Queued', run_after__lte=now)
+        | Q(status='Running', locked_until__lt=now)
+    )
+
+
+def claim_next(visibility_timeout=None):
+    """
+    Atomically claims the oldest due job and returns it, or None.
+    The conditional UPDATE makes two workers racing for the same row safe
+    on every backend without needing SKIP LOCKED.
+    """
+    visibility_timeout = visibility_timeout or settings.JOB_VISIBILITY_TIMEOUT
+    now = timezone.now()
+    candidates = Job.objects.filter(_due(now)).order_by('run_after', 'id').values_list('id', flat=True)[:10]
+    for job_id in candidates:
+        claimed = Job.objects.filter(_due(now), pk=job_id).update(
+            status='Running',
+            locked_until=now + timedelta(seconds=visibility_timeout),
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts` (1-based)."""
+    return min(settings.JOB_BACKOFF_BASE * 2 ** (attempts - 1), settings.JOB_BACKOFF_MAX)
+
+
+def run_job(job):
+    """Runs a claimed job and records the outcome. Returns True on success."""
+    handler = _handlers.get(job.name)
+    job.attempts += 1
+    try:
+        if handler is None:
+            raise KeyError(f"No task registered as '{job.name}'")
+        handler(**job.payload)
+    except Exception as e:
+        job.last_error = f"{type(e).__name__}: {e}"
+        job.locked_until = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'Failed'
+            logger.error(f"Job {job} failed permanently: {job.last_error}")
+        else:
+            job.status = 'Queued'
+            job.run_after = timezone.now() + timedelta(seconds=backoff(job.attempts))
+            logger.warning(f"Job {job} failed (attempt {job.attempts}), retrying: {job.last_error}")
+        job.save(update_fields=['attempts', 'status', 'run_after', 'locked_until', 'last_error'])
+        return False
+
+    job.delete()
+    return True
+
+
+def run_pending(limit=None, visibility_timeout=None):
+    """Runs due jobs until none are left (or `limit` ran). Returns the count."""
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next(visibility_timeout)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
@@ -0,0 +1,134 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+
+from reservations.benchmarking import add_dataset_arguments, rolled_back, seed_dataset
+from reservations.models import Course, Reservation
+
+# Indexes added in 0007_access_path_indexes, measured with and without
+BENCHMARKED_INDEXES = {
+    'course_catalog_order_idx',
+    'course_difficulty_price_idx',
+    'reservation_user_recent_idx',
+    'reservation_user_status_idx',
+    'reservation_status_date_idx',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a large synthetic dataset inside a transaction, then prints query plans '
+        'and latencies for the hot view queries without and with the access-path indexes. '
+        'Everything is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser, users=2000, courses=2000, reservations=200000)
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query (median is reported)')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self._seed(options)
+            queries = self._queries()
+
+            self._set_indexes(present=False)
+            before = self._measure(queries, options['repeat'])
+            self._set_indexes(present=True)
+            after = self._measure(queries, options['repeat'])
+
+            self._report(queries, before, after)
+        self.stdout.write(self.style.SUCCESS('Benchmark data rolled back'))
+
+    # ==========================================
+    #                 DATASET
+    # ==========================================
+
+    def _seed(self, options):
+        generated = seed_dataset(
+            self.stdout, options['users'], options['courses'], options['reservations'], options['seed'],
+        )
+        # The first users are the high-volume "agency" accounts
+        self.power_user_id = generated['users'][0]
+        self._analyze()
+
+    # ==========================================
+    #                 QUERIES
+    # ==========================================
+
+    def _queries(self):
+        """The querysets the views and admin actually run."""
+        user_reservations = Reservation.objects.filter(user_id=self.power_user_id)
+        return {
+            'dashboard: first page': user_reservations.order_by('-booking_date', '-id')[:21],
+            'dashboard: status tab': user_reservations.filter(status='Confirmed').order_by('-booking_date', '-id')[:21],
+            'dashboard: status counts': user_reservations.values_list('status').annotate(total=Count('id')).order_by(),
+            'admin: status filter': Reservation.objects.filter(status='Pending').order_by('-booking_date', '-id')[:101],
+            'catalog: default order': Course.objects.order_by('-is_popular', 'title')[:50],
+            'catalog: difficulty + price': Course.objects.filter(difficulty='Advanced', price__gt=500).order_by('-is_popular', 'title'),
+        }
+
+    def _measure(self, queries, repeat):
+        results = {}
+        for name, queryset in queries.items():
+            plan = self._explain(queryset)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset._chain())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {'plan': plan, 'median_ms': statistics.median(timings)}
+        return results
+
+    @staticmethod
+    def _explain(queryset):
+        sql, params = queryset.query.sql_with_params()
+        prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+
+    # ==========================================
+    #                 INDEXES
+    # ==========================================
+
+    def _set_indexes(self, present):
+        # Build the DDL without entering the editor: SQLite refuses schema
+        # editing inside an atomic block, but plain CREATE/DROP INDEX is fine.
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model in (Course, Reservation):
+                for index in model._meta.indexes:
+                    if index.name not in BENCHMARKED_INDEXES:
+                        continue
+                    if present:
+                        cursor.execute(str(index.create_sql(model, editor)))
+                    else:
+                        cursor.execute(f'DROP INDEX {editor.quote_name(index.name)}')
+        self._analyze()
+
+    @staticmethod
+    def _analyze():
+        # Refresh planner statistics so plans reflect the seeded data
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    # ==========================================
+    #                 REPORT
+    # ==========================================
+
+    def _report(self, queries, before, after):
+        for name in queries:
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"  without indexes: {before[name]['median_ms']:.2f} ms")
+            for line in before[name]['plan'].splitlines():
+                self.stdout.write(f'      {line}')
+            self.stdout.write(f"  with indexes:    {after[name]['median_ms']:.2f} ms")
+            for line in after[name]['plan'].splitlines():
+                self.stdout.write(f'      {line}')
+            speedup = before[name]['median_ms'] / after[name]['median_ms'] if after[name]['median_ms'] else 0
+            self.stdout.write(f'  speedup: {speedup:.1f}x')
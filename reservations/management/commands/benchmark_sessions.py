@@ -0,0 +1,133 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from reservations.benchmarking import rolled_back
+
+BENCH_PASSWORD = 'bench-pass-123'
+BENCH_EMAIL = 'session-bench@example.com'
+WRONG_OTP = '000000'
+
+# Compared in this order; savings are reported against the first
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'aquasense': 'aquasense.sessions',
+}
+WRITE_VERBS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def _session_queries(captured):
+    """(reads, writes) against django_session among the captured queries."""
+    reads = writes = 0
+    for query in captured:
+        sql = query['sql'].lstrip()
+        if 'django_session' not in sql:
+            continue
+        if sql.upper().startswith(WRITE_VERBS):
+            writes += 1
+        else:
+            reads += 1
+    return reads, writes
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays the login and password reset flows through the test client under each session '
+        'engine and reports django_session reads and writes per request. Data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Times each flow is replayed per engine')
+
+    def handle(self, *args, **options):
+        with rolled_back(), override_settings(
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+            RATE_LIMIT_ENABLED=False,  # every replay logs in from the same address
+        ):
+            user = User.objects.create_user('session-bench', BENCH_EMAIL, BENCH_PASSWORD)
+            results = {
+                flow: {engine: self._replay(steps, path, options['repeat']) for engine, path in ENGINES.items()}
+                for flow, steps in self._flows(user).items()
+            }
+        self._report(results)
+
+    # ==========================================
+    #                  FLOWS
+    # ==========================================
+
+    def _flows(self, user):
+        """Each step is (method, url name, data, expected status); data may depend on the client."""
+        def otp(client):
+            return {'otp': client.session['reset_otp']}
+
+        return {
+            'login': [
+                ('get', 'login', None, 200),
+                ('post', 'login', {'username': user.username, 'password': BENCH_PASSWORD}, 302),
+                ('get', 'dashboard', None, 200),
+                ('get', 'dashboard', None, 200),
+                ('get', 'dashboard', None, 200),
+            ],
+            'password reset': [
+                ('get', 'forgot_password', None, 200),
+                ('post', 'forgot_password', {'email': BENCH_EMAIL}, 302),
+                ('get', 'verify_otp', None, 200),
+                ('post', 'verify_otp', {'otp': WRONG_OTP}, 200),
+                ('post', 'verify_otp', otp, 302),
+                ('get', 'reset_password', None, 200),
+                ('post', 'reset_password', {'password': BENCH_PASSWORD, 'confirm_password': BENCH_PASSWORD}, 302),
+                ('get', 'login', None, 200),
+                ('post', 'login', {'username': user.username, 'password': BENCH_PASSWORD}, 302),
+                ('get', 'dashboard', None, 200),
+            ],
+        }
+
+    # ==========================================
+    #               MEASUREMENT
+    # ==========================================
+
+    def _replay(self, steps, engine, repeat):
+        totals = {'requests': 0, 'reads': 0, 'writes': 0}
+        with override_settings(SESSION_ENGINE=engine):
+            cache.clear()
+            for _ in range(repeat):
+                # A new client per run: every flow starts from a visitor without a session
+                client = Client()
+                for method, name, data, expect in steps:
+                    if callable(data):
+                        data = data(client)
+                    with CaptureQueriesContext(connection) as captured:
+                        response = getattr(client, method)(reverse(name), data or {})
+                    if response.status_code != expect:
+                        raise CommandError(
+                            f'{engine}: {method.upper()} {name} returned {response.status_code}, expected {expect}'
+                        )
+                    reads, writes = _session_queries(captured)
+                    totals['requests'] += 1
+                    totals['reads'] += reads
+                    totals['writes'] += writes
+        return totals
+
+    # ==========================================
+    #                 REPORT
+    # ==========================================
+
+    def _report(self, results):
+        baseline_engine = next(iter(ENGINES))
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'flow':<18}{'engine':<12}{'requests':>9}{'reads/req':>11}{'writes/req':>12}{'writes saved':>14}"
+        ))
+        for flow, engines in results.items():
+            baseline = engines[baseline_engine]
+            for engine, totals in engines.items():
+                requests = totals['requests']
+                saved = 1 - totals['writes'] / baseline['writes'] if baseline['writes'] else 0
+                self.stdout.write(
+                    f"{flow:<18}{engine:<12}{requests:>9}{totals['reads'] / requests:>11.2f}"
+                    f"{totals['writes'] / requests:>12.2f}{saved:>13.0%}"
+                )
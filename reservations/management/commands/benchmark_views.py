@@ -0,0 +1,228 @@
+import json
+import time
+from datetime import timedelta
+from itertools import product
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from aquasense.instrumentation import LatencyStats
+from reservations.benchmarking import add_dataset_arguments, rolled_back, seed_dataset
+from reservations.models import Course
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'perf_baseline.json'
+BENCH_PASSWORD = 'bench-pass-123'
+
+# Hard ceilings on SQL queries per request, whatever the baseline says.
+# Session + auth user lookups count towards these.
+QUERY_BUDGETS = {
+    'courses': 3,
+    'details': 2,
+    'dashboard': 5,
+    'book_course:get': 3,
+    'book_course:post': 14,  # first booking of a date/month also inserts its seat counter and rollup row
+    'login:get': 0,
+    'login:post': 10,
+}
+
+
+class Scenario:
+    """One request to replay: `budget` is looked up from QUERY_BUDGETS by `kind`."""
+
+    def __init__(self, name, kind, path, method='get', data=None, user=None, expect=200, fresh_client=False):
+        self.name = name
+        self.kind = kind
+        self.path = path
+        self.method = method
+        self.data = data or {}
+        self.user = user
+        self.expect = expect
+        self.fresh_client = fresh_client
+
+    @property
+    def budget(self):
+        return QUERY_BUDGETS[self.kind]
+
+    def client(self):
+        client = Client()
+        if self.user:
+            client.force_login(self.user)
+        return client
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a synthetic dataset inside a transaction, replays the main views through the '
+        'test client and reports latency percentiles and SQL query counts. Fails when a view '
+        'exceeds its query budget or regresses past --threshold against the baseline file; '
+        'writes the baseline when it is missing or with --update-baseline. Data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser, users=500, courses=500, reservations=50000)
+        parser.add_argument('--repeat', type=int, default=30, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per scenario')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file')
+        parser.add_argument('--update-baseline', action='store_true', help='Overwrite the baseline with this run')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed p50/p95 slowdown vs the baseline as a fraction (0.25 = 25%%)',
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=2.0,
+            help='Slowdowns smaller than this are treated as noise',
+        )
+
+    def handle(self, *args, **options):
+        dataset = {name: options[name] for name in ('users', 'courses', 'reservations', 'seed')}
+        # Login POSTs are replayed from one address, far above the login rate limit
+        with rolled_back(), override_settings(RATE_LIMIT_ENABLED=False):
+            scenarios = self._seed(dataset)
+            results = self._run(scenarios, options['repeat'], options['warmup'])
+
+        baseline_path = Path(options['baseline'])
+        baseline = None
+        if baseline_path.exists() and not options['update_baseline']:
+            baseline = json.loads(baseline_path.read_text())
+            if baseline.get('dataset') != dataset:
+                self.stdout.write(self.style.WARNING(
+                    f"Baseline was recorded with {baseline.get('dataset')}; comparing anyway"
+                ))
+
+        failures = self._report(scenarios, results, baseline, options['threshold'], options['min_delta_ms'])
+
+        if baseline is None:
+            baseline_path.write_text(json.dumps({'dataset': dataset, 'views': results}, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f'Baseline written to {baseline_path}')
+
+        if failures:
+            raise CommandError('Performance check failed:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All views within budget'))
+
+    # ==========================================
+    #                 DATASET
+    # ==========================================
+
+    def _seed(self, dataset):
+        generated = seed_dataset(self.stdout, **dataset)
+        # The first generated user is a high-volume agency account
+        power_user = User.objects.get(pk=generated['users'][0])
+        power_user.set_password(BENCH_PASSWORD)
+        power_user.save(update_fields=['password'])
+
+        popular = Course.objects.get(pk=generated['courses'][0])
+        popular.daily_capacity = 10 ** 6  # booking POSTs must never sell out
+        popular.save(update_fields=['daily_capacity'])
+
+        return self._scenarios(power_user, popular)
+
+    # ==========================================
+    #                SCENARIOS
+    # ==========================================
+
+    def _scenarios(self, user, course):
+        courses_url = reverse('courses')
+        book_url = reverse('book_course', args=[course.id])
+        scenarios = []
+
+        for query, difficulty, price_range in product(['', 'reef'], ['', 'Advanced'], ['', 'low', 'mid', 'high']):
+            params = {key: value for key, value in
+                      (('q', query), ('difficulty', difficulty), ('price_range', price_range)) if value}
+            label = ' '.join(f'{key}={value}' for key, value in params.items()) or 'unfiltered'
+            scenarios.append(Scenario(f'courses [{label}]', 'courses', courses_url, data=params))
+
+        scenarios += [
+            Scenario('details', 'details', reverse('details', args=[course.slug])),
+            Scenario('dashboard', 'dashboard', reverse('dashboard'), user=user),
+            Scenario('dashboard [status=Confirmed]', 'dashboard', reverse('dashboard'),
+                     data={'status': 'Confirmed'}, user=user),
+            Scenario('book_course GET', 'book_course:get', book_url, user=user),
+            Scenario('book_course POST', 'book_course:post', book_url, method='post', user=user, expect=302, data={
+                'date': (timezone.localdate() + timedelta(days=14)).isoformat(),
+                'divers': '2',
+                'full_name': 'Bench Diver',
+                'email': 'bench@example.com',
+                'certification': 'Open Water',
+                'medical_clearance': 'on',
+            }),
+            Scenario('login GET', 'login:get', reverse('login')),
+            Scenario('login POST', 'login:post', reverse('login'), method='post', expect=302, fresh_client=True,
+                     data={'username': user.username, 'password': BENCH_PASSWORD}),
+        ]
+        return scenarios
+
+    # ==========================================
+    #               MEASUREMENT
+    # ==========================================
+
+    def _run(self, scenarios, repeat, warmup):
+        stats = LatencyStats(window=max(repeat, 1))
+        queries = {}
+        for scenario in scenarios:
+            self.stdout.write(f'  {scenario.name}')
+            client = scenario.client()
+            for run in range(warmup + repeat):
+                if scenario.fresh_client:
+                    client = scenario.client()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = getattr(client, scenario.method)(scenario.path, scenario.data)
+                    elapsed = time.perf_counter() - started
+                if response.status_code != scenario.expect:
+                    raise CommandError(
+                        f'{scenario.name}: expected HTTP {scenario.expect}, got {response.status_code}'
+                    )
+                # Warmup runs hit cold caches, so they still count against the budget
+                queries[scenario.name] = max(queries.get(scenario.name, 0), len(captured))
+                if run >= warmup:
+                    stats.record(scenario.name, elapsed)
+
+        summary = stats.summary()
+        return {
+            scenario.name: {
+                'p50_ms': summary[scenario.name]['p50_ms'],
+                'p95_ms': summary[scenario.name]['p95_ms'],
+                'p99_ms': summary[scenario.name]['p99_ms'],
+                'queries': queries[scenario.name],
+            }
+            for scenario in scenarios
+        }
+
+    # ==========================================
+    #                 REPORT
+    # ==========================================
+
+    def _report(self, scenarios, results, baseline, threshold, min_delta_ms):
+        failures = []
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'view':<56}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'budget':>8}"
+        ))
+        for scenario in scenarios:
+            result = results[scenario.name]
+            self.stdout.write(
+                f"{scenario.name:<56}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                f"{result['p99_ms']:>9.2f}{result['queries']:>9}{scenario.budget:>8}"
+            )
+            if result['queries'] > scenario.budget:
+                failures.append(f"{scenario.name}: {result['queries']} queries, budget is {scenario.budget}")
+
+            previous = (baseline or {}).get('views', {}).get(scenario.name)
+            if not previous:
+                continue
+            if result['queries'] > previous['queries']:
+                failures.append(f"{scenario.name}: {result['queries']} queries, baseline had {previous['queries']}")
+            for metric in ('p50_ms', 'p95_ms'):
+                allowed = max(previous[metric] * (1 + threshold), previous[metric] + min_delta_ms)
+                if result[metric] > allowed:
+                    failures.append(
+                        f"{scenario.name}: {metric} {result[metric]:.2f} vs baseline {previous[metric]:.2f}"
+                    )
+        return failures
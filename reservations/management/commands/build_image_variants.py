@@ -0,0 +1,91 @@
+import hashlib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservations import responsive
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates AVIF/WebP variants of reservations/static/reservations/images at several widths '
+        'and a manifest for {% responsive_image %}. Only new or changed sources are processed. '
+        'Run before collectstatic.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Reprocess every source')
+
+    def handle(self, *args, **options):
+        try:
+            from PIL import Image, ImageOps, features
+        except ImportError:
+            raise CommandError('Pillow is required to build image variants (pip install Pillow)')
+        self.Image, self.ImageOps = Image, ImageOps
+
+        formats = [fmt for fmt in responsive.FORMATS if features.check(fmt)]
+        if not formats:
+            raise CommandError('This Pillow build supports neither AVIF nor WebP')
+        for fmt in set(responsive.FORMATS) - set(formats):
+            self.stdout.write(self.style.WARNING(f'Pillow has no {fmt.upper()} support, skipping that format'))
+
+        responsive.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        manifest = responsive.load_manifest()
+        sources = manifest['sources']
+        seen, built, skipped = set(), 0, 0
+
+        for path in sorted(responsive.SOURCE_DIR.iterdir()):
+            if path.suffix.lower() not in responsive.SOURCE_SUFFIXES:
+                continue
+            seen.add(path.name)
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            entry = sources.get(path.name)
+            if not options['force'] and self._is_current(entry, digest, formats):
+                skipped += 1
+                continue
+            if entry:
+                self._remove(entry)
+            sources[path.name] = self._process(path, digest, formats)
+            built += 1
+            self.stdout.write(f'  {path.name}')
+
+        for name in set(sources) - seen:
+            self._remove(sources.pop(name))
+
+        responsive.write_manifest(manifest)
+        self.stdout.write(self.style.SUCCESS(f'{built} source(s) processed, {skipped} unchanged'))
+
+    @staticmethod
+    def _files(entry):
+        for variants in entry['variants'].values():
+            for variant in variants:
+                yield responsive.OUTPUT_DIR / variant['path'].removeprefix(responsive.STATIC_PREFIX)
+
+    def _is_current(self, entry, digest, formats):
+        return (
+            entry is not None
+            and entry['sha256'] == digest
+            and entry['formats'] == formats
+            and all(path.exists() for path in self._files(entry))
+        )
+
+    def _remove(self, entry):
+        for path in self._files(entry):
+            path.unlink(missing_ok=True)
+
+    def _process(self, path, digest, formats):
+        with self.Image.open(path) as original:
+            image = self.ImageOps.exif_transpose(original)
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        width, height = image.size
+
+        variants = {fmt: [] for fmt in formats}
+        for target in responsive.target_widths(width):
+            resized = image if target == width else image.resize(
+                (target, round(height * target / width)), self.Image.LANCZOS,
+            )
+            for fmt in formats:
+                name = responsive.variant_name(path.name, digest, target, fmt)
+                resized.save(responsive.OUTPUT_DIR / name, format=fmt.upper(), **responsive.FORMATS[fmt]['save'])
+                variants[fmt].append({'width': target, 'path': responsive.STATIC_PREFIX + name})
+
+        return {'sha256': digest, 'width': width, 'height': height, 'formats': formats, 'variants': variants}
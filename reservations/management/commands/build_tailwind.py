@@ -0,0 +1,58 @@
+import hashlib
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reservations import tailwind
+
+
+class Command(BaseCommand):
+    help = (
+        'Compiles the Tailwind CSS used by the templates into a purged, minified, '
+        'content-hashed file under reservations/static/reservations/css/. '
+        'Run before collectstatic on every deploy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cli', default=settings.TAILWIND_CLI, help='Tailwind CLI executable')
+        parser.add_argument('--no-minify', action='store_true', help='Keep the output readable')
+
+    def handle(self, *args, **options):
+        cli = shutil.which(options['cli']) or options['cli']
+        tailwind.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            config, source, output = tmp / 'tailwind.config.js', tmp / 'input.css', tmp / 'output.css'
+            config.write_text(tailwind.config_js())
+            source.write_text(tailwind.INPUT_CSS)
+
+            command = [cli, '-c', str(config), '-i', str(source), '-o', str(output)]
+            if not options['no_minify']:
+                command.append('--minify')
+            try:
+                subprocess.run(command, check=True, capture_output=True, text=True)
+            except FileNotFoundError:
+                raise CommandError(
+                    f"Tailwind CLI '{options['cli']}' not found. Install the standalone v3 binary "
+                    f"and put it on PATH or set TAILWIND_CLI."
+                )
+            except subprocess.CalledProcessError as exc:
+                raise CommandError(f'Tailwind build failed:\n{exc.stderr}')
+            css = output.read_bytes()
+
+        filename = f'tailwind.{hashlib.sha256(css).hexdigest()[:12]}.css'
+        (tailwind.OUTPUT_DIR / filename).write_bytes(css)
+        # Old builds are no longer referenced once the manifest moves on
+        for stale in tailwind.OUTPUT_DIR.iterdir():
+            if tailwind.HASHED_NAME.match(stale.name) and stale.name != filename:
+                stale.unlink()
+        tailwind.write_manifest(filename)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {tailwind.STATIC_PREFIX}{filename} ({len(css) / 1024:.1f} KiB)'
+        ))
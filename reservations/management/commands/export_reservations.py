@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from reservations import exports
+from reservations.models import Reservation
+
+
+def _date(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams reservations as CSV or NDJSON (to stdout or --output), filtered by dive date, '
+        'status and course. Memory use stays flat however many rows are exported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--start', type=_date, help='First dive date (YYYY-MM-DD)')
+        parser.add_argument('--end', type=_date, help='Last dive date (YYYY-MM-DD)')
+        parser.add_argument(
+            '--status', action='append', choices=[choice for choice, _ in Reservation.STATUS_CHOICES],
+            help='Only this status; repeat for several',
+        )
+        parser.add_argument('--course', action='append', help='Course id or slug; repeat for several')
+        parser.add_argument('--output', help='File to write instead of stdout')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE, help='Rows fetched per round trip')
+
+    def handle(self, *args, **options):
+        if options['start'] and options['end'] and options['start'] > options['end']:
+            raise CommandError('--start is after --end')
+        queryset = exports.filter_reservations(
+            start=options['start'], end=options['end'], statuses=options['status'], courses=options['course'],
+        )
+        chunks = exports.stream(queryset, options['format'], options['chunk_size'])
+
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(f"Exported to {options['output']}")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from reservations import pagecache
+
+
+class Command(BaseCommand):
+    help = 'Drops every full-page cache entry (run as part of each deploy, after collectstatic).'
+
+    def handle(self, *args, **options):
+        pagecache.purge()
+        self.stdout.write(self.style.SUCCESS(
+            f'Page cache purged (generation {pagecache.get_generation()})'
+        ))
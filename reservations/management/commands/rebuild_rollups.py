@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from reservations import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Reports revenue rollup rows that drifted from the Reservation table (e.g. after bulk loads '
+        'or raw SQL) and recomputes all rollups.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drift, change nothing')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        drifted = rollups.drift()
+        for course_id, month, status in drifted[:20]:
+            self.stdout.write(f'  course {course_id} {month:%Y-%m} {status}')
+        if len(drifted) > 20:
+            self.stdout.write(f'  ... and {len(drifted) - 20} more')
+        self.stdout.write(f'{len(drifted)} rollup row(s) out of date')
+
+        if options['check']:
+            return
+        count = rollups.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} rollup row(s)'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reservations import housekeeping, jobs
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (OTP emails, session purges, ...) until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs due now, then exit')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--visibility-timeout', type=int, default=None, help='Seconds a claimed job stays hidden from other workers')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Job worker started...')
+        housekeeping.schedule_session_purge()
+        try:
+            while True:
+                count = jobs.run_pending(visibility_timeout=options['visibility_timeout'])
+                if count:
+                    self.stdout.write(f'Processed {count} job(s)')
+                if options['once']:
+                    break
+                if not count:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Job worker stopped'))
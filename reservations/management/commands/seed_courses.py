@@ -1,10 +1,43 @@
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from reservations.models import Course, Instructor
+from reservations.synthetic import DEFAULT_BATCH_SIZE, Generator
 
 class Command(BaseCommand):
-    help = 'Seeds the database with initial courses and instructors'
+    help = (
+        'Seeds the database with initial courses and instructors. '
+        'Pass --instructors/--courses/--users/--reservations to also bulk-generate '
+        'a synthetic dataset for load testing (e.g. --courses 5000 --users 50000 --reservations 2000000).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--instructors', type=int, default=0, help='Synthetic instructors to generate')
+        parser.add_argument('--courses', type=int, default=0, help='Synthetic courses to generate')
+        parser.add_argument('--users', type=int, default=0, help='Synthetic users to generate')
+        parser.add_argument('--reservations', type=int, default=0, help='Synthetic reservations to generate')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per INSERT/transaction')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+
+    def handle(self, *args, **options):
+        self.seed_catalog()
+
+        counts = {name: options[name] for name in ('instructors', 'courses', 'users', 'reservations')}
+        if not any(counts.values()):
+            return
+        if any(count < 0 for count in counts.values()) or options['batch_size'] < 1:
+            raise CommandError('Counts must be >= 0 and --batch-size >= 1')
+
+        self.stdout.write(f"Generating synthetic data (seed={options['seed']})...")
+        started = time.perf_counter()
+        generator = Generator(seed=options['seed'], batch_size=options['batch_size'], log=self.stdout.write)
+        try:
+            generator.generate(**counts)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Generated in {time.perf_counter() - started:.1f}s'))
 
-    def handle(self, *args, **kwargs):
+    def seed_catalog(self):
         self.stdout.write('Seeding data...')
 
         # Create Instructors
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0004_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='daily_capacity',
+            field=models.PositiveIntegerField(default=12, help_text='Seats available per dive date'),
+        ),
+        migrations.CreateModel(
+            name='SeatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('booked', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_counters', to='reservations.course')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('course', 'date'), name='unique_seat_counter_per_date')],
+            },
+        ),
+    ]
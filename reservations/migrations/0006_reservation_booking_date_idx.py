@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0005_seat_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['booking_date', 'id'], name='reservation_booking_date_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0006_reservation_booking_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-is_popular', 'title'], name='course_catalog_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['difficulty', 'price'], name='course_difficulty_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', '-booking_date', '-id'], name='reservation_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'status', '-booking_date', '-id'], name='reservation_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', '-booking_date', '-id'], name='reservation_status_date_idx'),
+        ),
+    ]
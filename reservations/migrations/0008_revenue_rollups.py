@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DateField, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    """Rolls up the existing reservations (same rule as reservations.rollups)."""
+    Reservation = apps.get_model('reservations', 'Reservation')
+    RevenueRollup = apps.get_model('reservations', 'RevenueRollup')
+    rows = (
+        Reservation.objects
+        .annotate(month=Coalesce(TruncMonth('scheduled_date'), TruncMonth('booking_date', output_field=DateField())))
+        .values('course_id', 'month', 'status')
+        .annotate(
+            count=Count('id'),
+            divers_sum=Sum('number_of_divers'),
+            revenue_sum=Sum(F('number_of_divers') * F('course__price'), output_field=DecimalField()),
+        )
+        .order_by()
+    )
+    RevenueRollup.objects.bulk_create(
+        (
+            RevenueRollup(
+                course_id=row['course_id'], month=row['month'], status=row['status'],
+                reservations=row['count'], divers=row['divers_sum'], revenue=row['revenue_sum'] or 0,
+            )
+            for row in rows
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0007_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Confirmed', 'Confirmed'), ('Cancelled', 'Cancelled'), ('Completed', 'Completed')], max_length=20)),
+                ('reservations', models.IntegerField(default=0)),
+                ('divers', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_rollups', to='reservations.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'status'], name='rollup_month_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('course', 'month', 'status'), name='unique_rollup_per_course_month')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:02
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0008_revenue_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='reservation_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(django.db.models.functions.text.Lower('full_name'), name='reservation_name_lower_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.utils import timezone
 from cloudinary.models import CloudinaryField
@@ -49,8 +50,17 @@ class Course(models.Model):
     image = CloudinaryField('image')
     instructor = models.ForeignKey(Instructor, on_delete=models.SET_NULL, null=True, blank=True, related_name='courses')
     is_popular = models.BooleanField(default=False)
+    daily_capacity = models.PositiveIntegerField(default=12, help_text="Seats available per dive date")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Catalog ordering
+            models.Index(fields=['-is_popular', 'title'], name='course_catalog_order_idx'),
+            # Catalog difficulty + price range filters
+            models.Index(fields=['difficulty', 'price'], name='course_difficulty_price_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -88,5 +98,107 @@ class Reservation(models.Model):
     certification_level = models.CharField(max_length=100, blank=True, null=True)
     medical_clearance = models.BooleanField(default=False, help_text="User confirmed they have no conflicting medical conditions")
 
+    class Meta:
+        indexes = [
+            # Admin date hierarchy / filters and keyset pagination on (booking_date, id)
+            models.Index(fields=['booking_date', 'id'], name='reservation_booking_date_idx'),
+            # Dashboard: one user's bookings, newest first (All tab)
+            models.Index(fields=['user', '-booking_date', '-id'], name='reservation_user_recent_idx'),
+            # Dashboard status tabs and per-status counts
+            models.Index(fields=['user', 'status', '-booking_date', '-id'], name='reservation_user_status_idx'),
+            # Admin status filter, newest first
+            models.Index(fields=['status', '-booking_date', '-id'], name='reservation_status_date_idx'),
+            # Admin search (ReservationAdmin.get_search_results): case-insensitive
+            # exact email and full name prefix
+            models.Index(Lower('email'), name='reservation_email_lower_idx'),
+            models.Index(Lower('full_name'), name='reservation_name_lower_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.course.title}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What this row contributes to the revenue rollups, to diff against on save
+        from .rollups import snapshot
+        instance._rollup_snapshot = snapshot(instance)
+        return instance
+
+class SeatCounter(models.Model):
+    """
+    Booked seats for one course on one dive date (see reservations.availability).
+    `capacity` starts from Course.daily_capacity and can be overridden per date.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='seat_counters')
+    date = models.DateField()
+    capacity = models.PositiveIntegerField()
+    booked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'date'], name='unique_seat_counter_per_date'),
+        ]
+
+    @property
+    def free(self):
+        return max(self.capacity - self.booked, 0)
+
+    def __str__(self):
+        return f"{self.course.title} on {self.date}: {self.booked}/{self.capacity}"
+
+class RevenueRollup(models.Model):
+    """
+    Reservations, divers and revenue per course, month and status, kept in
+    step with every Reservation change (see reservations.rollups).
+    `month` is the first day of the dive month, or of the booking month for
+    undated reservations.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='revenue_rollups')
+    month = models.DateField()
+    status = models.CharField(max_length=20, choices=Reservation.STATUS_CHOICES)
+    reservations = models.IntegerField(default=0)
+    divers = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'month', 'status'], name='unique_rollup_per_course_month'),
+        ]
+        indexes = [
+            # Report: months across all courses, optionally one status
+            models.Index(fields=['month', 'status'], name='rollup_month_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course.title} {self.month:%Y-%m} {self.status}"
+
+# ==========================================
+#            BACKGROUND JOBS
+# ==========================================
+
+class Job(models.Model):
+    """A unit of deferred work run by the `run_jobs` worker (see reservations.jobs)."""
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Running', 'Running'),
+        ('Failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Not picked up before this time")
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Visibility timeout of the current run")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,105 @@
+"""
+Full-page cache for pages that are the same for every anonymous visitor.
+
+Anonymous GET/HEAD responses are stored once per (release, generation,
+language, path) and replayed with an ETag and Last-Modified, so repeat
+visitors and crawlers get 304s and nobody re-renders base.html. The query
+string is ignored (these pages don't read it), which keeps utm-tagged ad
+traffic on the same entry. Logged-in users always get a fresh, private
+render with their personalized header.
+
+Cookies set during the original render (the CSRF cookie) are never stored:
+the chat endpoint is csrf_exempt, so the token embedded in a shared copy is
+not load-bearing.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .versioning import CacheVersion
+
+GENERATION_KEY = 'pagecache:generation'
+VARY_ON = ('Cookie', 'Accept-Language')
+
+_generation = CacheVersion(GENERATION_KEY)
+
+# ==========================================
+#               KEYS & PURGING
+# ==========================================
+
+def get_generation():
+    """Current page generation; starts at 1 on an empty cache."""
+    return _generation.get()
+
+
+def purge():
+    """Drops every cached page in one step (run on deploy)."""
+    _generation.bump()
+
+
+def _cache_key(request):
+    return 'pagecache:{}:{}:{}:{}'.format(
+        settings.PAGE_CACHE_RELEASE, get_generation(), translation.get_language(), request.path,
+    )
+
+# ==========================================
+#                 DECORATOR
+# ==========================================
+
+def _entry_for(response):
+    content = response.content
+    return {
+        'content': content,
+        'content_type': response['Content-Type'],
+        'etag': quote_etag(hashlib.md5(content, usedforsecurity=False).hexdigest()),
+        'last_modified': int(time.time()),
+    }
+
+
+def _response_for(request, entry, state):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['X-Page-Cache'] = state
+    patch_cache_control(response, public=True, max_age=settings.PAGE_CACHE_MAX_AGE)
+    patch_vary_headers(response, VARY_ON)
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'], response=response,
+    )
+
+
+def cache_anonymous_page(view):
+    """Serves `view` from the full-page cache for anonymous GET/HEAD requests."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        if request.user.is_authenticated:
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, VARY_ON)
+            return response
+
+        key = _cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            return _response_for(request, entry, 'HIT')
+
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+        entry = _entry_for(response)
+        cache.set(key, entry, timeout=settings.PAGE_CACHE_TIMEOUT)
+        return _response_for(request, entry, 'MISS')
+
+    return wrapper
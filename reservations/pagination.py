@@ -0,0 +1,131 @@
+"""
+Keyset (cursor) pagination, plus a Paginator with bounded COUNT cost.
+
+Pages are addressed by the sort key of the last/first row shown instead of an
+OFFSET, so fetching page 500 costs the same index seek as fetching page 1.
+Rows are ordered newest first on `keys` (descending on every key) unless
+an explicit `order` such as ('-is_popular', 'title', 'id') is given; the
+last key must be unique (normally 'id').
+"""
+
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+DEFAULT_PAGE_SIZE = 20
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token can't be decoded."""
+
+
+def encode_cursor(values):
+    raw = json.dumps([str(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, model, keys, annotations=None):
+    """Cursor values for `keys`; keys may also name `annotations` (e.g. a rank)."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(keys):
+            raise ValueError
+        annotations = annotations or {}
+        fields = [
+            annotations[key].output_field if key in annotations else model._meta.get_field(key)
+            for key in keys
+        ]
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except Exception as exc:
+        raise InvalidCursor(token) from exc
+
+
+def seek(keys, values, op):
+    """
+    Builds the row-value comparison (k1, k2, ...) <op> (v1, v2, ...) as
+    nested ORs, which every backend can satisfy from a composite index.
+    `op` is 'lt'/'gt' for every key, or a list with one per key for mixed
+    sort directions.
+    """
+    ops = [op] * len(keys) if isinstance(op, str) else op
+    condition = Q()
+    for depth in range(len(keys)):
+        clause = Q(**{f'{keys[depth]}__{ops[depth]}': values[depth]})
+        for key, value in zip(keys[:depth], values[:depth]):
+            clause &= Q(**{key: value})
+        condition |= clause
+    return condition
+
+
+def keyset_page(queryset, keys=('booking_date', 'id'), after=None, before=None,
+                page_size=DEFAULT_PAGE_SIZE, order=None):
+    """
+    Returns one page of `queryset` as a dict with 'items', 'next_cursor'
+    (rows further down the order) and 'prev_cursor' (rows further up). Pass
+    the cursor you got back as `after` to move forward or as `before` to
+    move back. `order` ('-name' for descending) replaces `keys` when the
+    sort directions differ per key.
+    """
+    model = queryset.model
+    order = list(order or [f'-{key}' for key in keys])
+    keys = [name.lstrip('-') for name in order]
+    forward = ['lt' if name.startswith('-') else 'gt' for name in order]
+    backward = ['gt' if op == 'lt' else 'lt' for op in forward]
+    reverse_order = [name[1:] if name.startswith('-') else f'-{name}' for name in order]
+    annotations = queryset.query.annotations
+
+    if before:
+        values = decode_cursor(before, model, keys, annotations)
+        rows = list(queryset.filter(seek(keys, values, backward)).order_by(*reverse_order)[:page_size + 1])
+        has_more_newer = len(rows) > page_size
+        items = list(reversed(rows[:page_size]))
+        has_more_older = True
+    else:
+        qs = queryset.order_by(*order)
+        if after:
+            qs = qs.filter(seek(keys, decode_cursor(after, model, keys, annotations), forward))
+        rows = list(qs[:page_size + 1])
+        has_more_older = len(rows) > page_size
+        items = rows[:page_size]
+        has_more_newer = bool(after)
+
+    def cursor_for(row):
+        # Rows are model instances, or dicts from .values()
+        if isinstance(row, dict):
+            return encode_cursor([row[key] for key in keys])
+        return encode_cursor([getattr(row, key) for key in keys])
+
+    return {
+        'items': items,
+        'next_cursor': cursor_for(items[-1]) if items and has_more_older else None,
+        'prev_cursor': cursor_for(items[0]) if items and has_more_newer else None,
+    }
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count never scans a whole large table. Unfiltered
+    querysets on PostgreSQL use the planner's row estimate once it passes
+    `count_cap`; everything else counts at most `count_cap` rows.
+    """
+    count_cap = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.count_cap:
+                return int(row[0])
+        return queryset.order_by()[:self.count_cap].count()
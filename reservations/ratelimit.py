@@ -0,0 +1,215 @@
+"""
+Token-bucket rate limiting for abuse-prone endpoints.
+
+Each scope in settings.RATE_LIMITS maps a key kind (client IP, user, email,
+...) to a rate such as '5/m'. A request takes one token from the bucket of
+every kind that applies to it. A bucket refills continuously at the rate
+and never holds more than the burst size. When any bucket is empty the view
+is not called: the client gets a 429 with Retry-After set to when a token
+will be available again.
+
+A rejection only computes the keys and reads the bucket state (no
+database, no template), so a flood costs little more than the 429
+itself. Buckets live in this process (RATE_LIMIT_STORE='local') or in the
+shared cache ('cache', the default with Redis). Updates to the shared cache
+are read-then-write, so concurrent requests may let a few extra through,
+which is fine for throttling.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from functools import lru_cache, wraps
+
+from asgiref.sync import iscoroutinefunction
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+# ==========================================
+#                  RATES
+# ==========================================
+
+class Rate:
+    """`count` requests per `period` seconds, parsed from '10/m', '3/h', ..."""
+
+    def __init__(self, count, period):
+        self.count = count
+        self.period = period
+
+    @property
+    def per_second(self):
+        return self.count / self.period
+
+
+@lru_cache(maxsize=None)
+def parse_rate(value):
+    count, _, unit = value.partition('/')
+    try:
+        return Rate(int(count), PERIODS[unit])
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate '{value}', expected e.g. '10/m'") from None
+
+
+def take(state, rate, now):
+    """
+    Spends a token from bucket `state` ((tokens, updated_at) or None).
+    Returns (allowed, new state, seconds until the next token).
+    """
+    tokens, updated = state if state else (rate.count, now)
+    tokens = min(rate.count, tokens + (now - updated) * rate.per_second)
+    if tokens >= 1:
+        return True, (tokens - 1, now), 0
+    return False, (tokens, now), (1 - tokens) / rate.per_second
+
+# ==========================================
+#                 STORES
+# ==========================================
+
+class LocalStore:
+    """Buckets in this process; idle buckets are dropped after a day."""
+
+    def __init__(self, maxsize=10000, ttl=PERIODS['d']):
+        self._buckets = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def hit(self, key, rate, now):
+        with self._lock:
+            allowed, self._buckets[key], retry_after = take(self._buckets.get(key), rate, now)
+        return allowed, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheStore:
+    """Buckets in a Django cache shared by every worker."""
+
+    def hit(self, key, rate, now):
+        cache = caches[settings.RATE_LIMIT_CACHE]
+        allowed, state, retry_after = take(cache.get(key), rate, now)
+        # A full bucket needs no entry, so idle keys expire after one period
+        cache.set(key, state, timeout=rate.period)
+        return allowed, retry_after
+
+    def clear(self):
+        caches[settings.RATE_LIMIT_CACHE].clear()
+
+
+local_store = LocalStore()
+cache_store = CacheStore()
+
+
+def get_store():
+    return cache_store if settings.RATE_LIMIT_STORE == 'cache' else local_store
+
+
+def reset():
+    """Forgets every bucket (tests, or after lifting a block by hand)."""
+    get_store().clear()
+
+# ==========================================
+#                  KEYS
+# ==========================================
+
+def client_ip(request):
+    """REMOTE_ADDR, or the first hop of RATE_LIMIT_IP_HEADER behind a trusted proxy."""
+    if settings.RATE_LIMIT_IP_HEADER:
+        forwarded = request.META.get(settings.RATE_LIMIT_IP_HEADER, '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _email(request):
+    # verify_otp only has the address in the session set by forgot_password
+    return (request.POST.get('email') or request.session.get('reset_email') or '').strip().lower()
+
+
+KEYS = {
+    'ip': client_ip,
+    'user': lambda request: request.user.pk if request.user.is_authenticated else None,
+    'email': _email,
+    'username': lambda request: request.POST.get('username', '').strip().lower(),
+    'session': lambda request: request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+}
+
+
+def _bucket_key(scope, kind, value):
+    digest = hashlib.sha1(str(value).encode()).hexdigest()[:20]
+    return f'ratelimit:{scope}:{kind}:{digest}'
+
+
+def check(request, scope):
+    """Seconds to wait when `request` is over a limit of `scope`, else None."""
+    now = time.time()
+    store = get_store()
+    wait = None
+    for kind, rate in settings.RATE_LIMITS.get(scope, {}).items():
+        value = KEYS[kind](request)
+        if not value:
+            continue
+        allowed, retry_after = store.hit(_bucket_key(scope, kind, value), parse_rate(rate), now)
+        if not allowed:
+            wait = max(wait or 0, retry_after)
+    return wait
+
+# ==========================================
+#                DECORATOR
+# ==========================================
+
+def _too_many_requests(wait, json):
+    message = 'Too many requests. Please try again later.'
+    if json:
+        response = JsonResponse({'error': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def rate_limit(scope, methods=('POST',), json=False):
+    """
+    Applies the RATE_LIMITS[scope] buckets to `methods` requests of the
+    decorated view (sync or async). `json` picks an API-style 429 body.
+    Async views should limit by 'ip', 'session' or 'user': the other keys
+    may load the session synchronously.
+    """
+    def decorator(view):
+        def rejected(request):
+            if not settings.RATE_LIMIT_ENABLED or request.method not in methods:
+                return None
+            wait = check(request, scope)
+            if wait is None:
+                return None
+            logger.info(f"Rate limit '{scope}' hit by {client_ip(request)}")
+            return _too_many_requests(wait, json)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if 'user' in settings.RATE_LIMITS.get(scope, {}):
+                    # Resolve the lazy user here; sync access would query the DB in the event loop
+                    request.user = await request.auser()
+                response = rejected(request)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = rejected(request)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return response
+        return wrapper
+    return decorator
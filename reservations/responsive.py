@@ -0,0 +1,67 @@
+"""
+Responsive variants of the bundled static images.
+
+`manage.py build_image_variants` resizes every image in
+static/reservations/images to several widths as AVIF and WebP. Files are
+named with the source's content hash, so they can be cached forever, and
+the manifest maps each source to its variants. A source is reprocessed only
+when its hash changes. The {% responsive_image %} tag reads the manifest to
+emit <picture>/srcset markup.
+"""
+
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = Path(__file__).resolve().parent
+SOURCE_DIR = APP_DIR / 'static' / 'reservations' / 'images'
+OUTPUT_DIR = APP_DIR / 'static' / 'reservations' / 'responsive'
+SOURCE_PREFIX = 'reservations/images/'
+STATIC_PREFIX = 'reservations/responsive/'
+MANIFEST = OUTPUT_DIR / 'manifest.json'
+
+SOURCE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+WIDTHS = (320, 640, 960, 1280, 1920)
+# Best first: browsers take the first <source> type they support
+FORMATS = {
+    'avif': {'mime': 'image/avif', 'save': {'quality': 55}},
+    'webp': {'mime': 'image/webp', 'save': {'quality': 80, 'method': 6}},
+}
+
+# ==========================================
+#                 MANIFEST
+# ==========================================
+
+def load_manifest():
+    try:
+        return json.loads(MANIFEST.read_text())
+    except (OSError, ValueError):
+        return {'sources': {}}
+
+
+def write_manifest(manifest):
+    MANIFEST.write_text(json.dumps(manifest, indent=2, sort_keys=True) + '\n')
+    entries.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def entries():
+    """{source name: manifest entry} for the template tag."""
+    sources = load_manifest()['sources']
+    if not sources:
+        logger.warning('No responsive image variants built (run manage.py build_image_variants)')
+    return sources
+
+
+def variant_name(source, digest, width, fmt):
+    """e.g. hero_bg.640w.3fa1c2d4e5b6.webp"""
+    return f'{Path(source).stem}.{width}w.{digest[:12]}.{fmt}'
+
+
+def target_widths(source_width):
+    """Standard widths below the source plus the source width itself; never upscales."""
+    widths = [width for width in WIDTHS if width < source_width]
+    return widths + [min(source_width, WIDTHS[-1])]
@@ -0,0 +1,186 @@
+"""
+Revenue and occupancy rollups per (course, month, status).
+
+RevenueRollup rows hold reservation counts, divers and revenue (divers x
+course price), so reports never aggregate the Reservation table. They are
+kept current incrementally:
+
+* single saves and deletes go through signals. Each loaded Reservation
+  remembers what it counted towards (`snapshot`, taken in from_db), and a
+  save moves that contribution to wherever the row counts now;
+* bulk status changes skip signals, so callers run move() right before
+  queryset.update(status=...) (see ReservationAdmin);
+* a Course save reprices its rows with one UPDATE.
+
+Anything that bypasses these paths (bulk_create, raw SQL, update() calls
+elsewhere) leaves drift that `manage.py rebuild_rollups` reports and fixes.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import Course, Reservation, RevenueRollup
+
+SNAPSHOT_FIELDS = ('course_id', 'scheduled_date', 'booking_date', 'status', 'number_of_divers')
+# Same rule as month_of(), evaluated by the database
+MONTH = Coalesce(TruncMonth('scheduled_date'), TruncMonth('booking_date', output_field=DateField()))
+
+# ==========================================
+#              CONTRIBUTIONS
+# ==========================================
+
+def month_of(scheduled_date, booking_date):
+    """First day of the dive month, or of the booking month when undated."""
+    day = scheduled_date or timezone.localtime(booking_date).date()
+    return day.replace(day=1)
+
+
+def snapshot(reservation):
+    """(course_id, month, status, divers) that `reservation` counts towards, or None."""
+    if reservation.get_deferred_fields() & set(SNAPSHOT_FIELDS) or reservation.booking_date is None:
+        return None
+    return (
+        reservation.course_id,
+        month_of(reservation.scheduled_date, reservation.booking_date),
+        reservation.status,
+        reservation.number_of_divers,
+    )
+
+
+def _grouped(reservations):
+    return (
+        reservations
+        .annotate(month=MONTH)
+        .values('course_id', 'month', 'status')
+        .annotate(
+            count=Count('id'),
+            divers_sum=Sum('number_of_divers'),
+            revenue_sum=Sum(F('number_of_divers') * F('course__price'), output_field=DecimalField()),
+        )
+        .order_by()
+    )
+
+# ==========================================
+#            INCREMENTAL UPDATES
+# ==========================================
+
+def _bump(key, count, divers, revenue, create=True):
+    course_id, month, status = key
+    rows = RevenueRollup.objects.filter(course_id=course_id, month=month, status=status)
+    changes = {
+        'reservations': F('reservations') + count,
+        'divers': F('divers') + divers,
+        'revenue': F('revenue') + revenue,
+    }
+    if rows.update(**changes) or not create:
+        return
+    # First change for this key: add an empty row (no savepoint needed, a
+    # concurrent creator wins harmlessly), then apply the change to it
+    RevenueRollup.objects.bulk_create(
+        [RevenueRollup(course_id=course_id, month=month, status=status)], ignore_conflicts=True,
+    )
+    rows.update(**changes)
+
+
+def _apply(deltas, create=True):
+    for key, (count, divers, revenue) in deltas.items():
+        if count or divers or revenue:
+            _bump(key, count, divers, revenue, create)
+
+
+def _price(reservation):
+    if Reservation.course.is_cached(reservation):
+        return reservation.course.price
+    return Course.objects.values_list('price', flat=True).get(pk=reservation.course_id)
+
+
+def record_change(reservation, deleted=False):
+    """Moves a saved/deleted reservation's contribution (signal handlers)."""
+    old = getattr(reservation, '_rollup_snapshot', None)
+    new = None if deleted else snapshot(reservation)
+    reservation._rollup_snapshot = new
+    if old == new:
+        return
+
+    price = _price(reservation)
+    deltas = defaultdict(lambda: [0, 0, Decimal(0)])
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        course_id, month, status, divers = state
+        delta = deltas[(course_id, month, status)]
+        delta[0] += sign
+        delta[1] += sign * divers
+        delta[2] += sign * divers * price
+    # Joins the caller's transaction (e.g. book()) instead of adding a savepoint.
+    # A delete only ever subtracts from existing rows: re-creating one could
+    # point at a course that is being deleted in the same transaction.
+    with transaction.atomic(savepoint=False):
+        _apply(deltas, create=not deleted)
+
+
+def move(reservations, status):
+    """
+    Moves the contribution of `reservations` to `status`. Call it right
+    before reservations.update(status=status), in the same transaction.
+    """
+    deltas = defaultdict(lambda: [0, 0, Decimal(0)])
+    for row in _grouped(reservations.exclude(status=status)):
+        revenue = row['revenue_sum'] or Decimal(0)
+        for key, sign in (((row['course_id'], row['month'], row['status']), -1),
+                          ((row['course_id'], row['month'], status), 1)):
+            delta = deltas[key]
+            delta[0] += sign * row['count']
+            delta[1] += sign * row['divers_sum']
+            delta[2] += sign * revenue
+    _apply(deltas)
+
+
+def reprice(course):
+    """Re-derives revenue of `course` after a price change (one UPDATE)."""
+    RevenueRollup.objects.filter(course=course).update(revenue=F('divers') * course.price)
+
+# ==========================================
+#              RECONCILIATION
+# ==========================================
+
+def expected():
+    """{(course_id, month, status): (reservations, divers, revenue)} from the Reservation table."""
+    return {
+        (row['course_id'], row['month'], row['status']):
+            (row['count'], row['divers_sum'], row['revenue_sum'] or Decimal(0))
+        for row in _grouped(Reservation.objects.all())
+    }
+
+
+def drift():
+    """Keys whose stored rollup differs from the Reservation table."""
+    stored = {
+        (course_id, month, status): (count, divers, revenue)
+        for course_id, month, status, count, divers, revenue in RevenueRollup.objects.values_list(
+            'course_id', 'month', 'status', 'reservations', 'divers', 'revenue',
+        )
+        if count or divers or revenue
+    }
+    truth = expected()
+    return sorted(key for key in stored.keys() | truth.keys() if stored.get(key) != truth.get(key))
+
+
+def rebuild(batch_size=5000):
+    """Recomputes every rollup from the Reservation table; returns the row count."""
+    rollups = [
+        RevenueRollup(
+            course_id=course_id, month=month, status=status,
+            reservations=count, divers=divers, revenue=revenue,
+        )
+        for (course_id, month, status), (count, divers, revenue) in expected().items()
+    ]
+    with transaction.atomic():
+        RevenueRollup.objects.all().delete()
+        RevenueRollup.objects.bulk_create(rollups, batch_size=batch_size)
+    return len(rollups)
@@ -0,0 +1,155 @@
+"""
+Full-text search backend for the course catalog.
+
+SQLite uses an FTS5 virtual table that mirrors Course title/description and
+is kept in sync by the signal handlers in reservations.signals.
+PostgreSQL uses a GIN expression index over to_tsvector(), which the database
+maintains on its own, so the sync helpers are no-ops there.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+
+# ==========================================
+#              CONFIGURATION
+# ==========================================
+
+FTS_TABLE = 'reservations_course_fts'
+PG_INDEX = 'reservations_course_search_idx'
+PG_CONFIG = 'english'
+
+# Must match the indexed expression exactly or Postgres won't use the index.
+PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+# Upper bound on ranked hits handed back to the view.
+SEARCH_LIMIT = getattr(settings, 'COURSE_SEARCH_LIMIT', 500)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokens(query):
+    """Splits a raw search string into safe word tokens."""
+    return _TOKEN_RE.findall(query or '')
+
+
+def is_enabled():
+    """True when the active database has a search index we can query."""
+    return connection.vendor in ('sqlite', 'postgresql')
+
+# ==========================================
+#              SCHEMA (MIGRATIONS)
+# ==========================================
+
+def create_index(schema_editor):
+    """Creates the vendor-specific search index. Called from migrations."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(title, description, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+            f"SELECT id, title, description FROM reservations_course"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON reservations_course "
+            f"USING GIN (({PG_DOCUMENT}))"
+        )
+
+
+def drop_index(schema_editor):
+    """Reverses create_index()."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+# ==========================================
+#              INDEX MAINTENANCE
+# ==========================================
+
+def index_course(course):
+    """Adds or refreshes a single course in the search index."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [course.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (%s, %s, %s)",
+            [course.pk, course.title, course.description],
+        )
+
+
+def unindex_course(course_id):
+    """Removes a course from the search index."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [course_id])
+
+
+def rebuild_index():
+    """Re-populates the index from the Course table (e.g. after bulk loads)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+            f"SELECT id, title, description FROM reservations_course"
+        )
+
+# ==========================================
+#                 QUERYING
+# ==========================================
+
+def search_course_ids(query, limit=None, within=None):
+    """
+    Returns course IDs matching every word of `query`, best match first.
+    The last word is treated as a prefix so partial input still matches.
+    `within` (a Course queryset) restricts hits inside the index query, so
+    the limit only counts courses that pass the caller's other filters.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    limit = SEARCH_LIMIT if limit is None else limit
+
+    subquery, restrict_params = '', ()
+    if within is not None:
+        subquery, restrict_params = within.order_by().values('pk').query.sql_with_params()
+
+    if connection.vendor == 'sqlite':
+        # Quote each token so FTS5 operators in user input are taken literally.
+        match = ' '.join(f'"{token}"' for token in tokens[:-1])
+        match = f'{match} "{tokens[-1]}"*'.strip()
+        sql = (
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"{f'AND rowid IN ({subquery}) ' if subquery else ''}"
+            f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s"
+        )
+    else:
+        match = ' & '.join(tokens[:-1] + [f'{tokens[-1]}:*'])
+        sql = (
+            f"SELECT id FROM reservations_course "
+            f"WHERE ({PG_DOCUMENT}) @@ to_tsquery('{PG_CONFIG}', %s) "
+            f"{f'AND id IN ({subquery}) ' if subquery else ''}"
+            f"ORDER BY ts_rank(({PG_DOCUMENT}), to_tsquery('{PG_CONFIG}', %s)) DESC "
+            f"LIMIT %s"
+        )
+
+    if connection.vendor == 'sqlite':
+        params = [match, *restrict_params, limit]
+    else:
+        params = [match, *restrict_params, match, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
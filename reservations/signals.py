@@ -0,0 +1,67 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import availability, catalog, rollups, search
+from .models import Course, Instructor, Reservation
+
+# ==========================================
+#           SEARCH INDEX SYNC
+# ==========================================
+
+@receiver(post_save, sender=Course)
+def index_course_on_save(sender, instance, **kwargs):
+    """Keeps the full-text index in step with the saved course."""
+    search.index_course(instance)
+
+@receiver(post_delete, sender=Course)
+def unindex_course_on_delete(sender, instance, **kwargs):
+    """Drops a deleted course from the full-text index."""
+    search.unindex_course(instance.pk)
+
+# ==========================================
+#         CATALOG CACHE INVALIDATION
+# ==========================================
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Instructor)
+@receiver(post_delete, sender=Instructor)
+def invalidate_catalog(sender, **kwargs):
+    """Any course or instructor change retires every cached result set."""
+    catalog.bump_version()
+
+# ==========================================
+#            REVENUE ROLLUPS
+# ==========================================
+
+@receiver(post_save, sender=Reservation)
+def rollup_saved_reservation(sender, instance, raw=False, **kwargs):
+    """Moves the reservation's revenue/divers to its current (course, month, status)."""
+    if not raw:
+        rollups.record_change(instance)
+
+@receiver(post_delete, sender=Reservation)
+def rollup_deleted_reservation(sender, instance, origin=None, **kwargs):
+    """Takes a deleted reservation out of the rollups."""
+    if isinstance(origin, Course) or getattr(origin, 'model', None) is Course:
+        # The course's rollup rows are cascade-deleted along with it
+        return
+    rollups.record_change(instance, deleted=True)
+
+@receiver(post_save, sender=Course)
+def reprice_rollups(sender, instance, created, raw=False, **kwargs):
+    """Revenue is divers x price, so a price edit re-derives the course's rows."""
+    if not created and not raw:
+        rollups.reprice(instance)
+
+# ==========================================
+#              SEAT COUNTERS
+# ==========================================
+
+@receiver(post_delete, sender=Reservation)
+def release_deleted_seats(sender, instance, origin=None, **kwargs):
+    """Frees the seats of any deleted reservation, including cascades from its User."""
+    if isinstance(origin, Course) or getattr(origin, 'model', None) is Course:
+        # The course's seat counters are cascade-deleted along with it
+        return
+    availability.release_deleted(instance)
@@ -0,0 +1,195 @@
+"""
+Deterministic synthetic data for load tests and benchmarks.
+
+Rows are written with bulk_create in fixed-size batches, each batch in its
+own transaction. Popularity is skewed on purpose: course demand follows a
+Zipf-like curve and a small share of "agency" accounts make a large share
+of the bookings, which is what the dashboard and catalog see in production.
+Signals don't fire for bulk_create, so derived data (search index, catalog
+cache, seat counters, revenue rollups) is refreshed once at the end.
+"""
+
+import itertools
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import availability, catalog, rollups, search
+from .models import Course, Instructor, Reservation
+
+DEFAULT_BATCH_SIZE = 5000
+
+FIRST_NAMES = ['Ali', 'Mona', 'Omar', 'Sara', 'Youssef', 'Laila', 'Karim', 'Nour', 'Hana', 'Tarek', 'Jack', 'Sarah']
+LAST_NAMES = ['Hassan', 'Marlin', 'Coral', 'Nasr', 'Fathy', 'Reef', 'Salem', 'Adel', 'Kamal', 'Wave']
+SPECIALIZATIONS = ['Wreck Diving', 'Underwater Photography', 'Cave Diving', 'Marine Biology', 'Freediving', 'Rescue']
+ADJECTIVES = ['Advanced', 'Night', 'Deep', 'Discover', 'Sunrise', 'Drift', 'Technical', 'Family', 'Private', 'Guided']
+SITES = ['Blue Hole', 'Ras Mohammed', 'Thistlegorm', 'Abu Dabbab', 'Dahab Canyon', 'Giftun Island', 'Elphinstone', 'Marsa Alam']
+KINDS = ['Dive', 'Excursion', 'Certification', 'Snorkel Trip', 'Workshop', 'Safari']
+PHRASES = [
+    'Explore vibrant coral gardens with an experienced guide.',
+    'Perfect for certified divers looking for a new challenge.',
+    'Includes all equipment, boat transfer and lunch on board.',
+    'Spot turtles, dolphins and reef sharks in crystal clear water.',
+    'Learn buoyancy control and safe ascent techniques.',
+    'Historic wreck penetration for advanced divers only.',
+    'Small groups and a relaxed pace for beginners.',
+    'Night dive with torches to see the reef come alive.',
+]
+DIFFICULTIES = ['Beginner', 'Intermediate', 'Advanced', 'Expert']
+STATUSES = ['Pending', 'Confirmed', 'Cancelled', 'Completed']
+STATUS_WEIGHTS = [10, 45, 10, 35]
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _zipf_weights(count, exponent=1.1):
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class Generator:
+    """
+    Builds `instructors`, `courses`, `users` and `reservations` rows from
+    `seed`. The same seed always produces the same dataset. Row prefixes
+    include the seed so different seeds can coexist in one database.
+    """
+
+    def __init__(self, seed=42, batch_size=DEFAULT_BATCH_SIZE, log=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.prefix = f'seed{seed}'
+
+    def _bulk(self, model, rows, timestamps=(), **kwargs):
+        """
+        bulk_create in batches. `timestamps` names auto_now_add fields whose
+        generated values are written back by a follow-up UPDATE in the same
+        transaction, since bulk_create overwrites them with now().
+        """
+        total = 0
+        for batch in _batched(rows, self.batch_size):
+            generated = [[getattr(obj, name) for name in timestamps] for obj in batch]
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+                if timestamps:
+                    for obj, values in zip(batch, generated):
+                        for name, value in zip(timestamps, values):
+                            setattr(obj, name, value)
+                    model.objects.bulk_update(batch, timestamps, batch_size=1000)
+            total += len(batch)
+        self.log(f'  {model.__name__}: {total} rows')
+        return total
+
+    # ==========================================
+    #                   ROWS
+    # ==========================================
+
+    def instructors(self, count):
+        rng = self.rng
+        rows = (
+            Instructor(
+                name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} ({self.prefix}-{i})',
+                bio='Synthetic instructor profile.',
+                photo='https://randomuser.me/api/portraits/lego/1.jpg',
+                specialization=rng.choice(SPECIALIZATIONS),
+            )
+            for i in range(count)
+        )
+        self._bulk(Instructor, rows)
+        return list(Instructor.objects.filter(name__contains=f'({self.prefix}-').values_list('id', flat=True))
+
+    def courses(self, count, instructor_ids=()):
+        rng = self.rng
+        popular_cutoff = max(1, count // 50)
+
+        def build(i):
+            title = f'{rng.choice(ADJECTIVES)} {rng.choice(SITES)} {rng.choice(KINDS)} {i}'
+            return Course(
+                title=title,
+                slug=f'{self.prefix}-course-{i}',  # SlugField caps at 50 chars
+                description=' '.join(rng.sample(PHRASES, 3)),
+                price=Decimal(rng.choice([45, 80, 120, 180, 250, 350, 450, 600, 900])),
+                duration=rng.choice(['4 Hours', '1 Day', '2 Days', '3 Days']),
+                difficulty=rng.choices(DIFFICULTIES, weights=[40, 30, 20, 10])[0],
+                image='https://res.cloudinary.com/dp2ov37tr/image/upload/aquasense/aquasense/coral_reef.png',
+                instructor_id=rng.choice(instructor_ids) if instructor_ids else None,
+                # The head of the popularity curve is what the site features
+                is_popular=i < popular_cutoff,
+                daily_capacity=rng.choice([8, 12, 16, 24, 40]),
+            )
+
+        self._bulk(Course, (build(i) for i in range(count)), ignore_conflicts=True)
+        # Ordered by id, so index 0 is the most popular course
+        return list(Course.objects.filter(slug__startswith=f'{self.prefix}-course-').order_by('id').values_list('id', flat=True))
+
+    def users(self, count):
+        rows = (
+            User(
+                username=f'{self.prefix}_diver_{i}',
+                email=f'{self.prefix}_diver_{i}@example.com',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                password='!',  # unusable, no hashing cost
+            )
+            for i in range(count)
+        )
+        self._bulk(User, rows, ignore_conflicts=True)
+        return list(User.objects.filter(username__startswith=f'{self.prefix}_diver_').order_by('id').values_list('id', flat=True))
+
+    def reservations(self, count, user_ids, course_ids, days=2 * 365):
+        """
+        The first 1% of users are agency accounts that together make ~30% of
+        bookings; course choice follows a Zipf curve over `course_ids`.
+        """
+        rng = self.rng
+        agencies = user_ids[:max(1, len(user_ids) // 100)]
+        course_weights = _zipf_weights(len(course_ids))
+        now = timezone.now()
+
+        def build(_):
+            user_id = rng.choice(agencies) if rng.random() < 0.3 else rng.choice(user_ids)
+            booked = now - timedelta(minutes=rng.randint(0, days * 24 * 60))
+            return Reservation(
+                user_id=user_id,
+                course_id=rng.choices(course_ids, cum_weights=course_weights)[0],
+                status=rng.choices(STATUSES, weights=STATUS_WEIGHTS)[0],
+                booking_date=booked,
+                scheduled_date=booked.date() + timedelta(days=rng.randint(1, 60)) if rng.random() < 0.8 else None,
+                number_of_divers=rng.choices([1, 2, 3, 4, 6], weights=[40, 35, 10, 10, 5])[0],
+                full_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                email=f'booking{rng.randint(0, 10 ** 9)}@example.com',
+                medical_clearance=True,
+            )
+
+        return self._bulk(Reservation, (build(i) for i in range(count)), timestamps=['booking_date'])
+
+    # ==========================================
+    #                  DATASET
+    # ==========================================
+
+    def generate(self, instructors=0, courses=0, users=0, reservations=0):
+        """Creates a full dataset and refreshes the derived data."""
+        instructor_ids = self.instructors(instructors) if instructors else []
+        course_ids = self.courses(courses, instructor_ids) if courses else []
+        user_ids = self.users(users) if users else []
+        if reservations:
+            course_ids = course_ids or list(Course.objects.values_list('id', flat=True))
+            user_ids = user_ids or list(User.objects.values_list('id', flat=True))
+            if not course_ids or not user_ids:
+                raise ValueError('Reservations need at least one course and one user')
+            self.reservations(reservations, user_ids, course_ids)
+
+        self.log('  Refreshing search index, seat counters, rollups and catalog cache')
+        search.rebuild_index()
+        availability.rebuild_counters()
+        rollups.rebuild()
+        catalog.bump_version()
+        return {'instructors': instructor_ids, 'courses': course_ids, 'users': user_ids}
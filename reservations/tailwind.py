@@ -0,0 +1,93 @@
+"""
+Build-time Tailwind CSS.
+
+THEME is the single source of the Tailwind config. `manage.py build_tailwind`
+feeds it to the Tailwind CLI, which scans the templates, purges unused
+utilities and minifies. The result is written as a content-hashed file
+under static/reservations/css/, and a small manifest records its name. The
+{% tailwind_css %} tag links that file. Until a build exists it falls back to
+the in-browser CDN compiler with the same config, so a fresh checkout still
+renders.
+"""
+
+import json
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = Path(__file__).resolve().parent
+CONTENT_GLOBS = [
+    str(APP_DIR / 'templates' / 'reservations' / '**' / '*.html'),
+]
+OUTPUT_DIR = APP_DIR / 'static' / 'reservations' / 'css'
+STATIC_PREFIX = 'reservations/css/'
+MANIFEST = OUTPUT_DIR / 'tailwind.json'
+HASHED_NAME = re.compile(r'^tailwind\.[0-9a-f]{12}\.css$')
+
+CDN_URL = 'https://cdn.tailwindcss.com?plugins=forms,container-queries'
+PLUGINS = ['@tailwindcss/forms', '@tailwindcss/container-queries']
+INPUT_CSS = '@tailwind base;\n@tailwind components;\n@tailwind utilities;\n'
+
+THEME = {
+    'darkMode': 'class',
+    'theme': {
+        'extend': {
+            'colors': {
+                'primary': '#0a64ff',
+                'background-light': '#f5f6f8',
+                'background-dark': '#0f1623',
+                'ocean-deep': '#0A2463',
+                'ocean-dark': '#001B48',
+                'accent-cyan': '#24D4E9',
+                'accent-teal': '#00A9B5',
+                'accent-coral': '#FFC971',
+            },
+            'fontFamily': {
+                'display': ['Space Grotesk', 'sans-serif'],
+            },
+            'borderRadius': {
+                'DEFAULT': '0.25rem',
+                'lg': '0.5rem',
+                'xl': '0.75rem',
+                'full': '9999px',
+            },
+        },
+    },
+}
+
+# ==========================================
+#                  CONFIG
+# ==========================================
+
+def config_js(content=CONTENT_GLOBS):
+    """tailwind.config.js for the CLI: THEME plus content globs and plugins."""
+    config = dict(THEME, content=list(content))
+    plugins = ', '.join(f'require({json.dumps(name)})' for name in PLUGINS)
+    return f'module.exports = {{...{json.dumps(config, indent=2)}, plugins: [{plugins}]}};\n'
+
+
+def cdn_config_js():
+    """The same theme for the in-browser fallback compiler."""
+    return f'tailwind.config = {json.dumps(THEME)};'
+
+# ==========================================
+#                 MANIFEST
+# ==========================================
+
+def write_manifest(filename):
+    MANIFEST.write_text(json.dumps({'css': STATIC_PREFIX + filename}) + '\n')
+    stylesheet.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def stylesheet():
+    """Static path of the built stylesheet, or None if it hasn't been built."""
+    try:
+        return json.loads(MANIFEST.read_text())['css']
+    except (OSError, ValueError, KeyError):
+        logger.warning('Tailwind CSS not built; falling back to the CDN compiler (run manage.py build_tailwind)')
+        return None
+
@@ -0,0 +1,11 @@
+from django import template
+
+from reservations import cloudinary_urls
+
+register = template.Library()
+
+
+@register.simple_tag
+def cloudinary_src(image, preset):
+    """Right-sized, format-negotiated URL for a CloudinaryField, e.g. {% cloudinary_src course.image 'card' %}."""
+    return cloudinary_urls.image_url(image, preset)
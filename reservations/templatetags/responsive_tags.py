@@ -0,0 +1,38 @@
+from django import template
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from reservations import responsive
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(name, sizes='100vw', alt='', **attrs):
+    """
+    <picture> with AVIF/WebP srcsets for a bundled image, e.g.
+    {% responsive_image 'hero_bg.jpg' sizes='100vw' class='h-full w-full object-cover' %}.
+    Falls back to a plain <img> of the original until variants are built.
+    """
+    entry = responsive.entries().get(name)
+    if entry:
+        attrs.setdefault('width', entry['width'])
+        attrs.setdefault('height', entry['height'])
+    img = format_html('<img src="{}" alt="{}"{}>', static(responsive.SOURCE_PREFIX + name), alt, flatatt(attrs))
+    if not entry:
+        return img
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (
+                responsive.FORMATS[fmt]['mime'],
+                ', '.join(f"{static(variant['path'])} {variant['width']}w" for variant in entry['variants'][fmt]),
+                sizes,
+            )
+            for fmt in entry['formats']
+        ),
+    )
+    # display: contents keeps the <img> sized by the surrounding layout
+    return format_html('<picture style="display: contents">{}{}</picture>', sources, img)
@@ -0,0 +1,19 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from reservations import tailwind
+
+register = template.Library()
+
+
+@register.simple_tag
+def tailwind_css():
+    """Links the compiled stylesheet, or the CDN compiler if it hasn't been built yet."""
+    path = tailwind.stylesheet()
+    if path:
+        return format_html('<link href="{}" rel="stylesheet" />', static(path))
+    return format_html(
+        '<script src="{}"></script>\n    <script>{}</script>',
+        tailwind.CDN_URL, tailwind.cdn_config_js(),
+    )
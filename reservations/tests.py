@@ -1,5 +1,38 @@
-from django.test import TestCase
-from .models import Course, Instructor
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+from .admin import ReservationAdmin
+from .models import Course, Instructor, Job, Reservation, RevenueRollup, SeatCounter
+import cloudinary_helper
+import download_images
+from aquasense import instrumentation, sessions
+from . import (
+    availability, catalog, chatbot, cloudinary_urls, housekeeping, jobs, ratelimit, responsive, rollups, search,
+    tailwind,
+)
 
 class CourseModelTest(TestCase):
     def setUp(self):
@@ -26,4 +59,1336 @@ class CourseModelTest(TestCase):
     def test_slug_generation(self):
         """Test that the slug is auto-generated from the title"""
         self.course.save()
-        self.assertEqual(self.course.slug, "intro-to-diving")
\ No newline at end of file
+        self.assertEqual(self.course.slug, "intro-to-diving")
+
+class CourseSearchTest(TestCase):
+    def setUp(self):
+        self.wreck = Course.objects.create(
+            title="Advanced Wreck Diving", price=450, difficulty="Advanced",
+            description="Explore historic shipwrecks."
+        )
+        self.reef = Course.objects.create(
+            title="Coral Reef Exploration", price=80, difficulty="Beginner",
+            description="Snorkel over a shallow reef, wreck sites nearby."
+        )
+
+    def _ids(self, response):
+        return [card['id'] for card in response.context['courses']]
+
+    def test_search_ranks_title_matches_first(self):
+        """Test that a title hit outranks a description-only hit"""
+        response = self.client.get('/courses/', {'q': 'wreck'})
+        self.assertEqual(self._ids(response), [self.wreck.pk, self.reef.pk])
+
+    def test_search_prefix_and_filters(self):
+        """Test prefix matching combined with the price filter"""
+        response = self.client.get('/courses/', {'q': 'shipw', 'price_range': 'mid'})
+        self.assertEqual(self._ids(response), [self.wreck.pk])
+        response = self.client.get('/courses/', {'q': 'wre', 'price_range': 'low'})
+        self.assertEqual(self._ids(response), [self.reef.pk])
+
+    def test_filters_apply_before_the_hit_limit(self):
+        """Test a filtered match ranked below the hit limit is still found"""
+        for i in range(3):
+            Course.objects.create(title=f"Reef Drift {i}", price=90, difficulty="Beginner", description="Reef reef.")
+        deep = Course.objects.create(
+            title="Deep Wall", price=600, difficulty="Advanced", description="Ends on a reef."
+        )
+        with mock.patch.object(search, 'SEARCH_LIMIT', 2):
+            self.assertNotIn(deep.pk, search.search_course_ids('reef'))
+            response = self.client.get('/courses/', {'q': 'reef', 'difficulty': 'Advanced', 'price_range': 'high'})
+            self.assertEqual(self._ids(response), [deep.pk])
+            api = self.client.get('/api/courses/', {'q': 'reef', 'difficulty': 'Advanced'}).json()
+            self.assertEqual([item['id'] for item in api['results']], [deep.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test that saves and deletes keep the search index in sync"""
+        self.reef.description = "Calm lagoon."
+        self.reef.save()
+        self.assertEqual(search.search_course_ids('wreck'), [self.wreck.pk])
+        self.wreck.delete()
+        self.assertEqual(search.search_course_ids('wreck'), [])
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(
+            title="Night Dive", price=120, difficulty="Intermediate",
+            description="Dive after sunset."
+        )
+        catalog.reset_stats()
+
+    def test_equivalent_filters_share_one_entry(self):
+        """Test that normalized filters hit the cache on the second request"""
+        self.client.get('/courses/', {'q': 'Night ', 'difficulty': 'All'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/courses/', {'q': 'night'})
+        self.assertEqual(response.context['courses'][0]['title'], "Night Dive")
+        self.assertEqual(catalog.stats()['hits'], 1)
+        self.assertEqual(catalog.stats()['misses'], 1)
+
+    def test_course_change_invalidates(self):
+        """Test that saving a course drops cached result sets"""
+        self.client.get('/courses/')
+        self.course.title = "Sunset Night Dive"
+        self.course.save()
+        response = self.client.get('/courses/')
+        self.assertEqual(response.context['courses'][0]['title'], "Sunset Night Dive")
+        self.assertEqual(catalog.stats()['misses'], 2)
+
+
+class CourseApiTest(TestCase):
+    def setUp(self):
+        instructor = Instructor.objects.create(name="Ana", specialization="Reef", bio="Bio")
+        self.courses = [
+            Course.objects.create(
+                title=f"Reef Course {i}", price=50 + 100 * i, difficulty="Beginner" if i % 2 else "Advanced",
+                description="A long description", instructor=instructor,
+                image='https://res.cloudinary.com/demo/image/upload/v1/aquasense/reef.jpg',
+            )
+            for i in range(5)
+        ]
+
+    def test_projection_skips_unrequested_fields(self):
+        """Test default and selected fields, each page costing one query"""
+        with self.assertNumQueries(1):
+            item = self.client.get('/api/courses/').json()['results'][0]
+        self.assertEqual(item['title'], "Reef Course 0")
+        self.assertNotIn('description', item)
+        self.assertIn('c_fill', item['image'])
+
+        item = self.client.get('/api/courses/', {'fields': 'title,instructor'}).json()['results'][0]
+        self.assertEqual(item, {'title': "Reef Course 0", 'instructor': "Ana"})
+        response = self.client.get('/api/courses/', {'fields': 'title,password'})
+        self.assertEqual(response.json(), {'error': 'Unknown fields: password'})
+
+    def test_cursor_pages_and_filters(self):
+        """Test walking the catalog with cursors and the courses page filters"""
+        first = self.client.get('/api/courses/', {'limit': 2}).json()
+        second = self.client.get('/api/courses/', {'limit': 2, 'after': first['next_cursor']}).json()
+        back = self.client.get('/api/courses/', {'limit': 2, 'before': second['prev_cursor']}).json()
+        self.assertEqual([item['title'] for item in second['results']], ["Reef Course 2", "Reef Course 3"])
+        self.assertEqual(back['results'], first['results'])
+
+        filtered = self.client.get('/api/courses/', {'difficulty': 'Beginner', 'price_range': 'mid'}).json()
+        self.assertEqual([item['title'] for item in filtered['results']], ["Reef Course 1", "Reef Course 3"])
+        self.assertEqual(self.client.get('/api/courses/', {'after': 'garbage'}).status_code, 400)
+
+    def test_pages_follow_the_catalog_and_search_order(self):
+        """Test the API pages in the HTML catalog's order, by relevance for searches"""
+        Course.objects.filter(pk=self.courses[3].pk).update(is_popular=True)
+        catalog.bump_version()
+        titles = [card['title'] for card in self.client.get('/courses/').context['courses']]
+        pages, cursor = [], None
+        while True:
+            page = self.client.get('/api/courses/', {'limit': 2, **({'after': cursor} if cursor else {})}).json()
+            pages += [item['title'] for item in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(pages, titles)
+        self.assertEqual(pages[0], "Reef Course 3")
+
+        hit = Course.objects.create(title="Reef Wall", price=70, description="Reef reef reef.")
+        first = self.client.get('/api/courses/', {'q': 'reef', 'limit': 1}).json()
+        self.assertEqual(first['results'][0]['id'], hit.pk)
+        rest = self.client.get('/api/courses/', {'q': 'reef', 'after': first['next_cursor']}).json()
+        self.assertEqual(len(rest['results']), 5)
+        back = self.client.get('/api/courses/', {'q': 'reef', 'limit': 1, 'before': rest['prev_cursor']}).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_etag_revalidation_and_invalidation(self):
+        """Test 304 without queries until a course changes"""
+        response = self.client.get('/api/courses/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/courses/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get('/api/courses/', {'limit': 2})['ETag'], etag)
+
+        self.courses[0].title = "Renamed"
+        self.courses[0].save()
+        response = self.client.get('/api/courses/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail(self):
+        """Test the single-course endpoint and its 404"""
+        course = self.courses[0]
+        response = self.client.get(f'/api/courses/{course.slug}/')
+        self.assertEqual(response.json()['description'], "A long description")
+        self.assertIn('ETag', response)
+        response = self.client.get(f'/api/courses/{course.slug}/', {'fields': 'price'})
+        self.assertEqual(response.json(), {'price': '50.00'})
+        self.assertEqual(self.client.get('/api/courses/missing/').status_code, 404)
+
+
+class DashboardTest(TestCase):
+    def setUp(self):
+        instructor = Instructor.objects.create(name="Ana", specialization="Reef", bio="Bio")
+        self.user = User.objects.create_user('diver', 'diver@example.com', 'pass12345')
+        self.courses = [
+            Course.objects.create(title=f"Course {i}", price=100, description="D", instructor=instructor)
+            for i in range(3)
+        ]
+        for i in range(25):
+            Reservation.objects.create(
+                user=self.user, course=self.courses[i % 3],
+                status='Confirmed' if i % 5 == 0 else 'Pending'
+            )
+        self.client.force_login(self.user)
+
+    def test_query_count_is_independent_of_page_size(self):
+        """Test that course and instructor data come from the joined query"""
+        with self.assertNumQueries(5):
+            # session, user, profile, status counts, page
+            self.client.get('/dashboard/')
+
+    def test_keyset_pages_cover_every_row_once(self):
+        """Test walking the cursors forward and back"""
+        first = self.client.get('/dashboard/')
+        self.assertIsNone(first.context['prev_cursor'])
+        second = self.client.get('/dashboard/', {'after': first.context['next_cursor']})
+        self.assertIsNone(second.context['next_cursor'])
+        ids = [r.id for r in first.context['reservations']] + [r.id for r in second.context['reservations']]
+        self.assertEqual(len(set(ids)), 25)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        back = self.client.get('/dashboard/', {'before': second.context['prev_cursor']})
+        self.assertEqual(list(back.context['reservations']), list(first.context['reservations']))
+
+    def test_status_tab_filters(self):
+        """Test the status tab narrows the list and reports counts"""
+        response = self.client.get('/dashboard/', {'status': 'Confirmed'})
+        self.assertEqual(len(response.context['reservations']), 5)
+        self.assertEqual(response.context['total_count'], 25)
+        self.assertEqual(self.client.get('/dashboard/', {'after': 'garbage'}).status_code, 302)
+
+    def test_empty_status_tab_stays_selected(self):
+        """Test a status with no reservations shows an empty list, not every reservation"""
+        response = self.client.get('/dashboard/', {'status': 'Cancelled'})
+        self.assertEqual(response.context['selected_status'], 'Cancelled')
+        self.assertEqual(list(response.context['reservations']), [])
+        response = self.client.get('/dashboard/', {'status': 'Bogus'})
+        self.assertIsNone(response.context['selected_status'])
+        self.assertEqual(len(response.context['reservations']), 20)
+
+
+class FakeChat:
+    def __init__(self, chunks=None):
+        self.history = []
+        self.chunks = chunks
+
+    async def send_message_async(self, message, stream=False):
+        self.history += [message, f"echo: {message}"]
+        if stream:
+            return self._stream()
+        return SimpleNamespace(text=f"echo {len(self.history) // 2}: {message}")
+
+    async def _stream(self):
+        for text in self.chunks:
+            yield SimpleNamespace(parts=[text], text=text)
+
+
+class ChatSessionTest(TestCase):
+    def setUp(self):
+        chatbot.sessions.clear()
+        chatbot.answers.clear()
+        self.model = mock.Mock()
+        self.model.start_chat.side_effect = FakeChat
+        patcher = mock.patch.object(chatbot, 'get_model', return_value=self.model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(chatbot.sessions.clear)
+
+    def _ask(self, message):
+        response = self.client.post('/api/chat/', json.dumps({'message': message}), content_type='application/json')
+        return response.json()['response']
+
+    def test_follow_up_reuses_the_conversation(self):
+        """Test that a second message continues the same chat"""
+        self.assertEqual(self._ask("hi"), "echo 1: hi")
+        self.assertEqual(self._ask("prices?"), "echo 2: prices?")
+        self.assertEqual(self.model.start_chat.call_count, 1)
+
+    def test_store_evicts_lru_and_idle_sessions(self):
+        """Test LRU capacity and TTL expiry of the session store"""
+        now = [0]
+        store = chatbot.ChatSessionStore(max_sessions=2, ttl=60, clock=lambda: now[0])
+        store.get_or_create('a', FakeChat)
+        store.get_or_create('b', FakeChat)
+        store.get_or_create('a', FakeChat)
+        store.get_or_create('c', FakeChat)
+        self.assertNotIn('b', store)
+        now[0] = 61
+        store.get_or_create('d', FakeChat)
+        self.assertEqual(len(store), 1)
+
+    async def test_event_stream_mode(self):
+        """Test that SSE clients get one event per chunk and a done event"""
+        self.model.start_chat.side_effect = lambda: FakeChat(chunks=["Hello ", "diver"])
+        response = await self.async_client.post(
+            '/api/chat/', json.dumps({'message': 'hi'}),
+            content_type='application/json', headers={'Accept': 'text/event-stream'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([part async for part in response.streaming_content]).decode()
+        self.assertEqual(body, 'data: {"text": "Hello "}\n\ndata: {"text": "diver"}\n\nevent: done\ndata: {}\n\n')
+
+    async def test_chat_never_leaves_the_event_loop(self):
+        """Test the middleware chain awaits the chat view in the caller's own task"""
+        seen = []
+
+        class LoopChat(FakeChat):
+            async def send_message_async(self, message, stream=False):
+                seen.append((threading.get_ident(), asyncio.current_task()))
+                return await super().send_message_async(message, stream)
+
+        self.model.start_chat.side_effect = LoopChat
+        response = await self.async_client.post(
+            '/api/chat/', json.dumps({'message': 'hi'}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        # A sync-only middleware would run the view through async_to_sync in a new task
+        self.assertEqual(seen, [(threading.get_ident(), asyncio.current_task())])
+
+    async def test_limiter_queue_is_bounded_per_event_loop(self):
+        """Test that callers queued on one loop don't fill another loop's queue"""
+        limiter = chatbot.UpstreamLimiter(limit=1, max_waiting=1, wait_timeout=1)
+        slot = await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with self.assertRaises(chatbot.ChatbotBusy):
+            await limiter.acquire()
+
+        async def other_loop():
+            held = await limiter.acquire()
+            queued = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0)
+            held.release()
+            (await queued).release()
+
+        await asyncio.to_thread(asyncio.run, other_loop())
+        slot.release()
+        (await waiter).release()
+
+    async def test_saturated_limiter_returns_503(self):
+        """Test the fast 503 + Retry-After once slots and queue are used up"""
+        limiter = chatbot.UpstreamLimiter(limit=1, max_waiting=0, wait_timeout=1)
+        with mock.patch.object(chatbot, 'limiter', limiter):
+            slot = await limiter.acquire()
+            response = await self.async_client.post(
+                '/api/chat/', json.dumps({'message': 'hi'}), content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '5')
+            slot.release()
+            response = await self.async_client.post(
+                '/api/chat/', json.dumps({'message': 'hi'}), content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 200)
+
+
+class AnswerCacheTest(TestCase):
+    def setUp(self):
+        chatbot.sessions.clear()
+        chatbot.answers.clear()
+        self.chats = []
+        self.model = mock.Mock()
+        self.model.start_chat.side_effect = lambda: self.chats.append(FakeChat()) or self.chats[-1]
+        patcher = mock.patch.object(chatbot, 'get_model', return_value=self.model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _ask(self, message):
+        # A fresh client per question means a fresh conversation
+        client = self.client_class()
+        response = client.post('/api/chat/', json.dumps({'message': message}), content_type='application/json')
+        return response.json()['response']
+
+    def test_normalize_question(self):
+        """Test lowercasing, punctuation and stop-word removal"""
+        self.assertEqual(chatbot.normalize_question("What's the PRICE of Wreck Diving?!"), "s price wreck diving")
+        self.assertEqual(chatbot.normalize_question("How much is it?"), "much")
+
+    def test_repeated_first_question_is_served_from_cache(self):
+        """Test that a new visitor asking a known question skips Gemini"""
+        first = self._ask("Where are you located?")
+        second = self._ask("where are you LOCATED")
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.chats[1].history), 2)
+        self.assertEqual(chatbot.answers.stats()['hits'], 1)
+
+    async def test_cached_answer_waits_for_the_conversation_lock(self):
+        """Test a cache hit doesn't write history while another turn holds the lock"""
+        await chatbot.send_message('tab-1', "Where are you located?")
+        entry = chatbot.sessions.get_or_create('tab-2', FakeChat, await catalog.aget_version())
+        async with entry.lock:
+            pending = asyncio.ensure_future(chatbot.send_message('tab-2', "where are you located"))
+            done, _ = await asyncio.wait([pending], timeout=0.1)
+            self.assertFalse(done)
+            self.assertEqual(entry.chat.history, [])
+        await pending
+        self.assertEqual(len(entry.chat.history), 2)
+
+    def test_course_change_invalidates_answers(self):
+        """Test that editing a course retires cached answers"""
+        self._ask("beginner courses?")
+        Course.objects.create(title="Discover Scuba", price=90, description="Try it")
+        self._ask("beginner courses?")
+        self.assertEqual(chatbot.answers.stats()['hits'], 0)
+
+
+@mock.patch.dict('os.environ', {'GEMINI_API_KEY': 'test'})
+@mock.patch.object(chatbot.genai, 'configure', mock.Mock())
+class ChatPromptTest(TestCase):
+    def setUp(self):
+        chatbot.reset_model()
+        self.addCleanup(chatbot.reset_model)
+
+    async def test_prompt_lists_the_current_catalog(self):
+        """Test the system prompt is built from the courses and rebuilt when they change"""
+        await Course.objects.acreate(title="Wreck Diving", price=500, difficulty='Advanced', description="D")
+        with mock.patch.object(chatbot.genai, 'GenerativeModel') as model_class:
+            version = await catalog.aget_version()
+            model = await chatbot.get_model(version)
+            self.assertIs(await chatbot.get_model(version), model)
+            await Course.objects.acreate(title="Reef Tour", price='79.50', description="D")
+            await chatbot.get_model(await catalog.aget_version())
+        prompts = [call.kwargs['system_instruction'] for call in model_class.call_args_list]
+        self.assertEqual(len(prompts), 2)
+        self.assertIn("1. Wreck Diving: $500 (Advanced)", prompts[0])
+        self.assertNotIn("Reef Tour", prompts[0])
+        self.assertIn("1. Reef Tour: $79.50 (Beginner)\n2. Wreck Diving: $500 (Advanced)", prompts[1])
+
+
+class FakeResendServer:
+    """Local stand-in for the Resend API that records posted emails."""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.received = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers['Content-Length'])
+                fake.received.append(json.loads(self.rfile.read(length)))
+                self.send_response(fake.status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/emails'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        User.objects.create_user('diver', 'diver@example.com', 'pass12345')
+        self.resend = FakeResendServer()
+        self.addCleanup(self.resend.stop)
+        settings_patch = override_settings(RESEND_API_URL=self.resend.url)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+
+    def test_forgot_password_enqueues_instead_of_sending(self):
+        """Test that the view returns without calling the email provider"""
+        response = self.client.post('/forgot-password/', {'email': 'diver@example.com'})
+        self.assertRedirects(response, '/verify-otp/')
+        self.assertEqual(self.resend.received, [])
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(self.resend.received[0]['to'], ['diver@example.com'])
+        self.assertIn(self.client.session['reset_otp'], self.resend.received[0]['html'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        """Test retries, backoff and the final Failed state"""
+        self.resend.status = 503
+        job = jobs.enqueue('send_otp_email', max_attempts=2, email='diver@example.com', otp='123456')
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('Queued', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(jobs.claim_next())
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('Failed', 2))
+
+    def test_rejected_email_only_logs_the_otp_in_debug(self):
+        """Test the worker's fallback log keeps the OTP out of production logs"""
+        self.resend.status = 422
+        jobs.enqueue('send_otp_email', email='diver@example.com', otp='123456')
+        with self.assertLogs('reservations.emails', 'WARNING') as logs:
+            jobs.run_pending()
+        self.assertNotIn('123456', '\n'.join(logs.output))
+
+        jobs.enqueue('send_otp_email', email='diver@example.com', otp='654321')
+        with override_settings(DEBUG=True), self.assertLogs('reservations.emails', 'WARNING') as logs:
+            jobs.run_pending()
+        self.assertIn('654321', '\n'.join(logs.output))
+
+    def test_expired_claim_becomes_visible_again(self):
+        """Test that a job abandoned by a dead worker is picked up again"""
+        job = jobs.enqueue('send_otp_email', email='diver@example.com', otp='123456')
+        self.assertEqual(jobs.claim_next().pk, job.pk)
+        self.assertIsNone(jobs.claim_next())
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.claim_next().pk, job.pk)
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        instrumentation.latency.clear()
+        self.user = User.objects.create_user('diver', 'diver@example.com', 'pass12345')
+
+    def test_header_reports_phases_and_queries(self):
+        """Test the Server-Timing header on a page with SQL and a template"""
+        self.client.force_login(self.user)
+        response = self.client.get('/dashboard/')
+        metrics = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(metrics), {'mw', 'view', 'db', 'tpl', 'total'})
+        self.assertIn('desc="5 queries"', metrics['db'])
+
+    async def test_async_chain_reports_the_same_phases(self):
+        """Test the header when the middleware runs in async mode"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/dashboard/')
+        metrics = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(metrics), {'mw', 'view', 'db', 'tpl', 'total'})
+        self.assertIn('desc="5 queries"', metrics['db'])
+
+    def test_percentiles_are_staff_only(self):
+        """Test the per-URL-name latency summary endpoint"""
+        for _ in range(3):
+            self.client.get('/about/')
+        self.assertEqual(self.client.get('/admin/stats/timings/').status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        summary = self.client.get('/admin/stats/timings/').json()
+        self.assertEqual(summary['about']['count'], 3)
+        self.assertLessEqual(summary['about']['p50_ms'], summary['about']['p99_ms'])
+
+
+class CapacityTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('diver', 'diver@example.com', 'pass12345')
+        self.course = Course.objects.create(title="Blue Hole", price=300, description="Deep", daily_capacity=4)
+        self.date = timezone.localdate() + timedelta(days=30)
+        self.client.force_login(self.user)
+
+    def _book(self, divers, day=None):
+        day = day or self.date.isoformat()
+        return self.client.post(f'/book/{self.course.id}/', {'date': day, 'divers': divers})
+
+    def test_booking_stops_at_capacity(self):
+        """Test that a date can't be oversold"""
+        self.assertRedirects(self._book(3), '/dashboard/', fetch_redirect_response=False)
+        response = self._book(2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertRedirects(self._book(1), '/dashboard/', fetch_redirect_response=False)
+        self.assertEqual(SeatCounter.objects.get(course=self.course, date=self.date).booked, 4)
+
+    def test_reject_releases_seats(self):
+        """Test that the admin reject action frees the seats again"""
+        self._book(4)
+        ReservationAdmin(Reservation, admin.site).reject_reservations(
+            mock.Mock(), Reservation.objects.all()
+        )
+        self.assertEqual(SeatCounter.objects.get(course=self.course, date=self.date).booked, 0)
+
+    def test_malformed_date_is_not_booked_undated(self):
+        """Test that an unparseable date is rejected instead of skipping the capacity check"""
+        response = self._book(1, day='garbage')
+        self.assertContains(response, 'Please enter a valid date')
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_past_dates_are_refused(self):
+        """Test that a date before today can't be booked"""
+        response = self._book(1, day=(timezone.localdate() - timedelta(days=1)).isoformat())
+        self.assertContains(response, 'already passed')
+        self.assertFalse(Reservation.objects.exists())
+        self.assertFalse(SeatCounter.objects.exists())
+
+    def test_release_never_drives_a_counter_negative(self):
+        """Test releasing seats a counter never held (rows older than the counters)"""
+        self._book(1)
+        Reservation.objects.create(user=self.user, course=self.course, scheduled_date=self.date, number_of_divers=3)
+        admin_actions = ReservationAdmin(Reservation, admin.site)
+        admin_actions.reject_reservations(mock.Mock(), Reservation.objects.filter(number_of_divers=3))
+        self.assertEqual(SeatCounter.objects.get(course=self.course, date=self.date).booked, 0)
+        admin_actions.reject_reservations(mock.Mock(), Reservation.objects.all())
+        self.assertEqual(SeatCounter.objects.get(course=self.course, date=self.date).booked, 0)
+
+    def test_cascade_deletes_give_seats_back(self):
+        """Test that deleting a user frees the seats of their reservations"""
+        self._book(2)
+        other = User.objects.create_user('buddy', 'buddy@example.com', 'pass12345')
+        availability.book(self.course, self.date, 1, user=other, status='Pending')
+        other.delete()
+        self.assertEqual(SeatCounter.objects.get(course=self.course, date=self.date).booked, 2)
+        Reservation.objects.get().delete()
+        self.assertEqual(SeatCounter.objects.get(course=self.course, date=self.date).booked, 0)
+        self.course.delete()
+        self.assertFalse(SeatCounter.objects.exists())
+
+    def test_reapproving_a_cancellation_respects_capacity(self):
+        """Test the approve action can't overbook a date that filled up meanwhile"""
+        self._book(2)
+        cancelled = Reservation.objects.get()
+        ReservationAdmin(Reservation, admin.site).reject_reservations(mock.Mock(), Reservation.objects.all())
+        self._book(3)
+        staff = User.objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        self.client.force_login(staff)
+        response = self.client.post('/admin/reservations/reservation/', {
+            'action': 'approve_reservations', '_selected_action': list(Reservation.objects.values_list('pk', flat=True)),
+        }, follow=True)
+        self.assertContains(response, f"#{cancelled.pk} (Blue Hole on")
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'Cancelled')
+        self.assertEqual(Reservation.objects.filter(status='Confirmed').count(), 1)
+        self.assertEqual(SeatCounter.objects.get(course=self.course, date=self.date).booked, 3)
+
+    def test_availability_api_reads_counters(self):
+        """Test the free seats calendar"""
+        self._book(3)
+        self.client.logout()
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f'/api/courses/{self.course.id}/availability/',
+                {'start': (self.date - timedelta(days=1)).isoformat(), 'days': 3},
+            )
+        self.assertEqual([day['free'] for day in response.json()['dates']], [4, 1, 4])
+
+
+class ReservationAdminTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        course = Course.objects.create(title="Wreck", price=300, description="D")
+        for i in range(130):
+            Reservation.objects.create(user=self.staff, course=course, email=f"d{i}@example.com")
+        self.client.force_login(self.staff)
+
+    def test_changelist_pages_by_cursor_without_per_row_queries(self):
+        """Test joined rows, keyset navigation and bounded query count"""
+        url = '/admin/reservations/reservation/'
+        with CaptureQueriesContext(connection) as first_page:
+            response = self.client.get(url)
+        cl = response.context['cl']
+        self.assertEqual(len(cl.result_list), 100)
+        self.assertLess(len(first_page), 15)
+        second = self.client.get(url, {'after': cl.next_cursor}).context['cl']
+        self.assertEqual(len(second.result_list), 30)
+        self.assertIsNone(second.next_cursor)
+        seen = {r.pk for r in cl.result_list} | {r.pk for r in second.result_list}
+        self.assertEqual(len(seen), 130)
+
+    def test_change_form_does_not_list_users_or_courses(self):
+        """Test the change form renders raw id inputs instead of full selects"""
+        User.objects.bulk_create([User(username=f"extra{i}") for i in range(50)])
+        reservation = Reservation.objects.first()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(f'/admin/reservations/reservation/{reservation.pk}/change/')
+        self.assertNotContains(response, 'extra49')
+        self.assertContains(response, 'class="vForeignKeyRawIdAdminField"', count=2)
+        self.assertLess(len(captured), 15)
+
+    def test_course_is_narrowed_by_slug_search_not_a_listed_filter(self):
+        """Test the changelist doesn't render the catalog as a filter"""
+        Course.objects.bulk_create([Course(title=f"Extra {i}", slug=f"extra-{i}", price=1) for i in range(30)])
+        response = self.client.get('/admin/reservations/reservation/')
+        self.assertNotContains(response, 'Extra 29')
+        response = self.client.get('/admin/reservations/reservation/', {'q': 'wreck'})
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+        response = self.client.get('/admin/reservations/reservation/', {'q': 'extra-3'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def test_search_is_exact_on_email(self):
+        """Test that email search uses exact matching"""
+        response = self.client.get('/admin/reservations/reservation/', {'q': 'd7@example.com'})
+        self.assertEqual([r.email for r in response.context['cl'].result_list], ['d7@example.com'])
+
+    def test_search_matches_the_lower_indexes(self):
+        """Test search compares lower() expressions and matches name prefixes"""
+        Reservation.objects.filter(email='d7@example.com').update(full_name='Jacques Mayol')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/admin/reservations/reservation/', {'q': 'D7@Example.com'})
+        self.assertEqual([r.email for r in response.context['cl'].result_list], ['d7@example.com'])
+        sql = ' '.join(query['sql'] for query in captured).upper()
+        self.assertIn('LOWER("RESERVATIONS_RESERVATION"."EMAIL")', sql)
+        self.assertNotIn('UPPER(', sql)
+        response = self.client.get('/admin/reservations/reservation/', {'q': 'jacq'})
+        self.assertEqual([r.full_name for r in response.context['cl'].result_list], ['Jacques Mayol'])
+
+
+class ReservationExportTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        self.wreck = Course.objects.create(title="Wreck", price=300, description="D")
+        reef = Course.objects.create(title="Reef", price=80, description="D")
+        start = date(2026, 6, 1)
+        for i in range(30):
+            Reservation.objects.create(
+                user=self.staff, course=self.wreck if i % 2 else reef, full_name=f"Diver, {i}",
+                status='Confirmed' if i % 3 else 'Cancelled', scheduled_date=start + timedelta(days=i),
+            )
+
+    def test_admin_action_streams_filtered_changelist(self):
+        """Test the CSV action streams every filtered row with one data query"""
+        self.client.force_login(self.staff)
+        response = self.client.post('/admin/reservations/reservation/?status__exact=Confirmed', {
+            'action': 'export_csv', 'select_across': '1', 'index': '0',
+            '_selected_action': [Reservation.objects.first().pk],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="reservations-', response['Content-Disposition'])
+        with CaptureQueriesContext(connection) as captured:
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(captured), 1)
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'scheduled_date', 'course'])
+        self.assertEqual(len(lines), 1 + 20)
+        self.assertIn('"Diver, 1"', lines[1])
+        self.assertIn('Wreck', lines[1])
+
+    def test_command_filters_and_writes_ndjson(self):
+        """Test date range, status and course filters of export_reservations"""
+        out = StringIO()
+        call_command(
+            'export_reservations', format='ndjson', start=date(2026, 6, 1), end=date(2026, 6, 10),
+            status=['Confirmed'], course=[self.wreck.slug], chunk_size=2, stdout=out,
+        )
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([record['full_name'] for record in records], ["Diver, 1", "Diver, 5", "Diver, 7"])
+        self.assertEqual(records[0]['course'], "Wreck")
+        self.assertEqual(records[0]['scheduled_date'], '2026-06-02')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'manifest.csv'
+            call_command('export_reservations', course=[str(self.wreck.pk)], output=str(path), stderr=StringIO())
+            self.assertEqual(len(path.read_text().splitlines()), 1 + 15)
+
+
+class RevenueRollupTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        self.course = Course.objects.create(title="Wreck", price=300, description="D")
+        # book() refuses past dates, so use next year's June
+        self.june = date(timezone.localdate().year + 1, 6, 1)
+
+    def rollup(self, status, month=None):
+        row = RevenueRollup.objects.filter(course=self.course, month=month or self.june, status=status).first()
+        return (row.reservations, row.divers, row.revenue) if row else (0, 0, 0)
+
+    def book(self, day, divers):
+        return availability.book(self.course, self.june.replace(day=day), divers, user=self.staff, status='Pending')
+
+    def test_bookings_and_edits_update_rollups(self):
+        """Test create, status/date edits and deletes moving the contribution"""
+        first = self.book(3, 2)
+        self.book(20, 1)
+        self.assertEqual(self.rollup('Pending'), (2, 3, 900))
+
+        first = Reservation.objects.get(pk=first.pk)
+        first.status = 'Confirmed'
+        first.scheduled_date = self.june.replace(month=7, day=4)
+        first.save()
+        self.assertEqual(self.rollup('Pending'), (1, 1, 300))
+        self.assertEqual(self.rollup('Confirmed', self.june.replace(month=7)), (1, 2, 600))
+
+        unchanged = Reservation.objects.get(pk=first.pk)
+        with CaptureQueriesContext(connection) as captured:
+            unchanged.save()
+        self.assertFalse([q for q in captured if 'revenuerollup' in q['sql']])
+        first.delete()
+        self.assertEqual(self.rollup('Confirmed', self.june.replace(month=7)), (0, 0, 0))
+        self.assertEqual(rollups.drift(), [])
+
+    def test_deleting_a_booked_course_drops_its_rollups(self):
+        """Test the Reservation cascade doesn't re-create rollups for a deleted course"""
+        self.book(3, 2)
+        other = Course.objects.create(title="Reef", price=80, description="D")
+        availability.book(other, self.june, 1, user=self.staff, status='Pending')
+        self.course.delete()
+        self.assertFalse(RevenueRollup.objects.filter(course_id=self.course.pk).exists())
+        self.staff.delete()
+        self.assertEqual(rollups.drift(), [])
+
+    def test_admin_bulk_actions_move_rollups(self):
+        """Test approve/reject (queryset.update paths) keep rollups exact"""
+        for day in (1, 2, 3):
+            self.book(day, 2)
+        self.client.force_login(self.staff)
+        url = '/admin/reservations/reservation/'
+        ids = list(Reservation.objects.values_list('pk', flat=True))
+        self.client.post(url, {'action': 'approve_reservations', '_selected_action': ids[:2]})
+        self.assertEqual(self.rollup('Confirmed'), (2, 4, 1200))
+        self.client.post(url, {'action': 'reject_reservations', '_selected_action': ids})
+        self.assertEqual(self.rollup('Cancelled'), (3, 6, 1800))
+        self.assertEqual(self.rollup('Confirmed'), (0, 0, 0))
+        self.assertEqual(rollups.drift(), [])
+
+        self.course.price = 100
+        self.course.save()
+        self.assertEqual(self.rollup('Cancelled'), (3, 6, 600))
+
+    def test_rebuild_command_fixes_drift(self):
+        """Test that bulk-loaded reservations show up as drift and get rebuilt"""
+        Reservation.objects.bulk_create([
+            Reservation(user=self.staff, course=self.course, scheduled_date=self.june, number_of_divers=4),
+        ])
+        out = StringIO()
+        call_command('rebuild_rollups', check=True, stdout=out)
+        self.assertIn('1 rollup row(s) out of date', out.getvalue())
+        self.assertEqual(self.rollup('Pending'), (0, 0, 0))
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup('Pending'), (1, 4, 1200))
+        self.assertEqual(rollups.drift(), [])
+
+    def test_report_reads_only_rollups(self):
+        """Test the admin report lists rollups with totals"""
+        self.book(3, 2)
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/admin/reservations/revenuerollup/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['totals'], {'reservations': 1, 'divers': 2, 'revenue': 600})
+        self.assertContains(response, f'{self.june:%Y-%m}')
+        self.assertFalse([q for q in captured if 'reservations_reservation' in q['sql']])
+
+
+class BenchmarkIndexesCommandTest(TestCase):
+    def test_reports_plans_and_rolls_back(self):
+        """Test the index benchmark on a tiny dataset"""
+        out = StringIO()
+        call_command('benchmark_indexes', users=5, courses=5, reservations=50, repeat=1, stdout=out)
+        self.assertIn('reservation_user_recent_idx', out.getvalue())
+        self.assertFalse(Reservation.objects.exists())
+
+
+class SeedCoursesCommandTest(TestCase):
+    def generate(self):
+        call_command(
+            'seed_courses', instructors=3, courses=20, users=50, reservations=400,
+            batch_size=64, seed=7, stdout=StringIO(),
+        )
+        return list(Reservation.objects.order_by('id').values_list('course__slug', 'user__username', 'status'))
+
+    def test_generates_skewed_dataset_and_derived_data(self):
+        """Test the generator's volumes, skew and refreshed seat counters"""
+        self.generate()
+        self.assertEqual(Reservation.objects.count(), 400)
+        self.assertEqual(Course.objects.filter(slug__startswith='seed7-course-').count(), 20)
+        # Curated catalog still seeded alongside
+        self.assertTrue(Course.objects.filter(slug='open-water-diver').exists())
+
+        top = Reservation.objects.filter(course__slug='seed7-course-0').count()
+        tail = Reservation.objects.filter(course__slug='seed7-course-19').count()
+        self.assertGreater(top, 4 * max(tail, 1))
+
+        booked = SeatCounter.objects.aggregate(total=Sum('booked'))['total']
+        expected = (
+            Reservation.objects.exclude(status='Cancelled').exclude(scheduled_date=None)
+            .aggregate(total=Sum('number_of_divers'))['total']
+        )
+        self.assertEqual(booked, expected)
+
+    def test_keeps_generated_booking_dates(self):
+        """Test booking dates are spread over the past without touching the model field"""
+        self.generate()
+        oldest = Reservation.objects.order_by('booking_date').values_list('booking_date', flat=True).first()
+        self.assertLess(oldest, timezone.now() - timedelta(days=30))
+        self.assertTrue(Reservation._meta.get_field('booking_date').auto_now_add)
+
+    def test_same_seed_gives_same_rows(self):
+        """Test the generator is deterministic for a given seed"""
+        first = self.generate()
+        Reservation.objects.all().delete()
+        Course.objects.filter(slug__startswith='seed7-').delete()
+        User.objects.filter(username__startswith='seed7_').delete()
+        Instructor.objects.filter(name__contains='(seed7-').delete()
+        self.assertEqual(self.generate(), first)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BenchmarkViewsCommandTest(TestCase):
+    def run_benchmark(self, baseline):
+        call_command(
+            'benchmark_views', users=5, courses=5, reservations=50, repeat=2, warmup=0,
+            baseline=baseline, stdout=StringIO(),
+        )
+
+    def test_writes_baseline_then_flags_regressions(self):
+        """Test the view benchmark records a baseline and fails on regressions"""
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = Path(tmp) / 'baseline.json'
+            self.run_benchmark(str(baseline))
+            recorded = json.loads(baseline.read_text())
+            self.assertIn('dashboard', recorded['views'])
+            self.assertFalse(Reservation.objects.exists())
+
+            for result in recorded['views'].values():
+                result.update(p50_ms=0.0, p95_ms=0.0, queries=0)
+            baseline.write_text(json.dumps(recorded))
+            with self.assertRaisesMessage(CommandError, 'dashboard: 5 queries, baseline had 0'):
+                self.run_benchmark(str(baseline))
+
+    def test_fails_over_query_budget(self):
+        """Test a view going over its query budget fails the run"""
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.dict('reservations.management.commands.benchmark_views.QUERY_BUDGETS', dashboard=1):
+            with self.assertRaisesMessage(CommandError, 'budget is 1'):
+                self.run_benchmark(str(Path(tmp) / 'baseline.json'))
+
+
+@override_settings(SESSION_ENGINE='aquasense.sessions')
+class SessionEngineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('diver', 'diver@example.com', 'pass12345')
+
+    def session_queries(self, captured):
+        return [query['sql'] for query in captured if 'django_session' in query['sql']]
+
+    def test_unchanged_session_is_not_written(self):
+        """Test that saving a session with the data it was loaded with costs no query"""
+        store = sessions.SessionStore()
+        store['reset_email'] = 'diver@example.com'
+        store.save()
+
+        again = sessions.SessionStore(store.session_key)
+        again['reset_email'] = 'diver@example.com'
+        with self.assertNumQueries(0):
+            again.save()
+        again['otp_attempts'] = 1
+        with CaptureQueriesContext(connection) as captured:
+            again.save()
+        self.assertEqual(len(self.session_queries(captured)), 1)
+
+    def test_login_creates_the_new_session_with_one_insert(self):
+        """Test that login cycles the key with a delete and a single insert"""
+        self.client.post('/forgot-password/', {'email': 'diver@example.com'})
+        old_key = self.client.session.session_key
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/login/', {'username': 'diver', 'password': 'pass12345'})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        writes = [sql.split()[0] for sql in self.session_queries(captured)]
+        self.assertEqual(writes, ['DELETE', 'INSERT'])
+
+        self.assertNotEqual(self.client.session.session_key, old_key)
+        self.assertFalse(Session.objects.filter(session_key=old_key).exists())
+        self.assertEqual(self.client.session['reset_email'], 'diver@example.com')
+        self.assertEqual(self.client.get('/dashboard/').status_code, 200)
+
+    def test_clear_expired_in_batches(self):
+        """Test that expired rows are deleted batch by batch and fresh ones kept"""
+        past = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{i}', session_data='', expire_date=past) for i in range(5)
+        )
+        Session.objects.create(session_key='fresh', session_data='', expire_date=timezone.now() + timedelta(days=1))
+        self.assertEqual(sessions.SessionStore.clear_expired(batch_size=2), 5)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['fresh'])
+
+    def test_purge_job_reschedules_itself(self):
+        """Test the background purge removes expired rows and queues the next run"""
+        Session.objects.create(session_key='expired', session_data='', expire_date=timezone.now() - timedelta(days=1))
+        self.assertIsNotNone(housekeeping.schedule_session_purge())
+        self.assertIsNone(housekeeping.schedule_session_purge())
+
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertFalse(Session.objects.exists())
+        job = Job.objects.get(name=housekeeping.PURGE_SESSIONS)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=settings.SESSION_PURGE_INTERVAL - 60))
+
+    def test_benchmark_reports_saved_writes(self):
+        """Test the session benchmark compares engines and rolls back"""
+        out = StringIO()
+        call_command('benchmark_sessions', repeat=1, stdout=out)
+        self.assertIn('aquasense', out.getvalue())
+        self.assertIn('50%', out.getvalue())
+        self.assertFalse(User.objects.filter(username='session-bench').exists())
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        ratelimit.reset()
+        self.addCleanup(ratelimit.reset)
+        User.objects.create_user('diver', 'diver@example.com', 'pass12345')
+
+    def test_token_bucket_refills(self):
+        """Test burst size, the wait for the next token and refilling"""
+        rate = ratelimit.parse_rate('2/m')
+        allowed, state, _ = ratelimit.take(None, rate, now=0)
+        allowed, state, _ = ratelimit.take(state, rate, now=0)
+        self.assertTrue(allowed)
+        allowed, state, wait = ratelimit.take(state, rate, now=0)
+        self.assertFalse(allowed)
+        self.assertEqual(wait, 30)
+        allowed, state, _ = ratelimit.take(state, rate, now=30)
+        self.assertTrue(allowed)
+        with self.assertRaises(ValueError):
+            ratelimit.parse_rate('2/week')
+
+    @override_settings(RATE_LIMITS={'login': {'ip': '1/m'}})
+    def test_login_posts_get_429_with_retry_after(self):
+        """Test that login POSTs over the limit are rejected and GETs are not"""
+        self.assertEqual(self.client.post('/login/', {'username': 'diver', 'password': 'wrong'}).status_code, 200)
+        response = self.client.post('/login/', {'username': 'diver', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(self.client.get('/login/').status_code, 200)
+
+    @override_settings(RATE_LIMITS={'forgot_password': {'ip': '10/h', 'email': '1/h'}})
+    def test_forgot_password_limited_per_email_across_addresses(self):
+        """Test that a rejected OTP request costs no query and queues no email"""
+        self.assertEqual(self.client.post('/forgot-password/', {'email': 'diver@example.com'}).status_code, 302)
+        # A scripted client without cookies: nothing loads a session or user
+        with self.assertNumQueries(0):
+            response = self.client_class().post(
+                '/forgot-password/', {'email': 'Diver@Example.com'}, REMOTE_ADDR='10.0.0.2',
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Job.objects.count(), 1)
+
+    @override_settings(RATE_LIMITS={'chat': {'ip': '1/m'}}, RATE_LIMIT_STORE='cache')
+    async def test_chat_gets_json_429_from_the_shared_store(self):
+        """Test the async chat view is limited through the cache-backed store"""
+        await cache.aclear()
+        with mock.patch.object(chatbot, 'send_message', mock.AsyncMock(return_value='hello')):
+            first = await self.async_client.post('/api/chat/', json.dumps({'message': 'hi'}), content_type='application/json')
+            second = await self.async_client.post('/api/chat/', json.dumps({'message': 'hi'}), content_type='application/json')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(second.json(), {'error': 'Too many requests. Please try again later.'})
+        self.assertEqual(second['Retry-After'], '60')
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_are_cached_with_validators(self):
+        """Test anonymous marketing pages are served from cache and support 304s"""
+        first = self.client.get('/about/')
+        self.assertEqual(first['X-Page-Cache'], 'MISS')
+        self.assertIn('public', first['Cache-Control'])
+
+        with mock.patch('reservations.views.render') as render:
+            second = self.client.get('/about/?utm_source=ads')
+            render.assert_not_called()
+        self.assertEqual(second['X-Page-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertNotIn('csrftoken', second.cookies)
+
+        not_modified = self.client.get('/about/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get('/about/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_logged_in_users_bypass_the_cache(self):
+        """Test logged-in users get a private render with their own header"""
+        self.client.get('/')
+        user = User.objects.create_user(username='pagecache_diver', password='x')
+        self.client.force_login(user)
+        response = self.client.get('/')
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertContains(response, 'pagecache_diver')
+
+    def test_purge_on_deploy(self):
+        """Test the purge command forces a fresh render"""
+        self.client.get('/contact/')
+        call_command('purge_page_cache', stdout=StringIO())
+        self.assertEqual(self.client.get('/contact/')['X-Page-Cache'], 'MISS')
+        with override_settings(PAGE_CACHE_RELEASE='next-release'):
+            self.assertEqual(self.client.get('/contact/')['X-Page-Cache'], 'MISS')
+
+
+FAKE_TAILWIND_CLI = '''#!/usr/bin/env python3
+import sys
+args = sys.argv[1:]
+config = open(args[args.index('-c') + 1]).read()
+assert 'templates/reservations' in config and '@tailwindcss/forms' in config
+open(args[args.index('-o') + 1], 'w').write('.text-primary{color:#0a64ff}' + ('' if '--minify' in args else '\\n'))
+'''
+
+
+class BuildTailwindTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.cli = self.tmp / 'tailwindcss'
+        self.cli.write_text(FAKE_TAILWIND_CLI)
+        self.cli.chmod(0o755)
+        for name, value in (('OUTPUT_DIR', self.tmp / 'css'), ('MANIFEST', self.tmp / 'css' / 'tailwind.json')):
+            patcher = mock.patch.object(tailwind, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        tailwind.stylesheet.cache_clear()
+        self.addCleanup(tailwind.stylesheet.cache_clear)
+
+    def test_build_writes_hashed_file_and_switches_templates(self):
+        """Test the build emits a content-hashed stylesheet that the pages link"""
+        (self.tmp / 'css').mkdir()
+        (self.tmp / 'css' / 'tailwind.0123456789ab.css').write_text('old')
+        call_command('build_tailwind', cli=str(self.cli), stdout=StringIO())
+
+        built = [path.name for path in (self.tmp / 'css').glob('tailwind.*.css')]
+        self.assertEqual(len(built), 1)
+        self.assertRegex(built[0], tailwind.HASHED_NAME)
+        self.assertRegex(f'/static/reservations/css/{built[0]}', settings.WHITENOISE_IMMUTABLE_FILE_TEST)
+
+        response = self.client.get('/login/')
+        self.assertContains(response, f'reservations/css/{built[0]}')
+        self.assertNotContains(response, 'cdn.tailwindcss.com')
+
+    def test_unbuilt_falls_back_to_cdn(self):
+        """Test pages keep working before the first build"""
+        self.assertContains(self.client.get('/login/'), 'cdn.tailwindcss.com')
+
+    def test_missing_cli(self):
+        """Test a clear error when the Tailwind CLI isn't installed"""
+        with self.assertRaisesMessage(CommandError, 'not found'):
+            call_command('build_tailwind', cli=str(self.tmp / 'missing'), stdout=StringIO())
+
+
+class ResponsiveImageTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        for name, value in (('OUTPUT_DIR', self.tmp / 'out'), ('MANIFEST', self.tmp / 'out' / 'manifest.json')):
+            patcher = mock.patch.object(responsive, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        responsive.entries.cache_clear()
+        self.addCleanup(responsive.entries.cache_clear)
+
+    def render(self):
+        return Template(
+            "{% load responsive_tags %}{% responsive_image 'hero_bg.jpg' sizes='100vw' alt='Hero' class='w-full' %}"
+        ).render(Context())
+
+    def test_srcset_from_manifest(self):
+        """Test the tag emits AVIF/WebP srcsets from the manifest"""
+        (self.tmp / 'out').mkdir()
+        variants = {
+            fmt: [{'width': width, 'path': f'reservations/responsive/hero_bg.{width}w.0123456789ab.{fmt}'}
+                  for width in (320, 640)]
+            for fmt in ('avif', 'webp')
+        }
+        responsive.write_manifest({'sources': {'hero_bg.jpg': {
+            'sha256': '0123456789ab', 'width': 640, 'height': 400,
+            'formats': ['avif', 'webp'], 'variants': variants,
+        }}})
+        html = self.render()
+        self.assertIn('<source type="image/avif" srcset="/static/reservations/responsive/hero_bg.320w.0123456789ab.avif 320w, ', html)
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('sizes="100vw"', html)
+        self.assertIn('width="640"', html)
+        self.assertIn('src="/static/reservations/images/hero_bg.jpg"', html)
+        self.assertRegex(variants['webp'][0]['path'], settings.WHITENOISE_IMMUTABLE_FILE_TEST)
+
+    def test_plain_img_until_built(self):
+        """Test the tag falls back to the original image"""
+        html = self.render()
+        self.assertNotIn('<picture', html)
+        self.assertIn('class="w-full"', html)
+
+    @skipUnless(importlib.util.find_spec('PIL'), 'Pillow not installed')
+    def test_build_is_incremental(self):
+        """Test variants are built once and only rebuilt when a source changes"""
+        from PIL import Image
+        source_dir = self.tmp / 'images'
+        source_dir.mkdir()
+        Image.new('RGB', (800, 500), 'blue').save(source_dir / 'hero_bg.jpg')
+        with mock.patch.object(responsive, 'SOURCE_DIR', source_dir):
+            out = StringIO()
+            call_command('build_image_variants', stdout=out)
+            self.assertIn('1 source(s) processed', out.getvalue())
+            widths = [v['width'] for v in responsive.load_manifest()['sources']['hero_bg.jpg']['variants']['webp']]
+            self.assertEqual(widths, [320, 640, 800])
+
+            out = StringIO()
+            call_command('build_image_variants', stdout=out)
+            self.assertIn('0 source(s) processed, 1 unchanged', out.getvalue())
+
+
+class CloudinaryPresetTest(TestCase):
+    SEEDED = 'https://res.cloudinary.com/dp2ov37tr/image/upload/v1763854348/aquasense/aquasense/open_water.png'
+
+    def setUp(self):
+        cloudinary_urls.clear_cache()
+        self.image = Course._meta.get_field('image').to_python(self.SEEDED)
+
+    def test_presets_request_right_sized_auto_format(self):
+        """Test presets add f_auto/q_auto and a width, keeping cloud and version"""
+        url = cloudinary_urls.image_url(self.image, 'card')
+        self.assertTrue(url.startswith('https://res.cloudinary.com/dp2ov37tr/image/upload/'))
+        for part in ('f_auto', 'q_auto', 'w_800', 'v1763854348', 'aquasense/aquasense/open_water'):
+            self.assertIn(part, url)
+        self.assertIn('w_160', cloudinary_urls.image_url(self.image, 'avatar'))
+        with self.assertRaises(cloudinary_urls.UnknownPreset):
+            cloudinary_urls.image_url(self.image, 'poster')
+
+    def test_urls_are_memoized(self):
+        """Test repeated renders reuse the built URL"""
+        for _ in range(3):
+            cloudinary_urls.image_url(self.image, 'card')
+        self.assertEqual(cloudinary_urls.cache_info().misses, 1)
+        self.assertEqual(cloudinary_urls.cache_info().hits, 2)
+
+    def test_foreign_urls_pass_through(self):
+        """Test non-Cloudinary URLs are served unchanged"""
+        photo = Instructor._meta.get_field('photo').to_python('https://randomuser.me/api/portraits/men/32.jpg')
+        self.assertEqual(cloudinary_urls.image_url(photo, 'avatar'), 'https://randomuser.me/api/portraits/men/32.jpg')
+
+    def test_template_tag(self):
+        """Test the cloudinary_src tag"""
+        html = Template("{% load image_presets %}{% cloudinary_src image 'hero' %}").render(Context({'image': self.image}))
+        self.assertIn('w_1920', html)
+
+
+class CloudinarySyncTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.files = []
+        for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+            path = self.tmp / name
+            path.write_bytes(name.encode())
+            self.files.append(path)
+        self.calls = []
+        self.flaky = {}
+
+    def upload(self, path, public_id):
+        self.calls.append(public_id)
+        if self.flaky.get(public_id, 0) > 0:
+            self.flaky[public_id] -= 1
+            raise ConnectionError('upstream hiccup')
+        return {'public_id': f'aquasense/{public_id}', 'secure_url': f'https://cdn.test/{public_id}'}
+
+    def sync(self, **kwargs):
+        with mock.patch('builtins.print'):
+            return cloudinary_helper.sync_images(
+                self.files, upload=self.upload, workers=3, manifest_path=self.tmp / 'manifest.json',
+                sleep=lambda seconds: None, **kwargs
+            )
+
+    def test_unchanged_files_are_skipped(self):
+        """Test a second sync only uploads files whose content changed"""
+        first = self.sync()
+        self.assertEqual(sorted(first['uploaded']), ['a.jpg', 'b.jpg', 'c.jpg'])
+        self.files[1].write_bytes(b'new content')
+        self.calls.clear()
+        second = self.sync()
+        self.assertEqual(self.calls, ['b'])
+        self.assertEqual(sorted(second['skipped']), ['a.jpg', 'c.jpg'])
+        self.assertEqual(second['urls']['a.jpg'], 'https://cdn.test/a')
+
+    def test_retries_then_resumes_after_failure(self):
+        """Test transient errors are retried and permanent ones resume on the next run"""
+        self.flaky = {'a': 1, 'c': 10}
+        report = self.sync(retries=2)
+        self.assertEqual(sorted(report['uploaded']), ['a.jpg', 'b.jpg'])
+        self.assertEqual(list(report['failed']), ['c.jpg'])
+
+        self.flaky = {}
+        self.calls.clear()
+        report = self.sync()
+        self.assertEqual(self.calls, ['c'])
+        self.assertEqual(report['uploaded'], ['c.jpg'])
+
+
+class FakeAssetServer:
+    """Local asset host that honours If-None-Match and counts full downloads."""
+
+    def __init__(self, files):
+        self.files = files
+        self.full_downloads = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = fake.files[self.path.lstrip('/')]
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                fake.full_downloads.append(self.path)
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class AssetFetcherTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.server = FakeAssetServer({'a.jpg': b'a' * 200000, 'b.jpg': b'b' * 10})
+        self.addCleanup(self.server.stop)
+        self.assets = {name: self.server.url + name for name in ('a.jpg', 'b.jpg')}
+
+    def download(self, **kwargs):
+        return download_images.download_all(
+            self.assets, output_dir=self.tmp / 'images', manifest_path=self.tmp / 'manifest.json', workers=2, **kwargs
+        )
+
+    def test_conditional_refresh(self):
+        """Test a refresh only re-downloads changed or locally corrupted files"""
+        report = self.download()
+        self.assertEqual(sorted(report['downloaded']), ['a.jpg', 'b.jpg'])
+        self.assertEqual((self.tmp / 'images' / 'a.jpg').read_bytes(), b'a' * 200000)
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual((self.tmp / 'images' / 'a.jpg').stat().st_mode & 0o777, 0o644 & ~umask)
+        self.assertEqual(list((self.tmp / 'images').glob('*.part')), [])
+
+        self.server.full_downloads.clear()
+        self.server.files['b.jpg'] = b'changed'
+        (self.tmp / 'images' / 'a.jpg').write_bytes(b'corrupt')
+        report = self.download()
+        self.assertEqual(sorted(report['downloaded']), ['a.jpg', 'b.jpg'])
+
+        self.server.full_downloads.clear()
+        report = self.download()
+        self.assertEqual(sorted(report['unchanged']), ['a.jpg', 'b.jpg'])
+        self.assertEqual(self.server.full_downloads, [])
+
+    def test_checksum_mismatch_keeps_existing_file(self):
+        """Test a download failing its pinned checksum never replaces the file"""
+        (self.tmp / 'images').mkdir()
+        (self.tmp / 'images' / 'b.jpg').write_bytes(b'previous')
+        report = self.download(checksums={'b.jpg': '0' * 64})
+        self.assertIn('b.jpg', report['failed'])
+        self.assertEqual((self.tmp / 'images' / 'b.jpg').read_bytes(), b'previous')
+        self.assertEqual(list((self.tmp / 'images').glob('*.part')), [])
@@ -26,4 +26,7 @@ urlpatterns = [
 
     # --- APIs ---
     path('api/chat/', views.chat_view, name='chat_api'),
+    path('api/courses/', views.courses_api, name='courses_api'),
+    path('api/courses/<slug:slug>/', views.course_detail_api, name='course_detail_api'),
+    path('api/courses/<int:course_id>/availability/', views.course_availability, name='course_availability'),
 ]
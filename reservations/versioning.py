@@ -0,0 +1,41 @@
+"""
+Cache-held version counters for namespaced cache keys.
+
+Embedding a counter in every key of a family means one incr() retires the
+whole family: old entries are never read again and simply age out. Used by
+the catalog result sets (reservations.catalog) and the full-page cache
+(reservations.pagecache).
+"""
+
+from django.core.cache import cache
+
+
+class CacheVersion:
+    """A counter stored under `key` that starts at 1 on an empty cache."""
+
+    def __init__(self, key):
+        self.key = key
+
+    def get(self):
+        version = cache.get(self.key)
+        if version is None:
+            # add() so concurrent first readers agree on the starting value
+            cache.add(self.key, 1, timeout=None)
+            version = cache.get(self.key, 1)
+        return version
+
+    async def aget(self):
+        """Async counterpart of get() for async views."""
+        version = await cache.aget(self.key)
+        if version is None:
+            await cache.aadd(self.key, 1, timeout=None)
+            version = await cache.aget(self.key, 1)
+        return version
+
+    def bump(self):
+        """Moves to the next version, retiring every key built from the current one."""
+        try:
+            cache.incr(self.key)
+        except ValueError:
+            # Counter missing (evicted or never read): anything past 1 is new
+            cache.set(self.key, 2, timeout=None)
@@ -1,22 +1,29 @@
-import os
 import random
-import requests
 import json
 import logging
-import google.generativeai as genai
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import Case, Count, IntegerField, When, Q
+from django.utils.dateparse import parse_date
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_safe
+
+from aquasense import instrumentation
 
 from .models import Course, Reservation
 from .forms import SignUpForm
+from . import availability, catalog, chatbot, course_api, jobs, search
+from .pagecache import cache_anonymous_page
+from .ratelimit import rate_limit
+from .pagination import DEFAULT_PAGE_SIZE, InvalidCursor, keyset_page
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -25,14 +32,17 @@ logger = logging.getLogger(__name__)
 #               MAIN PAGES
 # ==========================================
 
+@cache_anonymous_page
 def home(request):
-    """Renders the homepage."""
+    """Renders the homepage (full-page cached for anonymous visitors)."""
     return render(request, 'reservations/index.html')
 
+@cache_anonymous_page
 def about(request):
     """Renders the about page."""
     return render(request, 'reservations/about.html')
 
+@cache_anonymous_page
 def contact(request):
     """Renders the contact page - currently static."""
     return render(request, 'reservations/contact.html')
@@ -41,37 +51,51 @@ def contact(request):
 #            COURSE & BOOKING
 # ==========================================
 
+def _filter_courses(query, difficulty, price_range):
+    """Builds the ordered catalog queryset for already-normalized filters."""
+    courses = Course.objects.all().order_by('-is_popular', 'title')
+
+    if difficulty:
+        courses = courses.filter(difficulty=difficulty)
+
+    if price_range == 'low':
+        courses = courses.filter(price__lt=100)
+    elif price_range == 'mid':
+        courses = courses.filter(price__gte=100, price__lte=500)
+    elif price_range == 'high':
+        courses = courses.filter(price__gt=500)
+
+    if query:
+        if search.is_enabled():
+            # The filters above run inside the index query, before its hit limit
+            hit_ids = search.search_course_ids(query, within=courses)
+            # Keep the relevance order from the index; the API pages on it too
+            ranking = Case(
+                *[When(pk=pk, then=pos) for pos, pk in enumerate(hit_ids)],
+                default=len(hit_ids), output_field=IntegerField(),
+            )
+            courses = courses.filter(pk__in=hit_ids).annotate(search_rank=ranking).order_by('search_rank')
+        else:
+            courses = courses.filter(Q(title__icontains=query) | Q(description__icontains=query))
+
+    return courses
+
 def courses(request):
     """
     Displays the list of courses with advanced filtering and sorting.
     Handles 'q' (search), 'difficulty', and 'price_range' filtering.
+    Searches go through the full-text index and come back ranked by relevance;
+    result sets are served from the catalog cache until a course changes.
     """
-    courses = Course.objects.all().order_by('-is_popular', 'title')
-    
-    # --- Filter Logic ---
     query = request.GET.get('q')
     difficulty = request.GET.get('difficulty')
     price_range = request.GET.get('price_range')
 
-    if query:
-        courses = courses.filter(title__icontains=query) | courses.filter(description__icontains=query)
-    
-    if difficulty and difficulty != 'All':
-        courses = courses.filter(difficulty=difficulty)
-        
-    if price_range:
-        if price_range == 'low':
-            courses = courses.filter(price__lt=100)
-        elif price_range == 'mid':
-            courses = courses.filter(price__gte=100, price__lte=500)
-        elif price_range == 'high':
-            courses = courses.filter(price__gt=500)
-
-    # Remove duplicates if any
-    courses = courses.distinct()
+    filters = catalog.normalize_filters(query, difficulty, price_range)
+    cards = catalog.get_cards(filters, lambda: _filter_courses(*filters))
 
     return render(request, 'reservations/courses.html', {
-        'courses': courses,
+        'courses': cards,
         'selected_difficulty': difficulty,
         'selected_price': price_range,
         'search_query': query
@@ -86,7 +110,9 @@ def details(request, slug):
 def book_course(request, course_id):
     """
     Handles the booking process.
-    Creates a Reservation with 'Pending' status and redirects to dashboard.
+    Takes the seats for the chosen date atomically, creates a Reservation with
+    'Pending' status and redirects to dashboard. Sold-out and past dates
+    re-render the checkout page with an error.
     """
     course = get_object_or_404(Course, id=course_id)
 
@@ -96,26 +122,112 @@ def book_course(request, course_id):
         full_name = request.POST.get('full_name')
         email = request.POST.get('email')
         phone = request.POST.get('phone')
-        divers = request.POST.get('divers', 1)
         cert_level = request.POST.get('certification')
         medical = request.POST.get('medical_clearance') == 'on'
 
-        Reservation.objects.create(
-            user=request.user,
-            course=course,
-            status='Pending',
-            scheduled_date=scheduled_date if scheduled_date else None,
-            full_name=full_name,
-            email=email,
-            phone_number=phone,
-            number_of_divers=divers,
-            certification_level=cert_level,
-            medical_clearance=medical
-        )
+        try:
+            divers = int(request.POST.get('divers', 1))
+            raw_date = scheduled_date
+            scheduled_date = parse_date(raw_date) if raw_date else None
+            # parse_date() returns None for malformed input instead of raising
+            if divers < 1 or (raw_date and scheduled_date is None):
+                raise ValueError
+        except ValueError:
+            messages.error(request, 'Please enter a valid date and number of divers.')
+            return render(request, 'reservations/checkout.html', {'course': course})
+
+        try:
+            availability.book(
+                course,
+                scheduled_date,
+                divers,
+                user=request.user,
+                status='Pending',
+                full_name=full_name,
+                email=email,
+                phone_number=phone,
+                certification_level=cert_level,
+                medical_clearance=medical
+            )
+        except availability.SoldOut:
+            messages.error(request, 'Sorry, there are not enough seats left on that date. Please pick another day.')
+            return render(request, 'reservations/checkout.html', {'course': course})
+        except availability.DateInPast:
+            messages.error(request, 'That date has already passed. Please pick another day.')
+            return render(request, 'reservations/checkout.html', {'course': course})
         return redirect('dashboard')
 
     return render(request, 'reservations/checkout.html', {'course': course})
 
+def course_availability(request, course_id):
+    """
+    API endpoint: free seats per date for a course.
+    Optional 'start' (YYYY-MM-DD, default today) and 'days' (default 90).
+    """
+    course = get_object_or_404(Course, id=course_id)
+    try:
+        start = parse_date(request.GET['start']) if 'start' in request.GET else None
+        days = int(request.GET.get('days', 90))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start or days'}, status=400)
+
+    calendar = availability.availability(course, start=start, days=days)
+    for day in calendar:
+        day['date'] = day['date'].isoformat()
+    return JsonResponse({'course': course.id, 'dates': calendar})
+
+@require_safe
+@course_api.conditional_catalog
+def courses_api(request):
+    """
+    API endpoint: the course catalog as JSON, in the catalog page's order.
+    Takes the catalog page's 'q', 'difficulty' and 'price_range' filters,
+    'fields' (comma-separated, see course_api.FIELDS), 'limit' (max 100)
+    and the 'after'/'before' cursors returned with the previous page.
+    """
+    try:
+        fields = course_api.parse_fields(request.GET.get('fields'), course_api.LIST_FIELDS)
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+        if not 1 <= limit <= course_api.MAX_PAGE_SIZE:
+            raise ValueError
+    except course_api.InvalidFields as e:
+        return JsonResponse({'error': f'Unknown fields: {e}'}, status=400)
+    except ValueError:
+        return JsonResponse({'error': f'limit must be between 1 and {course_api.MAX_PAGE_SIZE}'}, status=400)
+
+    filters = catalog.normalize_filters(
+        request.GET.get('q'), request.GET.get('difficulty'), request.GET.get('price_range'),
+    )
+    courses = _filter_courses(*filters)
+    # Same order as the HTML catalog: relevance for searches, else popular first by title
+    order = course_api.SEARCH_ORDER if 'search_rank' in courses.query.annotations else course_api.CATALOG_ORDER
+    rows = courses.values(*course_api.lookups(fields, *(name.lstrip('-') for name in order)))
+    try:
+        page = keyset_page(
+            rows, order=order, after=request.GET.get('after'), before=request.GET.get('before'), page_size=limit,
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'results': [course_api.serialize(row, fields) for row in page['items']],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor'],
+    })
+
+@require_safe
+@course_api.conditional_catalog
+def course_detail_api(request, slug):
+    """API endpoint: one course as JSON; 'fields' works as in courses_api."""
+    try:
+        fields = course_api.parse_fields(request.GET.get('fields'), course_api.DETAIL_FIELDS)
+    except course_api.InvalidFields as e:
+        return JsonResponse({'error': f'Unknown fields: {e}'}, status=400)
+    row = Course.objects.filter(slug=slug).values(*course_api.lookups(fields)).first()
+    if row is None:
+        return JsonResponse({'error': 'Course not found'}, status=404)
+    return JsonResponse(course_api.serialize(row, fields))
+
 @login_required
 def checkout(request):
     """Renders the checkout page (if used in future flows)."""
@@ -123,14 +235,70 @@ def checkout(request):
 
 @login_required
 def dashboard(request):
-    """Displays the user's dashboard with their list of reservations."""
-    reservations = Reservation.objects.filter(user=request.user).order_by('-booking_date')
-    return render(request, 'reservations/dashboard.html', {'reservations': reservations})
+    """
+    Displays the user's dashboard with their reservations, one page at a time.
+    Uses keyset pagination on (booking_date, id) so deep pages stay as cheap
+    as the first one, and a single joined query for the course/instructor data.
+    """
+    reservations = Reservation.objects.filter(user=request.user)
+
+    # Per-status counts for the tabs (one grouped query)
+    status_counts = dict(
+        reservations.values_list('status').annotate(total=Count('id')).order_by()
+    )
+    total_count = sum(status_counts.values())
+
+    status = request.GET.get('status')
+    # Any known status is a tab, even one with no rows yet (it renders empty)
+    if status in dict(Reservation.STATUS_CHOICES):
+        reservations = reservations.filter(status=status)
+    else:
+        status = None
+
+    reservations = reservations.select_related('course', 'course__instructor')
+    try:
+        page = keyset_page(
+            reservations,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    except InvalidCursor:
+        return redirect('dashboard')
+
+    status_tabs = [
+        {'value': value, 'label': label, 'count': status_counts.get(value, 0)}
+        for value, label in Reservation.STATUS_CHOICES
+    ]
+
+    return render(request, 'reservations/dashboard.html', {
+        'reservations': page['items'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor'],
+        'total_count': total_count,
+        'status_tabs': status_tabs,
+        'selected_status': status,
+    })
+
+@staff_member_required
+def catalog_cache_stats(request):
+    """Admin-only JSON view of the catalog cache hit/miss counters."""
+    return JsonResponse(catalog.stats())
+
+@staff_member_required
+def request_timing_stats(request):
+    """Admin-only JSON view of this worker's p50/p95/p99 latency per URL name."""
+    return JsonResponse(instrumentation.latency.summary())
+
+@staff_member_required
+def chat_cache_stats(request):
+    """Admin-only JSON view of this worker's chatbot answer cache counters."""
+    return JsonResponse(chatbot.answers.stats())
 
 # ==========================================
 #           AUTHENTICATION
 # ==========================================
 
+@rate_limit('login')
 def login_view(request):
     """
     Handles user login.
@@ -170,41 +338,10 @@ def logout_view(request):
 #        PASSWORD RESET (OTP)
 # ==========================================
 
-def send_otp_email(email, otp):
-    """
-    Helper function to send OTP email via Resend API.
-    Returns True if successful, False otherwise.
-    """
-    api_key = settings.RESEND_API_KEY
-    url = "https://api.resend.com/emails"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "from": "onboarding@resend.dev",
-        "to": [email],
-        "subject": "AquaSense Password Reset OTP",
-        "html": f"<p>Your OTP for password reset is: <strong>{otp}</strong></p>"
-    }
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        if response.status_code == 200:
-            return True
-        else:
-            # Fallback for development logging
-            print(f"\n{'='*50}")
-            print(f"DEV MODE - Resend API Status: {response.status_code}")
-            print(f"OTP for {email}: {otp}")
-            print(f"{'='*50}\n")
-            return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
-
+@rate_limit('forgot_password')
 def forgot_password(request):
     """
-    Step 1: Ask for email and send OTP.
+    Step 1: Ask for email and queue the OTP email.
     """
     if request.method == 'POST':
         email = request.POST.get('email')
@@ -217,15 +354,15 @@ def forgot_password(request):
             request.session['reset_otp'] = otp
             request.session['otp_attempts'] = 0
             
-            if send_otp_email(email, otp):
-                messages.success(request, 'OTP generated! Check your email (or terminal in Dev mode).')
-                return redirect('verify_otp')
-            else:
-                messages.error(request, 'Failed to send OTP. Please try again.')
+            # Sent by the background worker (manage.py run_jobs)
+            jobs.enqueue('send_otp_email', email=email, otp=otp)
+            messages.success(request, 'OTP generated! Check your email (or terminal in Dev mode).')
+            return redirect('verify_otp')
         except User.DoesNotExist:
             messages.error(request, 'Email not found.')
     return render(request, 'reservations/forgot_password.html')
 
+@rate_limit('verify_otp')
 def verify_otp(request):
     """
     Step 2: Verify the OTP entered by the user.
@@ -290,67 +427,72 @@ def reset_password(request):
 #           AI CHAT API
 # ==========================================
 
+async def _chat_session_key(request):
+    """Returns the visitor's session key, creating a session if needed."""
+    if not request.session.session_key:
+        await request.session.asave()
+    return request.session.session_key
+
+def _sse(data, event=None):
+    """Formats one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def _chat_event_stream(chunks):
+    """Relays Gemini chunks as SSE 'data' events, ending with 'done' or 'error'."""
+    try:
+        async for text in chunks:
+            yield _sse({'text': text})
+        yield _sse({}, event='done')
+    except Exception as e:
+        logger.error(f"Error while streaming chat: {str(e)}", exc_info=True)
+        yield _sse({'error': 'Stream interrupted'}, event='error')
+
 @csrf_exempt
-def chat_view(request):
+@rate_limit('chat', json=True)
+async def chat_view(request):
     """
     API endpoint for the Gemini AI Chatbot.
     Expects a POST request with JSON body {'message': '...'}.
+    Follow-up messages continue the visitor's existing conversation.
+    Clients sending 'Accept: text/event-stream' get the reply streamed as
+    server-sent events; everyone else gets a single JSON response.
+    Async so that, under ASGI, waiting on Gemini never holds a worker thread;
+    returns 503 + Retry-After when the upstream limiter is saturated, and
+    429 + Retry-After for clients over their own rate limit.
     """
     if request.method == 'POST':
         try:
             # Log incoming request
             logger.info("Chat request received")
             
-            # Get and validate API key
-            api_key = os.getenv("GEMINI_API_KEY")
-            if not api_key:
-                logger.error("GEMINI_API_KEY not found in environment variables")
-                return JsonResponse({'error': 'API key not configured.'}, status=500)
-            
-            logger.info(f"API Key found: {api_key[:10]}...")
-            
-            # Configure Gemini
-            genai.configure(api_key=api_key)
-            
             # Parse request body
             data = json.loads(request.body)
             user_message = data.get('message', '')
             logger.info(f"User message: {user_message}")
+
+            session_key = await _chat_session_key(request)
+
+            if 'text/event-stream' in request.headers.get('Accept', ''):
+                stream = await chatbot.stream_message(session_key, user_message, encode=_chat_event_stream)
+                response = StreamingHttpResponse(stream, content_type='text/event-stream')
+                response['Cache-Control'] = 'no-cache'
+                response['X-Accel-Buffering'] = 'no'
+                return response
+
+            reply = await chatbot.send_message(session_key, user_message)
             
-            # --- System Prompt Configuration ---
-            system_prompt = """
-            You are the AI Dive Advisor for AquaSense, a premier diving center.
-            Your goal is to be helpful, friendly, and professional.
-            
-            Info:
-            - Location: Cairo , Egypt.
-            - Contact: +1 (123) 456-7890.
-            
-            Courses:
-            1. Open Water Diver: $350 (Beginner)
-            2. Advanced Diving Skills: $450 (Intermediate)
-            3. Coral Reef Exploration: $200 (For everyone)
-            4. Wreck Diving: $500 (Advanced)
-            
-            Keep responses concise.
-            """
-            
-            # Use the latest stable model
-            logger.info("Initializing Gemini model...")
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
-            logger.info("Starting chat...")
-            chat = model.start_chat(history=[
-                {'role': 'user', 'parts': [system_prompt]},
-                {'role': 'model', 'parts': ["Understood. Ready to help."]}
-            ])
-            
-            logger.info("Sending message to Gemini...")
-            response = chat.send_message(user_message)
-            
-            logger.info(f"AI response: {response.text[:50]}...")
-            return JsonResponse({'response': response.text})
+            logger.info(f"AI response: {reply[:50]}...")
+            return JsonResponse({'response': reply})
             
+        except chatbot.ChatbotBusy:
+            logger.warning("Chat upstream limiter saturated, rejecting request")
+            response = JsonResponse({'error': 'The Dive Advisor is busy. Please try again shortly.'}, status=503)
+            response['Retry-After'] = str(settings.CHAT_RETRY_AFTER)
+            return response
+        except chatbot.ChatbotNotConfigured as e:
+            logger.error(str(e))
+            return JsonResponse({'error': 'API key not configured.'}, status=500)
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error: {e}")
             return JsonResponse({'error': 'Invalid JSON in request body'}, status=400)